@@ -0,0 +1,43 @@
+"""
+Generates characters headlessly with a random choice policy, as load tests do, and counts
+the requests made to the API.
+
+    python -m benchmarks.characters [--count 2000] [--seed 1]
+"""
+import argparse
+import random
+import time
+
+import choices
+import dnd
+from fakesrd import FakeSRD
+from benchmarks.common import using_server
+
+CLASSES = ["barbarian", "rogue", "wizard"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+    policy = choices.RandomOptions(args.seed)
+
+    with FakeSRD() as server, using_server(server):
+        start = time.perf_counter()
+        characters = [dnd.PlayableCharacter(f"Character{i}", background=rng.choice(dnd.PlayableCharacter.valid_backgrounds),
+                                            alignment=rng.choice(dnd.PlayableCharacter.valid_alignments),
+                                            race=rng.choice(dnd.PlayableCharacter.valid_races),
+                                            player_class=rng.choice(CLASSES), choice_policy=policy)
+                      for i in range(args.count)]
+        elapsed = time.perf_counter() - start
+
+    loadouts = {tuple(sorted(character.get_inventory().items())) for character in characters}
+    categories = sum(count for path, count in server.requests.items() if path.startswith("equipment-categories/"))
+    print(f"{args.count} characters in {elapsed:.2f} s ({args.count / elapsed:,.0f} characters/s), {len(loadouts)} distinct loadouts")
+    print(f"  {server.total_requests} API requests, {categories} of them for equipment categories")
+
+
+if __name__ == "__main__":
+    main()
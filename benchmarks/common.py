@@ -0,0 +1,53 @@
+import builtins
+from contextlib import contextmanager
+
+import dnd
+from snapshot import Snapshot
+from srdcache import SRDCache
+from srdclient import SRDClient
+
+
+def answer_prompt(prompt):
+    """
+    Answers the PlayableCharacter creation prompts with the first option and two wizard skills.
+    """
+    if "(a/" in prompt:
+        return "a"
+    return "skill-arcana, skill-history"
+
+
+@contextmanager
+def patched_input(answer=answer_prompt):
+    original = builtins.input
+    builtins.input = answer
+    try:
+        yield
+    finally:
+        builtins.input = original
+
+
+@contextmanager
+def using_server(server, cache=None):
+    """
+    Points dnd at server with the given cache (an in-memory one by default) and no snapshot.
+    """
+    saved = dnd.client, dnd.cache, dnd.snapshot
+    dnd.client = SRDClient(server.url)
+    dnd.cache = cache if cache is not None else SRDCache(None)
+    dnd.snapshot = Snapshot(None)
+    try:
+        yield
+    finally:
+        dnd.client.close()
+        dnd.client, dnd.cache, dnd.snapshot = saved
+
+
+def reset_state():
+    """
+    Empties the cache and drops the process-wide indexes built from API data, as in a freshly started process.
+    """
+    dnd.cache.clear()
+    dnd._speaker_languages = None
+    dnd._spell_index = None
+    dnd._name_indexes = {}
+    dnd._equipment_index = None
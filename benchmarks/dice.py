@@ -0,0 +1,47 @@
+"""
+Dice rolls per second, one at a time and batched, and the time of a local skill check next
+to a skill check left to the model (a FakeModel turn with the given latency).
+
+    python -m benchmarks.dice [--rolls 1000000] [--checks 10000] [--model-latency 0.8]
+"""
+import argparse
+import time
+
+from dice import Dice, skill_check
+from dnd import PlayableCharacter
+from fakemodel import FakeModel
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rolls", type=int, default=1000000)
+    parser.add_argument("--checks", type=int, default=10000)
+    parser.add_argument("--model-latency", type=float, default=0.8, help="latency of a model turn, in seconds")
+    args = parser.parse_args(argv)
+
+    dice = Dice(seed=1)
+    for expression in ["d20", "2d6+3", "8d6"]:
+        start = time.perf_counter()
+        for _ in range(args.rolls // 10):
+            dice.roll(expression)
+        single = (args.rolls // 10) / (time.perf_counter() - start)
+        start = time.perf_counter()
+        dice.roll_many(expression, args.rolls)
+        batched = args.rolls / (time.perf_counter() - start)
+        print(f"{expression:<6} {single:>12,.0f} rolls/s one by one {batched:>12,.0f} rolls/s batched ({batched / single:.1f}x)")
+
+    character = PlayableCharacter.from_dict({"name": "Kess", "proficiencies": ["skill-stealth"], "saving_throws": ["dex"]})
+    start = time.perf_counter()
+    for _ in range(args.checks):
+        skill_check(character, "stealth", dice, advantage=True)
+    local = (time.perf_counter() - start) / args.checks
+
+    chat = FakeModel(latency=args.model_latency).start_chat()
+    start = time.perf_counter()
+    chat.send_message("Roll a stealth check for Kess")
+    remote = time.perf_counter() - start
+    print(f"skill check: {local * 1e6:.1f} us locally, {remote * 1000:.0f} ms as a model turn")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+A burst of messages from a fake Discord gateway, answered inline (blocking work on the event
+loop, one send per reply, as send_message did) and through the ChannelPipeline and the
+OutboundQueue. Reports the event loop lag, the time to answer, the number of sends and the
+sends over the Discord rate limit of a channel.
+
+    python -m benchmarks.gateway [--messages 1000] [--channels 50] [--work 0.01]
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import deque
+
+from pipeline import CHANNEL_RATE, ChannelPipeline, LoopLagMonitor, OutboundQueue
+
+
+class FakeChannel:
+    """
+    Channel recording its sends, and how many would have been refused by the rate limit.
+    """
+
+    def __init__(self, id, latency):
+        self.id = id
+        self.latency = latency
+        self.sends = 0
+        self.over_limit = 0
+        self._recent = deque()
+
+    async def send(self, content):
+        now = time.monotonic()
+        count, per = CHANNEL_RATE
+        while self._recent and now - self._recent[0] >= per:
+            self._recent.popleft()
+        if len(self._recent) >= count:
+            self.over_limit += 1
+        self._recent.append(now)
+        self.sends += 1
+        await asyncio.sleep(self.latency)
+        return self.sends
+
+
+def blocking_turn(message, work):
+    #an SRD lookup or a model call through a blocking client
+    time.sleep(work)
+    return f"answer to {message}"
+
+
+async def burst(messages, channels, arrival, handle):
+    """
+    Delivers the messages the way the gateway does: one task per event, arrival seconds apart.
+    """
+    tasks = []
+    for number, channel in enumerate(messages):
+        tasks.append(asyncio.create_task(handle(channels[channel], f"message {number}")))
+        if arrival:
+            await asyncio.sleep(arrival)
+        else:
+            await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+
+
+async def run_inline(messages, channels, args):
+    replied = []
+    start = time.perf_counter()
+
+    async def handle(channel, message):
+        reply = blocking_turn(message, args.work)
+        await channel.send(reply)
+        replied.append(time.perf_counter() - start)
+
+    await burst(messages, channels, args.arrival, handle)
+    return replied
+
+
+async def run_pipeline(messages, channels, args):
+    pipeline = ChannelPipeline(workers=args.workers, max_pending=args.max_pending)
+    outbound = OutboundQueue()
+    replied = []
+    start = time.perf_counter()
+
+    async def turn(channel, message):
+        reply = await pipeline.run_blocking(blocking_turn, message, args.work)
+        outbound.post(channel, reply).add_done_callback(lambda future: replied.append(time.perf_counter() - start))
+
+    async def handle(channel, message):
+        if not pipeline.submit(channel.id, turn, channel, message):
+            outbound.post(channel, "busy").add_done_callback(lambda future: replied.append(time.perf_counter() - start))
+
+    await burst(messages, channels, args.arrival, handle)
+    await pipeline.join()
+    await outbound.join()
+    pipeline.close()
+    return replied
+
+
+def report(name, lag, replied, channels, elapsed):
+    replied = sorted(replied)
+    print(f"{name:<9} {elapsed:>7.2f} s  lag p50 {lag.quantile(0.5) * 1000:>7.1f} ms  p99 {lag.quantile(0.99) * 1000:>7.1f} ms  "
+          f"max {max(lag.samples, default=0) * 1000:>7.1f} ms  reply p50 {replied[len(replied) // 2]:>6.2f} s  "
+          f"sends {sum(channel.sends for channel in channels):>5}  over limit {sum(channel.over_limit for channel in channels):>5}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--channels", type=int, default=50)
+    parser.add_argument("--work", type=float, default=0.01, help="blocking work per message, in seconds")
+    parser.add_argument("--arrival", type=float, default=0.0, help="time between two messages, in seconds")
+    parser.add_argument("--send-latency", type=float, default=0.05, help="latency of a send, in seconds")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--max-pending", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    messages = [rng.randrange(args.channels) for _ in range(args.messages)]
+    for name, run in [("inline", run_inline), ("pipeline", run_pipeline)]:
+        async def measure():
+            channels = [FakeChannel(id, args.send_latency) for id in range(args.channels)]
+            lag = LoopLagMonitor(interval=0.01)
+            lag.start()
+            start = time.perf_counter()
+            replied = await run(messages, channels, args)
+            elapsed = time.perf_counter() - start
+            lag.stop()
+            report(name, lag, replied, channels, elapsed)
+        asyncio.run(measure())
+
+
+if __name__ == "__main__":
+    main()
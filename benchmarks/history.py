@@ -0,0 +1,50 @@
+"""
+Prompt tokens per turn over a long simulated campaign, with and without the HistoryManager.
+
+    python -m benchmarks.history [--turns 500] [--window 4000]
+"""
+import argparse
+
+from fakemodel import FakeModel
+from history import HistoryManager
+
+PINNED = ["Objective: recover the Sunblade from the ruined temple before the eclipse. " * 20,
+          "Character sheet: Aria, half-elf wizard, level 3. " * 40]
+
+
+def player_message(turn):
+    return f"Turn {turn}: I carefully search the room for traps, then ask the innkeeper about the temple. " * 3
+
+
+def run(chat, turns):
+    prompt_tokens = []
+    for turn in range(turns):
+        response = chat.send_message(player_message(turn))
+        prompt_tokens.append(response.usage_metadata.prompt_token_count)
+    return prompt_tokens
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--window", type=int, default=4000, help="token budget of the recent turns")
+    args = parser.parse_args(argv)
+
+    model = FakeModel()
+    unbounded = run(model.start_chat(history=[{"role": "user", "parts": PINNED}]), args.turns)
+    managed_chat = HistoryManager(model, pinned=PINNED, window_tokens=args.window)
+    managed = run(managed_chat, args.turns)
+
+    print(f"prompt tokens per turn over {args.turns} turns (window {args.window} tokens)")
+    print(f"{'turn':>6} {'full history':>14} {'managed':>10}")
+    for turn in sorted({1, 10, 50} | set(range(100, args.turns + 1, 100))):
+        if turn <= args.turns:
+            print(f"{turn:>6} {unbounded[turn - 1]:>14} {managed[turn - 1]:>10}")
+    print(f"total prompt tokens: full history {sum(unbounded)}, managed {sum(managed)} "
+          f"({sum(managed) / sum(unbounded):.1%})")
+    print(f"managed: {managed_chat.stats['compactions']} compactions, "
+          f"max {max(managed)} prompt tokens, summary {len(managed_chat.summary.split())} words")
+
+
+if __name__ == "__main__":
+    main()
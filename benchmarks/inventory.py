@@ -0,0 +1,58 @@
+"""
+Encumbrance checks on loot turns: can_add_item and encumbrance through the equipment index,
+next to the same check re-fetching every item of the inventory (through the cache) to sum its
+weight, against a FakeSRD with the given latency.
+
+    python -m benchmarks.inventory [--checks 10000] [--latency 0.02]
+"""
+import argparse
+import time
+
+import dnd
+from fakesrd import FakeSRD
+from benchmarks.common import reset_state, using_server
+
+LOOT = ["shovel", "torch", "crowbar", "dagger", "backpack", "rapier", "arrow", "wand"]
+
+
+def refetching_can_add_item(character, index, quantity):
+    #what the check cost before the index: every item looked up again to add up the weights
+    weight = sum((dnd.get_item(item).weight or 0) * count for item, count in character.inventory.items())
+    return weight + (dnd.get_item(index).weight or 0) * quantity <= character.carry_capacity
+
+
+def measure(check, checks):
+    start = time.perf_counter()
+    for number in range(checks):
+        check(LOOT[number % len(LOOT)], 1 + number % 3)
+    return checks / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checks", type=int, default=10000)
+    parser.add_argument("--latency", type=float, default=0.02, help="latency of an API request, in seconds")
+    args = parser.parse_args(argv)
+
+    with FakeSRD() as server, using_server(server):
+        reset_state()
+        server.latency = args.latency
+        character = dnd.PlayableCharacter.from_dict({"name": "Looter", "strength": 14, "carry_capacity": 210})
+
+        start = time.perf_counter()
+        character.update_inventory(add=[(index, 1) for index in LOOT])
+        print(f"loading {len(LOOT)} items into the index: {(time.perf_counter() - start) * 1000:.1f} ms, "
+              f"{server.total_requests} requests")
+
+        server.reset_counts()
+        indexed = measure(lambda index, quantity: (character.can_add_item(index, quantity), character.encumbrance()), args.checks)
+        print(f"indexed:    {indexed:>12,.0f} checks/s, {server.total_requests} requests")
+        server.reset_counts()
+        refetched = measure(lambda index, quantity: refetching_can_add_item(character, index, quantity), args.checks)
+        print(f"re-fetched: {refetched:>12,.0f} checks/s, {server.total_requests} requests")
+        print(f"speedup: {indexed / refetched:.0f}x, carrying {character.carry_current:g} lb "
+              f"({character.encumbrance()}), worth {character.get_inventory_value()}")
+
+
+if __name__ == "__main__":
+    main()
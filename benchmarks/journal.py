@@ -0,0 +1,77 @@
+"""
+Journal appends per second with different sync batches, and the time to resume a 10,000-turn
+campaign from snapshot plus tail, from the log alone, and (estimated) by replaying every turn
+through the model.
+
+    python -m benchmarks.journal [--turns 10000] [--snapshot-every 1500] [--model-latency 0.8]
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+from journal import Journal
+
+MESSAGE = "I sneak along the wall of the crypt, looking for a way past the skeletons without waking the priest. "
+REPLY = "The torchlight flickers as you creep forward; somewhere below, water drips onto old stone. " * 12
+
+
+def character(turn):
+    return {"name": "Char1", "player_class": "rogue", "race": "tiefling", "level": 1 + turn // 500,
+            "carry_current": 40 + turn % 7, "inventory": {"dagger": 2, "torch": 10 - turn % 10, "thieves-tools": 1},
+            "proficiencies": ["skill-stealth", "skill-acrobatics", "skill-deception", "skill-perception"],
+            "spells": ["thaumaturgy"], "equipped_items": {"Main Hand": "dagger", "Body": "leather-armor"}}
+
+
+def write_campaign(directory, turns, sync_every, snapshot_every):
+    journal = Journal(directory, sync_every=sync_every, sync_interval=60.0, snapshot_every=snapshot_every)
+    start = time.perf_counter()
+    for turn in range(turns):
+        #the history keeps about 40 recent messages: older ones are folded into the summary
+        compacted = turn % 20 == 19
+        journal.record_turn(f"Turn {turn}: {MESSAGE}", REPLY, [character(turn)],
+                            summary=f"Summary up to turn {turn}. " * 30 if compacted else None,
+                            window=20 if compacted else None)
+    journal.close()
+    return time.perf_counter() - start, journal.stats
+
+
+def resume(directory):
+    start = time.perf_counter()
+    journal = Journal(directory)
+    elapsed = time.perf_counter() - start
+    journal.close()
+    return elapsed, journal
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=10000)
+    parser.add_argument("--snapshot-every", type=int, default=1500, help="the default leaves a 1,000-turn tail after the last snapshot")
+    parser.add_argument("--model-latency", type=float, default=0.8, help="latency of a model turn, in seconds")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix="journal-benchmark-")
+    try:
+        for sync_every in [1, 32, 256]:
+            shutil.rmtree(directory)
+            elapsed, stats = write_campaign(directory, args.turns, sync_every, args.snapshot_every)
+            print(f"append, sync every {sync_every:>3}: {args.turns / elapsed:>9,.0f} turns/s  "
+                  f"({stats['syncs']} syncs, {stats['snapshots']} snapshots)")
+
+        elapsed, journal = resume(directory)
+        print(f"resume from snapshot + tail: {elapsed * 1000:>8.1f} ms  (turn {journal.state.seq}, "
+              f"{journal.stats['replayed']} turns replayed)")
+
+        shutil.rmtree(directory)
+        write_campaign(directory, args.turns, 32, None)
+        elapsed, journal = resume(directory)
+        print(f"resume from the log only:    {elapsed * 1000:>8.1f} ms  ({journal.stats['replayed']} turns replayed)")
+        print(f"resume through the model:    {args.turns * args.model_latency:>8.0f} s   (estimated, "
+              f"{args.turns} turns at {args.model_latency} s)")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Counts HTTP calls and wall time for creating one character of each valid race.
+
+"before" replays the original language lookup (the full language list plus one request per
+language for every character) with caching disabled; "after" uses the shared speaker index.
+
+    python -m benchmarks.languages [--latency SECONDS]
+"""
+import argparse
+import time
+
+import dnd
+from fakesrd import FakeSRD
+from srdcache import SRDCache
+from benchmarks.common import patched_input, using_server
+
+
+def legacy_languages_spoken_by(speaker):
+    known_languages = []
+    all_languages = dnd.get_all_languages()
+    for result in all_languages.results:
+        if speaker in dnd.get_language(result["index"]).typical_speakers:
+            known_languages.append(result["index"])
+    return known_languages
+
+
+def create_all_races(server):
+    timings = []
+    for race in dnd.PlayableCharacter.valid_races:
+        server.reset_counts()
+        start = time.perf_counter()
+        dnd.PlayableCharacter(f"{race}-wizard", background="sage", alignment="neutral-good", race=race, player_class="wizard")
+        elapsed = time.perf_counter() - start
+        language_calls = sum(count for path, count in server.requests.items() if path.split("/")[0] == "languages")
+        timings.append((race, server.total_requests, language_calls, elapsed))
+    return timings
+
+
+def report(title, timings):
+    print(title)
+    for race, calls, language_calls, elapsed in timings:
+        print(f"  {race:<11} {calls:>3} HTTP calls ({language_calls:>2} language)  {elapsed * 1000:8.1f} ms")
+    print(f"  total       {sum(t[1] for t in timings):>3} HTTP calls ({sum(t[2] for t in timings):>2} language)  "
+          f"{sum(t[3] for t in timings) * 1000:8.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.02, help="injected latency per request, in seconds")
+    args = parser.parse_args(argv)
+
+    with FakeSRD(latency=args.latency) as server, patched_input():
+        spoken_by = dnd.get_languages_spoken_by
+        with using_server(server, SRDCache(None, max_entries=0)):
+            dnd.get_languages_spoken_by = legacy_languages_spoken_by
+            try:
+                report("before (uncached, per-character language scan)", create_all_races(server))
+            finally:
+                dnd.get_languages_spoken_by = spoken_by
+
+        with using_server(server):
+            dnd._speaker_languages = None
+            dnd._spell_index = None
+            report("after (cached, shared speaker index)", create_all_races(server))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Cost of the instrumentation: time per counter increment and per timed block, with the
+registry enabled and disabled, and the time of warm get_* lookups with and without metrics.
+
+    python -m benchmarks.metrics [--count 200000]
+"""
+import argparse
+import time
+
+import dnd
+import metrics
+from fakesrd import FakeSRD
+from metrics import Registry
+from benchmarks.common import using_server
+
+
+def per_call(function, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return (time.perf_counter() - start) / count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=200000)
+    args = parser.parse_args(argv)
+
+    print(f"{'operation':<24} {'enabled ns':>11} {'disabled ns':>12}")
+    for name, make in [("inc", lambda registry: lambda: registry.inc("calls_total", endpoint="spells/{index}")),
+                       ("observe", lambda registry: lambda: registry.observe("call_seconds", 0.01, endpoint="spells/{index}")),
+                       ("timed block", lambda registry: lambda: registry.timed("call_seconds", endpoint="spells/{index}").__enter__().__exit__())]:
+        enabled = per_call(make(Registry()), args.count)
+        disabled = per_call(make(Registry(enabled=False)), args.count)
+        print(f"{name:<24} {enabled * 1e9:>11.0f} {disabled * 1e9:>12.0f}")
+
+    with FakeSRD() as server, using_server(server):
+        dnd.get_spell("fireball")
+        lookups = args.count // 10
+        with_metrics = per_call(lambda: dnd.get_spell("fireball"), lookups)
+        metrics.registry.enabled = False
+        try:
+            without_metrics = per_call(lambda: dnd.get_spell("fireball"), lookups)
+        finally:
+            metrics.registry.enabled = True
+    print(f"{'warm get_spell':<24} {with_metrics * 1e9:>11.0f} {without_metrics * 1e9:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Compares the memory held by the full spell list as plain dataclasses (a __dict__ per instance and
+every nested field decoded) and as the slotted dnd.Spell records.
+
+The spells come from the offline snapshot when one exists, otherwise the recorded fixtures are
+repeated up to the size of the SRD spell list.
+
+    python -m benchmarks.records [--count 319]
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+from dataclasses import make_dataclass
+
+import dnd
+from fakesrd import FIXTURES_PATH
+
+LegacySpell = make_dataclass("LegacySpell", ["index", "name", "desc", "higher_level", "range", "components", "material",
+                                             "ritual", "duration", "concentration", "casting_time", "level", "school",
+                                             "classes", "subclasses", "damage", "dc", "area_of_effect", "url", "updated_at"])
+
+
+def load_spell_payloads(count):
+    if dnd.snapshot:
+        return [json.dumps(spell) for spell in dnd.snapshot.collections["spells"].values()]
+    with open(FIXTURES_PATH) as f:
+        spells = json.load(f)["spells"]
+    payloads = []
+    for i in range(count):
+        spell = dict(spells[i % len(spells)], index=f"{spells[i % len(spells)]['index']}-{i}")
+        payloads.append(json.dumps(spell))
+    return payloads
+
+
+def measure(payloads, build):
+    gc.collect()
+    tracemalloc.start()
+    records = [build(json.loads(payload)) for payload in payloads]
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return records, current
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=319, help="number of spells when no snapshot is available")
+    args = parser.parse_args(argv)
+
+    payloads = load_spell_payloads(args.count)
+    legacy_fields = set(LegacySpell.__dataclass_fields__)
+    _, legacy = measure(payloads, lambda data: LegacySpell(**{k: data.get(k) for k in legacy_fields}))
+    _, slotted = measure(payloads, dnd.Spell.from_json)
+    print(f"{len(payloads)} spells")
+    print(f"  dataclass with __dict__ {legacy / 1024:8.1f} KiB")
+    print(f"  slotted, lazy nested    {slotted / 1024:8.1f} KiB ({slotted / legacy:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Loads 100k characters into a CharacterRepository and times batched writes and the
+"level 5 wizards of this guild" query, with the indexes and with a full table scan.
+
+    python -m benchmarks.repository [--count 100000] [--guilds 500] [--batch 1000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import dnd
+from repository import CharacterRepository
+
+CLASSES = dnd.PlayableCharacter.valid_classes
+RACES = dnd.PlayableCharacter.valid_races
+
+SHEET = {
+    "background": "sage", "alignment": "neutral-good", "player_subclass": None,
+    "saving_throws": ["int", "wis"], "inventory": {"quarterstaff": 1, "component-pouch": 1, "scholars-pack": 1, "spellbook": 1},
+    "carry_capacity": 100, "carry_current": 19, "inventory_value": 11520,
+    "equipped_items": {"Head": None, "Body": None, "Cape": None, "Hands": None, "Feet": None, "Main Hand": None, "Off Hand": None},
+    "spells": ["fire-bolt", "light", "mage-hand"], "level_acm": 0, "level_threshold": 100,
+    "proficiencies": ["daggers", "darts", "slings", "quarterstaffs", "light-crossbows", "skill-arcana", "skill-history"],
+    "languages": ["common", "elvish"],
+}
+
+
+def make_characters(count, guilds, rng):
+    for i in range(count):
+        data = dict(SHEET, name=f"Character{i}", player_class=rng.choice(CLASSES), race=rng.choice(RACES), level=rng.randint(1, 20))
+        yield dnd.PlayableCharacter.from_dict(data), rng.randrange(10 ** 6), rng.randrange(guilds)
+
+
+def timed(function, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--guilds", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--single", type=int, default=2000, help="characters written one transaction each, for comparison")
+    args = parser.parse_args(argv)
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        repository = CharacterRepository(os.path.join(directory, "characters.db"))
+        characters = list(make_characters(args.count, args.guilds, rng))
+
+        _, single = timed(lambda: [repository.put(*entry) for entry in characters[:args.single]])
+        start = time.perf_counter()
+        for offset in range(args.single, args.count, args.batch):
+            repository.put_many(characters[offset:offset + args.batch])
+        batched = time.perf_counter() - start
+        print(f"{args.count} characters in {args.guilds} guilds")
+        print(f"  one transaction per character: {args.single / single:,.0f} characters/s")
+        print(f"  put_many, batches of {args.batch}: {(args.count - args.single) / batched:,.0f} characters/s")
+
+        guild = characters[0][2]
+        query = dict(campaign=guild, player_class="wizard", level=5)
+        wizards, indexed = timed(lambda: repository.find(**query), repeat=100)
+        sql = "SELECT data, version FROM characters {} WHERE campaign = ? AND player_class = ? AND level = ? ORDER BY name"
+        _, indexed_sql = timed(lambda: repository._db.execute(sql.format(""), (str(guild), "wizard", 5)).fetchall(), repeat=100)
+        scanned, scan = timed(lambda: repository._db.execute(sql.format("NOT INDEXED"), (str(guild), "wizard", 5)).fetchall(), repeat=10)
+        assert len(scanned) == len(wizards)
+        print(f'  "level 5 wizards of guild {guild}": {len(wizards)} characters')
+        print(f"    plan: {repository.query_plan(**query).replace(chr(10), '; ')}")
+        print(f"    find() with index: {indexed * 1000:.3f} ms (query only {indexed_sql * 1000:.3f} ms)")
+        print(f"    full table scan:   {scan * 1000:.3f} ms")
+        repository.close()
+
+
+if __name__ == "__main__":
+    main()
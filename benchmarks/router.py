@@ -0,0 +1,84 @@
+"""
+Share of table messages the router answers locally and the latency it saves, on a recorded-style
+mix of rules questions and narrative turns, with the narrative turns sent to a FakeModel.
+
+    python -m benchmarks.router [--turns 500] [--model-latency 0.8] [--seed 1]
+"""
+import argparse
+import random
+import time
+
+from fakemodel import FakeModel
+from fakesrd import FakeSRD
+from router import Router, classify
+from benchmarks.common import using_server
+
+QUESTIONS = [
+    "what does {spell} do?", "What level is {spell}?", "range of {spell}", "what components does {spell} need?",
+    "how long does {spell} last?", "How much does a {item} cost?", "what's the price of a {item}?",
+    "tell me about the {magic_item}", "describe {item}",
+]
+NARRATIVE = [
+    "I cast {spell} at the goblins", "We search the room for traps", "I open the chest with my {item}",
+    "What happens if I cast {spell} on the door?", "I ask the innkeeper about the missing caravan",
+    "Let's rest until dawn", "what does the old man want?", "I swing my {item} at the orc",
+]
+SPELLS = ["Fireball", "magic missile", "Shield", "cure wounds", "hold person", "misty step"]
+ITEMS = ["shovel", "torch", "crowbar", "longsword", "dagger", "backpack"]
+MAGIC_ITEMS = ["bag of holding", "potion of healing", "cloak of protection"]
+
+
+def transcript(turns, question_share, seed):
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(turns):
+        template = rng.choice(QUESTIONS if rng.random() < question_share else NARRATIVE)
+        messages.append((template in QUESTIONS, template.format(spell=rng.choice(SPELLS), item=rng.choice(ITEMS),
+                                                              magic_item=rng.choice(MAGIC_ITEMS))))
+    return messages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--question-share", type=float, default=0.3, help="fraction of the messages that are rules questions")
+    parser.add_argument("--model-latency", type=float, default=0.8, help="latency of a model turn, in seconds")
+    parser.add_argument("--model-turns", type=int, default=5, help="narrative turns actually sent to the FakeModel")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    messages = transcript(args.turns, args.question_share, args.seed)
+    start = time.perf_counter()
+    for _ in range(20):
+        for _, message in messages:
+            classify(message)
+    classify_us = (time.perf_counter() - start) / (20 * len(messages)) * 1e6
+
+    chat = FakeModel(latency=args.model_latency).start_chat()
+    router = Router()
+    wrong = 0
+    model_turns = 0
+    with FakeSRD() as server, using_server(server):
+        for is_question, message in messages:
+            answered = router.answer(message) is not None
+            wrong += answered != is_question
+            if not answered:
+                #only the first narrative turns really wait for the model; the rest count with the mean latency
+                if model_turns < args.model_turns:
+                    turn_start = time.perf_counter()
+                    chat.send_message(message)
+                    router.record_forwarded(time.perf_counter() - turn_start)
+                    model_turns += 1
+                else:
+                    router.record_forwarded(router.stats["forwarded_seconds"] / router.stats["forwarded"])
+
+    local = router.stats["local"]
+    print(f"classify: {classify_us:.1f} us per message")
+    print(f"served locally: {local}/{len(messages)} ({router.local_fraction():.0%}), misrouted: {wrong}")
+    print(f"local answer: {router.stats['local_seconds'] / max(local, 1) * 1000:.2f} ms mean, "
+          f"model turn: {router.stats['forwarded_seconds'] / router.stats['forwarded'] * 1000:.0f} ms mean")
+    print(f"latency saved: {router.latency_saved():.1f} s over {len(messages)} turns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Time to restore a party of saved characters at startup: re-creating them through the
+constructor (API lookups) against loading JSON and binary saves.
+
+    python -m benchmarks.saves [--count 500] [--latency 0.05]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import dnd
+from fakesrd import FakeSRD
+from benchmarks.common import using_server
+
+WIZARD = dict(background="sage", alignment="neutral-good", race="elf", player_class="wizard",
+              equipment_choices=["a", "a", "a"], proficiency_choices=[["skill-arcana", "skill-history"]])
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated API latency, in seconds")
+    parser.add_argument("--rebuild", type=int, default=5, help="characters re-created through the constructor")
+    args = parser.parse_args(argv)
+
+    with FakeSRD(latency=args.latency) as server, using_server(server):
+        template, first_build = timed(lambda: dnd.PlayableCharacter("Template", **WIZARD))
+        _, rebuild = timed(lambda: [dnd.PlayableCharacter(f"Wizard{i}", **WIZARD) for i in range(args.rebuild)])
+
+    with tempfile.TemporaryDirectory() as directory:
+        data = template.to_dict()
+        for binary in (False, True):
+            subdirectory = os.path.join(directory, "binary" if binary else "json")
+            os.makedirs(subdirectory)
+            for i in range(args.count):
+                character = dnd.PlayableCharacter.from_dict({**data, "name": f"Wizard{i}"})
+                character.save(os.path.join(subdirectory, f"Wizard{i}" + (".dndc" if binary else ".json")), binary=binary)
+
+        print(f"restoring {args.count} characters (API latency {args.latency * 1000:.0f} ms)")
+        print(f"  constructor: first {first_build * 1000:.0f} ms, then {rebuild / args.rebuild * 1000:.1f} ms each with a warm cache, "
+              f"about {(first_build + rebuild / args.rebuild * (args.count - 1)):.1f} s for all")
+        for binary in (False, True):
+            subdirectory = os.path.join(directory, "binary" if binary else "json")
+            size = sum(entry.stat().st_size for entry in os.scandir(subdirectory))
+            characters, elapsed = timed(lambda: dnd.PlayableCharacter.load_all(subdirectory, binary=binary))
+            assert len(characters) == args.count
+            print(f"  load_all {'binary' if binary else 'JSON':<6}: {elapsed * 1000:.1f} ms "
+                  f"({elapsed / args.count * 1e6:.0f} us each), {size / args.count:.0f} bytes per save")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Load test of SessionManager: many campaigns playing at once against a mocked model.
+
+    python -m benchmarks.sessions [--campaigns 150] [--turns 5] [--latency 0.2] [--concurrency 64]
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+
+from fakemodel import FakeModel
+from sessions import SessionManager
+
+
+async def play(manager, campaign, turns, latencies):
+    for turn in range(turns):
+        start = time.perf_counter()
+        await manager.send(("guild", campaign), f"turn {turn}")
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(campaigns, turns, latency, concurrency, store_dir):
+    model = FakeModel(latency=latency)
+    manager = SessionManager(model, max_concurrency=concurrency, store_dir=store_dir)
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[play(manager, campaign, turns, latencies) for campaign in range(campaigns)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"{campaigns} campaigns x {turns} turns, model latency {latency * 1000:.0f} ms, concurrency cap {concurrency}")
+    print(f"  {manager.stats['turns']} turns in {elapsed:.2f} s: {manager.stats['turns'] / elapsed:.1f} turns/s")
+    print(f"  turn latency p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f} ms")
+    print(f"  peak concurrent model calls: {model.peak_in_flight}")
+    manager.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaigns", type=int, default=150)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.2, help="mocked model latency, in seconds")
+    parser.add_argument("--concurrency", type=int, default=64, help="global cap on concurrent model calls")
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as store_dir:
+        asyncio.run(run(args.campaigns, args.turns, args.latency, args.concurrency, store_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Bytes and tokens of character sheet context per turn: the pretty-printed JSON file, the
+compact sheet, and the compact sheet once followed by deltas.
+
+    python -m benchmarks.sheets [--turns 100] [--seed 1]
+"""
+import argparse
+import random
+
+import dnd
+from fakesrd import FakeSRD
+from history import estimate_tokens
+from sheets import SheetTracker, compact_sheet
+from benchmarks.common import using_server
+
+ITEMS = ["dagger", "torch", "rope-hempen-50-feet", "rations-1-day", "crowbar", "arrow"]
+SPELLS = ["magic-missile", "shield", "detect-magic", "identify", "alarm"]
+
+
+def play_turn(character, rng):
+    """
+    Applies what a typical turn changes on a sheet: usually nothing, sometimes an item, rarely a spell or a level.
+    """
+    roll = rng.random()
+    if roll < 0.2:
+        character.add_item(rng.choice(ITEMS), rng.randint(1, 3))
+    elif roll < 0.3 and character.inventory:
+        character.use_consumable_item(rng.choice(list(character.inventory)))
+    elif roll < 0.33:
+        character.spells.append(rng.choice(SPELLS))
+    elif roll < 0.35:
+        character.set_level(character.get_level() + 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    with FakeSRD() as server, using_server(server):
+        party = [dnd.PlayableCharacter(name, background="sage", alignment="neutral-good", race=race, player_class=player_class,
+                                       equipment_choices=equipment, proficiency_choices=[choices])
+                 for name, race, player_class, equipment, choices in [
+                     ("Aria", "elf", "wizard", ["a", "a", "a"], ["skill-arcana", "skill-history"]),
+                     ("Brom", "dwarf", "barbarian", ["a", "a"], ["skill-athletics", "skill-survival"]),
+                     ("Kess", "halfling", "rogue", ["a", "b", "a"], ["skill-stealth", "skill-perception", "skill-insight", "skill-deception"]),
+                 ]]
+
+        #turns add items through the equipment index, which needs the FakeSRD for items not seen yet
+        rng = random.Random(args.seed)
+        tracker = SheetTracker()
+        totals = {"json": [0, 0], "compact": [0, 0], "delta": [0, 0]}
+        for turn in range(args.turns):
+            if turn:
+                for character in party:
+                    play_turn(character, rng)
+            sheets = [character.to_dict() for character in party]
+            texts = {
+                "json": "".join(character._toJson() for character in party),
+                "compact": "\n\n".join(compact_sheet(data) for data in sheets),
+                "delta": tracker.update(sheets),
+            }
+            for kind, text in texts.items():
+                totals[kind][0] += len(text.encode())
+                totals[kind][1] += estimate_tokens(text)
+
+    print(f"party of {len(party)}, {args.turns} turns: average sheet context per turn")
+    print(f"{'format':<24} {'bytes':>8} {'tokens':>8}")
+    for kind, label in [("json", "pretty JSON (upload)"), ("compact", "compact sheet"), ("delta", "sheet once, then deltas")]:
+        size, tokens = totals[kind]
+        print(f"{label:<24} {size / args.turns:>8.0f} {tokens / args.turns:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
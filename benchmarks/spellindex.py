@@ -0,0 +1,75 @@
+"""
+Replays typical spellbook queries against a linear scan of the spell list and against SpellIndex.
+
+    python -m benchmarks.spellindex [--count 319] [--rounds 1000]
+"""
+import argparse
+import json
+import time
+
+import dnd
+from spellindex import SpellIndex
+from benchmarks.records import load_spell_payloads
+
+QUERIES = [
+    {"player_class": "wizard", "level": 0},
+    {"player_class": "wizard", "max_level": 3, "ritual": True},
+    {"player_class": "cleric", "max_level": 1},
+    {"player_class": "bard", "concentration": True},
+    {"school": "evocation", "max_level": 5},
+    {"subclass": "lore", "max_level": 3},
+]
+
+
+def scan(spells, player_class=None, subclass=None, level=None, max_level=None, school=None, ritual=None, concentration=None):
+    result = []
+    for spell in spells:
+        if player_class is not None and player_class not in [c["index"] for c in spell.classes]:
+            continue
+        if subclass is not None and subclass not in [s["index"] for s in spell.subclasses]:
+            continue
+        if level is not None and spell.level != level:
+            continue
+        if max_level is not None and spell.level > max_level:
+            continue
+        if school is not None and spell.school["index"] != school:
+            continue
+        if ritual is not None and spell.ritual != ritual:
+            continue
+        if concentration is not None and spell.concentration != concentration:
+            continue
+        result.append(spell.index)
+    return result
+
+
+def timed(function, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in QUERIES:
+            function(**query)
+    return (time.perf_counter() - start) / (rounds * len(QUERIES))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=319, help="number of spells when no snapshot is available")
+    parser.add_argument("--rounds", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    spells = [dnd.Spell.from_json(json.loads(payload)) for payload in load_spell_payloads(args.count)]
+    start = time.perf_counter()
+    index = SpellIndex(spells)
+    build = time.perf_counter() - start
+
+    for query in QUERIES:
+        assert sorted(scan(spells, **query)) == sorted(index.query(**query)), query
+
+    linear = timed(lambda **query: scan(spells, **query), args.rounds)
+    indexed = timed(index.query, args.rounds)
+    print(f"{len(spells)} spells, index built in {build * 1000:.2f} ms")
+    print(f"  linear scan {linear * 1e6:8.1f} us/query")
+    print(f"  SpellIndex  {indexed * 1e6:8.1f} us/query ({linear / indexed:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
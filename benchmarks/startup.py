@@ -0,0 +1,87 @@
+"""
+Startup time: the import time of the entry modules and the time until the app is ready
+(warm-up done), each measured in a fresh interpreter.
+
+Every run happens in an empty directory (no settings.json) with the network unavailable: the
+proxies point to a closed port and dnd runs offline, so anything that still configured a
+client or connected at import time would fail or show up in the numbers.
+
+    python -m benchmarks.startup [--runs 5] [--model-latency 0.3]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["dnd", "dungeonmasterai", "discordBot", "main"]
+
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+#the model is a FakeModel taking model_latency to create, standing in for configuring and building the Gemini model
+READY_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import dungeonmasterai
+from fakemodel import FakeModel
+imported = time.perf_counter() - start
+
+def create_model(app):
+    time.sleep({model_latency})
+    return FakeModel()
+
+dungeonmasterai.app.model_factory = create_model
+dungeonmasterai.app.start_warm_up()
+started = time.perf_counter() - start
+dungeonmasterai.app.ready.wait()
+print(json.dumps({{"import": imported, "start": started, "ready": time.perf_counter() - start,
+                  "steps": dungeonmasterai.app.timings, "errors": sorted(dungeonmasterai.app.errors)}}))
+"""
+
+
+def offline_environment():
+    env = dict(os.environ)
+    env.update({"PYTHONPATH": ROOT, "DND_OFFLINE": "1", "HTTP_PROXY": "http://127.0.0.1:9",
+                "HTTPS_PROXY": "http://127.0.0.1:9", "NO_PROXY": ""})
+    env.pop("DM_SETTINGS", None)
+    return env
+
+
+def run_script(script, directory):
+    result = subprocess.run([sys.executable, "-c", script], cwd=directory, env=offline_environment(),
+                            capture_output=True, text=True, check=True)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--model-latency", type=float, default=0.3, help="time to create the model, in seconds")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'import':<18} {'median ms':>10} {'max ms':>8}")
+        for module in MODULES:
+            times = [float(run_script(IMPORT_SCRIPT.format(module=module), directory)) for _ in range(args.runs)]
+            print(f"{module:<18} {statistics.median(times) * 1000:>10.1f} {max(times) * 1000:>8.1f}")
+
+        runs = [json.loads(run_script(READY_SCRIPT.format(model_latency=args.model_latency), directory)) for _ in range(args.runs)]
+    ready = statistics.median(run["ready"] for run in runs)
+    started = statistics.median(run["start"] for run in runs)
+    print(f"control returned after {started * 1000:.1f} ms (warm-up in the background), ready after {ready * 1000:.1f} ms")
+    for step in runs[0]["steps"]:
+        print(f"  {step:<16} {statistics.median(run['steps'][step] for run in runs) * 1000:>8.1f} ms")
+    if runs[0]["errors"]:
+        print(f"failed warm-up steps: {', '.join(runs[0]['errors'])}")
+
+
+if __name__ == "__main__":
+    main()
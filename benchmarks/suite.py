@@ -0,0 +1,193 @@
+"""
+Benchmark suite: character creation, the get_* fetchers and spell queries against a local
+FakeSRD serving the recorded fixtures, with injected latency.
+
+Every scenario reports operations per second, p50/p99 latency, HTTP calls per operation and
+peak traced memory. Results are written as JSON, and two result files can be compared to
+spot regressions between commits:
+
+    python -m benchmarks.suite [--latency 0.02] [--characters 300] [--output benchmark_results.json]
+    python -m benchmarks.suite --compare before.json after.json [--threshold 0.1]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+
+import choices
+import dnd
+from fakesrd import FakeSRD
+from spellindex import SpellIndex
+from benchmarks.common import reset_state, using_server
+from benchmarks.records import load_spell_payloads
+from benchmarks.spellindex import QUERIES
+
+CLASSES = ["barbarian", "rogue", "wizard"]
+
+#metric: True if higher is better
+METRICS = {"ops_per_sec": True, "p50_ms": False, "p99_ms": False, "http_calls_per_op": False, "peak_memory_kb": False}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+def measure(server, operations, setup=None):
+    """
+    Runs operations (a list of functions) twice, once timed and once under tracemalloc, and returns the scenario metrics.
+
+    setup runs before each pass, e.g. to start from a cold cache.
+    """
+    if setup is not None:
+        setup()
+    server.reset_counts()
+    latencies = []
+    start = time.perf_counter()
+    for operation in operations:
+        operation_start = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - operation_start)
+    elapsed = time.perf_counter() - start
+    calls = server.total_requests
+
+    if setup is not None:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    results = [operation() for operation in operations]
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del results
+
+    return {
+        "ops": len(operations),
+        "seconds": round(elapsed, 4),
+        "ops_per_sec": round(len(operations) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "http_calls_per_op": round(calls / len(operations), 2),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def character_operations(count, seed):
+    rng = random.Random(seed)
+    policy = choices.RandomOptions(seed)
+    operations = []
+    for i in range(count):
+        arguments = dict(background=rng.choice(dnd.PlayableCharacter.valid_backgrounds),
+                         alignment=rng.choice(dnd.PlayableCharacter.valid_alignments),
+                         race=rng.choice(dnd.PlayableCharacter.valid_races), player_class=rng.choice(CLASSES))
+        operations.append(lambda i=i, arguments=arguments: dnd.PlayableCharacter(f"Character{i}", choice_policy=policy, **arguments))
+    return operations
+
+
+def build_party():
+    """
+    Builds one wizard of every race concurrently with PlayableCharacter.build.
+    """
+    async def build():
+        return await asyncio.gather(*[dnd.PlayableCharacter.build(race, background="sage", alignment="neutral-good", race=race,
+                                                                  player_class="wizard", choice_policy=choices.first_options)
+                                      for race in dnd.PlayableCharacter.valid_races])
+    return asyncio.run(build())
+
+
+def run(latency, characters, cold_characters, seed):
+    results = {}
+    with FakeSRD(latency=latency) as server, using_server(server):
+        #every cold character starts from an empty cache, as the first character of a new process does
+        cold = [lambda operation=operation: (reset_state(), operation())[1] for operation in character_operations(cold_characters, seed)]
+        results["create_character_cold"] = measure(server, cold)
+        for operation in character_operations(1, seed):
+            operation()
+        results["create_character_warm"] = measure(server, character_operations(characters, seed))
+        results["build_party_cold"] = measure(server, [build_party], reset_state)
+
+        fetchers = {"spells": dnd.get_spell, "equipment": dnd.get_item, "magic-items": dnd.get_magic_item,
+                    "classes": dnd.get_player_class, "races": dnd.get_player_race, "languages": dnd.get_language}
+        for collection, getter in fetchers.items():
+            indexes = [record["index"] for record in server.collections[collection]]
+            operations = [lambda getter=getter, index=index: getter(index) for index in indexes]
+            results[f"{getter.__name__}_cold"] = measure(server, operations, reset_state)
+            results[f"{getter.__name__}_warm"] = measure(server, operations)
+
+        spells = [dnd.Spell.from_json(json.loads(payload)) for payload in load_spell_payloads(319)]
+        index = SpellIndex(spells)
+        results["spell_query"] = measure(server, [lambda query=query: index.query(**query) for query in QUERIES] * 200)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before, after, threshold=0.1):
+    """
+    Prints the metric changes between two result files and returns the regressions larger than threshold (a fraction).
+    """
+    regressions = []
+    print(f"{before['meta'].get('commit')} -> {after['meta'].get('commit')}")
+    for scenario, new in after["results"].items():
+        old = before["results"].get(scenario)
+        if old is None:
+            continue
+        changes = []
+        for metric, higher_is_better in METRICS.items():
+            if not old.get(metric):
+                continue
+            change = (new[metric] - old[metric]) / old[metric]
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressions.append((scenario, metric, old[metric], new[metric]))
+            changes.append(f"{metric} {change:+.0%}{' !' if worse > threshold else ''}")
+        print(f"  {scenario:<28} {', '.join(changes)}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.02, help="injected latency per request, in seconds")
+    parser.add_argument("--characters", type=int, default=300, help="characters created with a warm cache")
+    parser.add_argument("--cold-characters", type=int, default=10, help="characters created from a cold cache")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files instead of running")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change reported as a regression")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            before = json.load(f)
+        with open(args.compare[1]) as f:
+            after = json.load(f)
+        regressions = compare(before, after, args.threshold)
+        for scenario, metric, old, new in regressions:
+            print(f"regression: {scenario} {metric} {old} -> {new}")
+        return 1 if regressions else 0
+
+    results = run(args.latency, args.characters, args.cold_characters, args.seed)
+    report = {"meta": {"commit": git_commit(), "python": platform.python_version(), "latency": args.latency,
+                       "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+              "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"{'scenario':<28} {'ops/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'calls/op':>9} {'peak KiB':>9}")
+    for scenario, metrics in results.items():
+        print(f"{scenario:<28} {metrics['ops_per_sec']:>10} {metrics['p50_ms']:>9} {metrics['p99_ms']:>9} "
+              f"{metrics['http_calls_per_op']:>9} {metrics['peak_memory_kb']:>9}")
+    print(f"results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
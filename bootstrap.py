@@ -0,0 +1,132 @@
+"""
+Application bootstrap.
+
+Nothing is read, configured or connected when a module is imported: settings, the Gemini
+client and the model are created the first time they are used, and warm_up creates them
+ahead of time, optionally in a background thread while the rest of the program starts.
+
+    app = App(model_factory=create_model)
+    app.start_warm_up()        #returns right away
+    ...
+    model = app.model.get()    #waits for the warm-up if it is still creating the model
+"""
+import importlib
+import json
+import logging
+import os
+import threading
+import time
+
+SETTINGS_PATH = os.environ.get("DM_SETTINGS", "settings.json")
+#collections whose name indexes are built during the warm-up
+WARM_COLLECTIONS = ["spells", "equipment", "magic-items"]
+
+logger = logging.getLogger(__name__)
+
+
+class Lazy:
+    """
+    Value created by factory() on the first get() and reused afterwards. Concurrent callers wait
+    for the first one instead of creating the value twice. If factory raises, the error is raised
+    to the caller and the next get() tries again.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self.factory()
+                    self._loaded = True
+        return self._value
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+
+def load_settings(path=SETTINGS_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _configure_gemini(settings):
+    import google.generativeai as genai
+    genai.configure(api_key=settings["gemini"]["api key"], transport="rest")
+    return genai
+
+
+def _warm_srd():
+    import dnd
+    for collection in WARM_COLLECTIONS:
+        dnd.get_name_index(collection)
+
+
+class App:
+    """
+    Lazily initialised clients of the game and the bot.
+
+    Args:
+        settings_path: The settings.json file, read on first use.
+        model_factory: Function (App) -> model, called on first use of app.model.
+        warm_steps: (name, function) pairs run by warm_up after the model is created; by default
+            building the SRD name indexes (which imports dnd).
+    """
+
+    def __init__(self, settings_path=SETTINGS_PATH, model_factory=None, warm_steps=None):
+        self.settings = Lazy(lambda: load_settings(settings_path))
+        self.genai = Lazy(lambda: _configure_gemini(self.settings.get()))
+        self.model_factory = model_factory
+        self.model = Lazy(self._create_model)
+        self.warm_steps = warm_steps if warm_steps is not None else [("srd", _warm_srd)]
+        self.timings = {}
+        self.errors = {}
+        self.ready = threading.Event()
+        self._warm_up_thread = None
+
+    def _create_model(self):
+        if self.model_factory is None:
+            raise ValueError("The app has no model factory")
+        return self.model_factory(self)
+
+    def warm_up(self):
+        """
+        Creates the model (and with it the settings and the Gemini client) and runs the warm-up steps,
+        recording the time each took in timings. A step that fails is logged and recorded in errors;
+        the next use of what it creates raises the error again.
+
+        Returns:
+            True if every step succeeded.
+        """
+        steps = ([("model", self.model.get)] if self.model_factory is not None else []) + list(self.warm_steps)
+        for name, step in steps:
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                self.errors[name] = e
+                logger.warning("Warm-up step %s failed: %s", name, e, extra={"event": "warm_up_failed", "step": name})
+            self.timings[name] = time.perf_counter() - start
+        self.ready.set()
+        return not self.errors
+
+    def start_warm_up(self):
+        """
+        Runs warm_up in a daemon thread and returns right away; app.ready is set when it is done.
+        """
+        if self._warm_up_thread is None:
+            self._warm_up_thread = threading.Thread(target=self.warm_up, daemon=True, name="warm-up")
+            self._warm_up_thread.start()
+        return self._warm_up_thread
+
+
+def preload(*modules):
+    """
+    Returns a warm-up step importing modules, e.g. App(warm_steps=[("discord", preload("discord"))]).
+    """
+    return lambda: [importlib.import_module(module) for module in modules]
@@ -0,0 +1,174 @@
+import random
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Option:
+    """
+    One option of a choice: what it grants right away, as (index, count) pairs, and the choices it leads to.
+    """
+    label: str
+    grants: list = field(default_factory=list)
+    choices: list = field(default_factory=list)
+
+    def provides(self, index):
+        """
+        Checks if picking this option can grant index, directly or through one of its nested choices.
+        """
+        return any(granted == index for granted, count in self.grants) or \
+            any(option.provides(index) for choice in self.choices for option in choice.options)
+
+
+@dataclass
+class Choice:
+    """
+    A choice of the class data, such as "(a) a greataxe or (b) any martial melee weapon", with its options expanded.
+    """
+    desc: str
+    choose: int
+    options: list
+
+    def letters(self):
+        return [chr(ord("a") + i) for i in range(len(self.options))]
+
+
+def _label(grants):
+    return " and ".join(index if count == 1 else f"{count} {index}" for index, count in grants)
+
+
+def _expand_option(option, get_category):
+    option_type = option.get("option_type")
+    if option_type == "counted_reference":
+        grants = [(option["of"]["index"], option["count"])]
+        return Option(_label(grants), grants)
+    if option_type == "reference":
+        grants = [(option["item"]["index"], 1)]
+        return Option(option["item"].get("name", option["item"]["index"]), grants)
+    if option_type == "choice":
+        choice = expand(option["choice"], get_category)
+        return Option(choice.desc, choices=[choice])
+    if option_type == "multiple":
+        parts = [_expand_option(item, get_category) for item in option["items"]]
+        grants = [grant for part in parts for grant in part.grants]
+        choices = [choice for part in parts for choice in part.choices]
+        return Option(" and ".join(part.label for part in parts), grants, choices)
+    raise ValueError(f"Unsupported option type: {option_type}")
+
+
+def expand(choice, get_category):
+    """
+    Given a choice of the class data (a starting_equipment_options or proficiency_choices entry), returns
+    it as a Choice with its whole option tree expanded.
+
+    Options of an equipment category become one option per piece of equipment in the category, looked up
+    with get_category(index), which returns the {"index", "name", "url"} entries of the category, or None.
+
+    Raises:
+        ValueError: If the choice uses an option or option set type that is not supported.
+    """
+    option_set = choice["from"]
+    option_set_type = option_set.get("option_set_type")
+    if option_set_type == "options_array":
+        options = [_expand_option(option, get_category) for option in option_set["options"]]
+    elif option_set_type == "equipment_category":
+        entries = get_category(option_set["equipment_category"]["index"]) or []
+        #categories may list magic items as well, which are never starting equipment; the API path may be
+        #versioned ("/api/2014/magic-items/..."), so the collection is matched as a path segment
+        options = [Option(entry["name"], [(entry["index"], 1)]) for entry in entries
+                   if "magic-items" not in entry.get("url", "").split("/")]
+    else:
+        raise ValueError(f"Unsupported option set type: {option_set_type}")
+    return Choice(choice.get("desc", ""), choice.get("choose", 1), options)
+
+
+def first_options(choice):
+    """
+    Default policy: picks the first options of every choice.
+    """
+    return list(range(min(choice.choose, len(choice.options))))
+
+
+class RandomOptions:
+    """
+    Policy picking random options, reproducibly for a given seed.
+    """
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def __call__(self, choice):
+        return sorted(self.rng.sample(range(len(choice.options)), min(choice.choose, len(choice.options))))
+
+
+def prompt_player(choice):
+    """
+    Asks the player for a choice on the console. Returns the answer as a selection for resolve.
+    """
+    if choice.choose == 1:
+        if len(choice.options) > 2 or any(option.choices for option in choice.options):
+            listing = ", ".join(f"({letter}) {option.label}" for letter, option in zip(choice.letters(), choice.options))
+            return input(f"Choose {choice.desc}: {listing} ({'/'.join(choice.letters())}): ").lower()
+        return input(f"Would you like to take {choice.desc}? ({'/'.join(choice.letters())}): ").lower()
+    listing = ", ".join(f"({letter}) {option.label}" for letter, option in zip(choice.letters(), choice.options))
+    answer = input(f"{choice.desc}: {listing} (letters or names, separated by commas): ")
+    return [entry.strip() for entry in answer.split(",")]
+
+
+def _pick(choice, entry):
+    """
+    Returns the position of the option selected by entry: a letter, an index the option can grant, or the
+    name of the option ("acrobatics" or "Skill: Acrobatics" for skill-acrobatics) when only one option has it.
+    """
+    letters = choice.letters()
+    if entry in letters:
+        return letters.index(entry)
+    for position, option in enumerate(choice.options):
+        if option.provides(entry):
+            return position
+    name = entry.split(": ")[-1].strip().replace(" ", "-")
+    matches = [position for position, option in enumerate(choice.options)
+               if option.label.lower().split(": ")[-1].replace(" ", "-") == name
+               or any(index.endswith("-" + name) for index, count in option.grants)]
+    if len(matches) == 1:
+        return matches[0]
+    raise ValueError(f"Invalid choice: {entry}. Must be one of: {', '.join(letters)} ({choice.desc})")
+
+
+def resolve(choice, selection=None, policy=None, prompt=None):
+    """
+    Resolves a choice to the (index, count) pairs it grants.
+
+    Args:
+        choice: The expanded Choice.
+        selection: The player's pick: a letter ("b") or an index the option grants ("longsword", which also
+            settles the nested choice it belongs to), or a list of those when several options must be chosen.
+        policy: Function (Choice) -> list of option positions, used for the choices that have no selection.
+        prompt: Function (Choice) -> selection, used for the choices that have neither a selection nor a policy.
+
+    Raises:
+        ValueError: If the selection is not valid, or a choice has no selection, policy or prompt.
+    """
+    if selection is None:
+        if policy is not None:
+            picks = [(position, None) for position in policy(choice)]
+        elif prompt is not None:
+            return resolve(choice, prompt(choice), policy, prompt)
+        else:
+            raise ValueError(f"No selection for: {choice.desc}")
+    else:
+        entries = [entry.lower() for entry in ([selection] if isinstance(selection, str) else selection)]
+        picks = [(_pick(choice, entry), entry) for entry in entries]
+        expected = min(choice.choose, len(choice.options))
+        if len(picks) != expected or len({position for position, entry in picks}) != len(picks):
+            raise ValueError(f"Expected {expected} different choices for: {choice.desc}, got {', '.join(entries)}")
+
+    grants = []
+    for position, entry in picks:
+        option = choice.options[position]
+        grants.extend(option.grants)
+        for nested in option.choices:
+            #an index selection settles the nested choice it was found in
+            nested_selection = entry if entry is not None and entry not in choice.letters() and \
+                any(nested_option.provides(entry) for nested_option in nested.options) else None
+            grants.extend(resolve(nested, nested_selection, policy, prompt))
+    return grants
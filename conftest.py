@@ -0,0 +1,25 @@
+import pytest
+
+import dnd
+from fakesrd import FakeSRD
+from snapshot import Snapshot
+from srdcache import SRDCache
+from srdclient import SRDClient
+
+
+@pytest.fixture
+def srd_server(monkeypatch, tmp_path):
+    """
+    Points dnd at a local FakeSRD server with a fresh cache and no snapshot, so tests run without network access.
+    """
+    with FakeSRD() as server:
+        monkeypatch.setattr(dnd, "client", SRDClient(server.url, backoff=0.01))
+        monkeypatch.setattr(dnd, "cache", SRDCache(str(tmp_path / "srd_cache.db")))
+        monkeypatch.setattr(dnd, "snapshot", Snapshot(None))
+        monkeypatch.setattr(dnd, "_speaker_languages", None)
+        monkeypatch.setattr(dnd, "_spell_index", None)
+        monkeypatch.setattr(dnd, "_name_indexes", {})
+        monkeypatch.setattr(dnd, "_equipment_index", None)
+        yield server
+        dnd.cache.close()
+        dnd.client.close()
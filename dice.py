@@ -0,0 +1,262 @@
+import random
+import re
+from collections import deque
+from dataclasses import dataclass
+
+SKILL_ABILITIES = {
+    "acrobatics": "dex", "animal-handling": "wis", "arcana": "int", "athletics": "str",
+    "deception": "cha", "history": "int", "insight": "wis", "intimidation": "cha",
+    "investigation": "int", "medicine": "wis", "nature": "int", "perception": "wis",
+    "performance": "cha", "persuasion": "cha", "religion": "int", "sleight-of-hand": "dex",
+    "stealth": "dex", "survival": "wis",
+}
+ABILITIES = ["str", "dex", "con", "int", "wis", "cha"]
+
+#lowest total of each outcome band, from the worst to the best
+BANDS = [(float("-inf"), "catastrophic"), (2, "really bad"), (6, "slightly bad"), (10, "ok"),
+         (13, "good"), (16, "great"), (20, "perfect")]
+
+_EXPRESSION = re.compile(r"^\s*(\d*)\s*d\s*(\d+)\s*(?:([+-])\s*(\d+))?\s*$", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class DiceExpression:
+    """
+    A dice expression such as "2d6+3": count dice of sides faces, plus modifier.
+    """
+    count: int
+    sides: int
+    modifier: int = 0
+
+    @classmethod
+    def parse(cls, text):
+        """
+        Given an expression such as "d20", "2d6+3" or "4d4-1", returns the DiceExpression.
+
+        Raises:
+            ValueError: If text is not an NdM+K expression.
+        """
+        match = _EXPRESSION.match(text)
+        if match is None:
+            raise ValueError(f"Invalid dice expression: {text}")
+        count, sides, sign, modifier = match.groups()
+        count, sides, modifier = int(count or 1), int(sides), int(modifier or 0)
+        if count < 1 or sides < 1:
+            raise ValueError(f"Invalid dice expression: {text}")
+        return cls(count, sides, -modifier if sign == "-" else modifier)
+
+    @property
+    def minimum(self):
+        return self.count + self.modifier
+
+    @property
+    def maximum(self):
+        return self.count * self.sides + self.modifier
+
+    @property
+    def mean(self):
+        return self.count * (self.sides + 1) / 2 + self.modifier
+
+    def __str__(self):
+        modifier = f"{self.modifier:+d}" if self.modifier else ""
+        return f"{self.count}d{self.sides}{modifier}"
+
+
+@dataclass
+class Roll:
+    expression: DiceExpression
+    rolls: list
+    total: int
+
+
+class Dice:
+    """
+    Dice roller with its own random generator, so a game can be replayed from its seed.
+
+    Every roll is kept in log (the most recent log_size), so the results can be checked afterwards.
+    """
+
+    def __init__(self, seed=None, log_size=1000):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.log = deque(maxlen=log_size)
+
+    def _faces(self, sides, count):
+        return self.rng.choices(range(1, sides + 1), k=count)
+
+    def roll(self, expression):
+        """
+        Rolls an expression (a DiceExpression or a string such as "2d6+3") and returns the Roll.
+        """
+        if isinstance(expression, str):
+            expression = DiceExpression.parse(expression)
+        rolls = self._faces(expression.sides, expression.count)
+        result = Roll(expression, rolls, sum(rolls) + expression.modifier)
+        self.log.append(result)
+        return result
+
+    def roll_many(self, expression, times):
+        """
+        Rolls an expression times times and returns the totals.
+
+        The dice of every roll are drawn in one batch, which is several times faster than calling roll in a loop.
+        Batched rolls are not logged one by one.
+        """
+        if isinstance(expression, str):
+            expression = DiceExpression.parse(expression)
+        faces = self._faces(expression.sides, expression.count * times)
+        if expression.count == 1:
+            return [face + expression.modifier for face in faces]
+        return [sum(group) + expression.modifier for group in zip(*[iter(faces)] * expression.count)]
+
+    def d20(self, advantage=False, disadvantage=False):
+        """
+        Rolls a d20, twice with advantage or disadvantage (which cancel each other out).
+
+        Returns:
+            (the kept die, every die rolled).
+        """
+        if advantage == disadvantage:
+            rolls = self._faces(20, 1)
+            kept = rolls[0]
+        else:
+            rolls = self._faces(20, 2)
+            kept = max(rolls) if advantage else min(rolls)
+        self.log.append(Roll(DiceExpression(len(rolls), 20), rolls, kept))
+        return kept, rolls
+
+
+def band(total, natural=None):
+    """
+    Returns the outcome band of a check total: a natural 1 is always catastrophic and a natural 20 always perfect.
+    """
+    if natural == 1:
+        return BANDS[0][1]
+    if natural == 20:
+        return BANDS[-1][1]
+    label = BANDS[0][1]
+    for lowest, name in BANDS:
+        if total >= lowest:
+            label = name
+    return label
+
+
+def proficiency_bonus(level):
+    return 2 + (max(level, 1) - 1) // 4
+
+
+@dataclass
+class CheckResult:
+    """
+    Result of a skill check or saving throw: the kept die, every die rolled, the bonus added and the outcome band.
+    """
+    name: str
+    natural: int
+    rolls: list
+    bonus: int
+    total: int
+    band: str
+    dc: int = None
+    success: bool = None
+    proficient: bool = False
+
+    def describe(self):
+        """
+        Returns the full roll for the player, e.g. "Stealth check: 14 +2 = 16 (great)".
+        """
+        dice = self.rolls[0] if len(self.rolls) == 1 else f"{self.natural} of {self.rolls}"
+        bonus = f" {self.bonus:+d} = {self.total}" if self.bonus else ""
+        against = "" if self.dc is None else f" against DC {self.dc}: {'success' if self.success else 'failure'}"
+        return f"{self.name}: {dice}{bonus} ({self.band}){against}"
+
+    def outcome(self):
+        """
+        Returns only what the Dungeon Master needs to know, e.g. "[Stealth check: great]".
+        """
+        result = f", {'success' if self.success else 'failure'}" if self.dc is not None else ""
+        return f"[{self.name}: {self.band}{result}]"
+
+
+def _check(name, proficient, level, dice, advantage, disadvantage, modifier, dc):
+    natural, rolls = dice.d20(advantage, disadvantage)
+    bonus = (proficiency_bonus(level) if proficient else 0) + modifier
+    total = natural + bonus
+    #a natural 20 or 1 only decides attack rolls: checks and saves succeed on the total alone
+    success = None if dc is None else total >= dc
+    return CheckResult(name, natural, rolls, bonus, total, band(total, natural), dc, success, proficient)
+
+
+def skill_check(character, skill, dice, advantage=False, disadvantage=False, modifier=0, dc=None):
+    """
+    Rolls a skill check for a PlayableCharacter: a d20, plus its proficiency bonus if it has the
+    skill-<skill> proficiency, plus modifier (e.g. the ability modifier).
+
+    Raises:
+        ValueError: If skill is not one of SKILL_ABILITIES.
+    """
+    if skill not in SKILL_ABILITIES:
+        raise ValueError(f"Invalid skill: {skill}. Must be one of: {', '.join(SKILL_ABILITIES)}")
+    proficient = f"skill-{skill}" in character.proficiencies
+    name = f"{skill.replace('-', ' ').capitalize()} check"
+    return _check(name, proficient, character.get_level(), dice, advantage, disadvantage, modifier, dc)
+
+
+def saving_throw(character, ability, dice, advantage=False, disadvantage=False, modifier=0, dc=None):
+    """
+    Rolls a saving throw for a PlayableCharacter, adding its proficiency bonus if ability is one of its saving_throws.
+
+    Raises:
+        ValueError: If ability is not one of ABILITIES.
+    """
+    if ability not in ABILITIES:
+        raise ValueError(f"Invalid ability: {ability}. Must be one of: {', '.join(ABILITIES)}")
+    proficient = ability in character.saving_throws
+    return _check(f"{ability.upper()} saving throw", proficient, character.get_level(), dice, advantage, disadvantage, modifier, dc)
+
+
+_COMMAND = re.compile(r"^/(check|save)\s+([a-z-]+)((?:\s+(?:adv|dis|dc\d+|[+-]\d+)(?=\s|$))*)\s*(.*)$", re.IGNORECASE | re.DOTALL)
+
+
+def parse_command(message):
+    """
+    Parses a roll command of the game loop, such as "/check stealth adv I sneak past the guard" or
+    "/save dex dc15 +1 I jump aside": the kind ("check" or "save"), the skill or ability, the roll
+    options (advantage, disadvantage, dc, modifier) and the rest of the message.
+
+    Returns None if message is not a roll command.
+    """
+    match = _COMMAND.match(message.strip())
+    if match is None:
+        return None
+    kind, target, flags, rest = match.groups()
+    options = {"advantage": False, "disadvantage": False, "dc": None, "modifier": 0}
+    for flag in flags.lower().split():
+        if flag == "adv":
+            options["advantage"] = True
+        elif flag == "dis":
+            options["disadvantage"] = True
+        elif flag.startswith("dc"):
+            options["dc"] = int(flag[2:])
+        else:
+            options["modifier"] += int(flag)
+    return kind.lower(), target.lower(), options, rest.strip()
+
+
+def resolve_command(character, message, dice):
+    """
+    Rolls the check of a roll command for character.
+
+    Returns:
+        (the CheckResult, the message for the model: the outcome band followed by the rest of the
+        player message), or None if message is not a roll command.
+
+    Raises:
+        ValueError: If the skill or ability is not valid.
+    """
+    command = parse_command(message)
+    if command is None:
+        return None
+    kind, target, options, rest = command
+    roll = skill_check if kind == "check" else saving_throw
+    result = roll(character, target, dice, **options)
+    return result, f"{result.outcome()} {rest}".strip()
@@ -1,33 +1,139 @@
-from typing import Final
+from __future__ import annotations
+from typing import Final, TYPE_CHECKING
 import os
-from discord import Intents, Client, Message
-import json
+import logging
+import time
+from contextlib import aclosing
+from streaming import relay_stream, iterate_in_thread
+from sessions import SessionManager
+from pipeline import ChannelPipeline, LoopLagMonitor, OutboundQueue, OutboundTarget
 
+if TYPE_CHECKING:
+    from discord import Client, Message
 
-TOKEN = json.load(open("settings.json"))["discord"]["token"]
-intents = Intents.default()
-intents.message_content = True
+logger = logging.getLogger(__name__)
+
+def get_token() -> str:
+    """
+    Returns the bot token, read from the settings of the app when it is first needed.
+    """
+    from dungeonmasterai import app
+    return app.settings.get()["discord"]["token"]
+
+def create_client() -> Client:
+    """
+    Creates the Discord client; discord is only imported here, when the bot actually starts.
+    """
+    from discord import Intents, Client
+    intents = Intents.default()
+    intents.message_content = True
+    return Client(intents=intents)
 
-client = Client(intents=intents)
 async def send_message(message: Message, user_message: str) -> None:
+    """
+    Queues the answer to a message behind the other turns of its channel and returns right away,
+    so the gateway loop is never blocked by lookups or model calls.
+    """
     if not user_message:
-        print("Message was empty")
+        logger.warning("Message was empty", extra={"event": "empty_message"})
         return
     
     if is_private := user_message[0] == "?":
         user_message = user_message[1:]
 
+    target = message.author if is_private else message.channel
+    key = ("private", message.author.id) if is_private else (message.guild.id if message.guild else None, message.channel.id)
+    if not get_pipeline().submit(key, answer_message, message, target, user_message):
+        posted = get_outbound().post(target, "The Dungeon Master is still answering the previous turns, please wait a moment.")
+        posted.add_done_callback(_log_post_failure)
+
+def _log_post_failure(posted) -> None:
+    """
+    Logs the error of a message posted without waiting for it, so a failed post is not silently dropped.
+    """
+    if not posted.cancelled() and posted.exception() is not None:
+        logger.error("Could not post message", exc_info=posted.exception(), extra={"event": "post_failed"})
+
+async def answer_message(message: Message, target, user_message: str) -> None:
+    pipeline = get_pipeline()
+    outbound = get_outbound()
     try:
-        response = get_response(user_message)
-        await message.author.send(response) if is_private else message.channel.send(response)
-    except Exception as e:
-        print(e)
+        response = await pipeline.run_blocking(get_response, user_message)
+        if isinstance(response, str):
+            #short replies are coalesced with the other messages queued for the channel
+            await outbound.post(target, response)
+        elif response is not None:
+            #streamed replies are posted on the first chunk and edited as the rest arrives
+            async with aclosing(iterate_in_thread(response, pipeline.executor)) as chunks:
+                await relay_stream(OutboundTarget(outbound, target), chunks)
+        elif (answer := await pipeline.run_blocking(get_router().answer, user_message)) is not None:
+            #rules questions are answered from the SRD data, without a model call
+            await outbound.post(target, answer)
+        else:
+            #everything else is a turn of the campaign running in this channel
+            key = (message.guild.id if message.guild else None, message.channel.id)
+            start = time.perf_counter()
+            #closed even if relaying fails, to release the session lock and model call slot right away
+            async with aclosing(get_sessions().stream(key, user_message)) as chunks:
+                await relay_stream(OutboundTarget(outbound, target), chunks)
+            get_router().record_forwarded(time.perf_counter() - start)
+    except Exception:
+        logger.exception("Could not answer message", extra={"event": "reply_failed", "channel": message.channel.id})
+
+_pipeline = None
+_outbound = None
+_lag_monitor = None
+
+def get_pipeline() -> ChannelPipeline:
+    """
+    Returns the ChannelPipeline running the turns of every channel, creating it (and starting the
+    event loop lag monitor) on first use, from the event loop.
+    """
+    global _pipeline, _lag_monitor
+    if _pipeline is None:
+        _pipeline = ChannelPipeline(workers=16, max_pending=20)
+        _lag_monitor = LoopLagMonitor()
+        _lag_monitor.start()
+    return _pipeline
+
+def get_outbound() -> OutboundQueue:
+    """
+    Returns the OutboundQueue pacing the messages sent to every channel, creating it on first use.
+    """
+    global _outbound
+    if _outbound is None:
+        _outbound = OutboundQueue()
+    return _outbound
+
+_sessions = None
+
+def get_sessions() -> SessionManager:
+    """
+    Returns the SessionManager hosting one campaign per channel, creating it on first use.
+    """
+    global _sessions
+    if _sessions is None:
+        from dungeonmasterai import app
+        _sessions = SessionManager(app.model.get(), max_concurrency=16)
+    return _sessions
+
+_router = None
+
+def get_router():
+    """
+    Returns the Router answering the rules questions locally, creating it on first use.
+    """
+    global _router
+    if _router is None:
+        from router import Router
+        _router = Router()
+    return _router
 
 def get_response(user_input: str) -> str:
     lowered = user_input.lower()
 
     if lowered == "hello":
-        print("hello there")
+        logger.info("hello there", extra={"event": "greeting"})
     
 
 
@@ -39,4 +145,6 @@ def test():
 
 
 if __name__ == "__main__":
+    from logs import setup_logging
+    setup_logging()
     test()
\ No newline at end of file
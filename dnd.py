@@ -1,13 +1,202 @@
+import asyncio
 import requests
 import json
-from dataclasses import dataclass, field
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
+from srdcache import SRDCache
+from srdclient import SRDClient
+from snapshot import Snapshot
+from spellindex import SpellIndex, on_spell_list
+from equipmentindex import EquipmentIndex, format_copper
+from nameindex import NameIndex
+import savefile
+import choices
+import metrics
 
-@dataclass
-class Spell:
+API_URL = "https://www.dnd5eapi.co/api/"
+SNAPSHOT_PATH = os.environ.get("DND_SNAPSHOT", "srd_snapshot.json")
+OFFLINE = os.environ.get("DND_OFFLINE") == "1" #only serve lookups from the snapshot and the cache
+
+client = SRDClient(API_URL)
+cache = SRDCache("srd_cache.db")
+snapshot = Snapshot(SNAPSHOT_PATH)
+
+logger = logging.getLogger(__name__)
+
+def _endpoint(path):
+    """
+    Given an API path, returns its endpoint for metrics: "spells/fireball" -> "spells/{index}", "classes/wizard/spells" -> "classes/{index}/spells".
+    """
+    parts = path.split("/")
+    if len(parts) == 1:
+        return parts[0]
+    return "/".join([parts[0], "{index}"] + parts[2:])
+
+def _request(path):
+    """
+    Given an API path, requests it from the API and returns the decoded JSON response, or None if it was not found.
+    """
+    endpoint = _endpoint(path)
+    try:
+        with metrics.timed("srd_request_seconds", endpoint=endpoint):
+            return client.get_json(path)
+    except requests.RequestException:
+        metrics.inc("srd_request_errors_total", endpoint=endpoint)
+        raise
+
+def _fetch(path):
+    """
+    Given an API path such as "spells/fireball", returns the decoded JSON response, or None if it was not found.
+
+    Lookups are served from the offline snapshot first, then from the cache while entries are fresh.
+    If the API cannot be reached, an expired cache entry is served instead.
+    """
+    endpoint = _endpoint(path)
+    data = snapshot.get(path)
+    if data is not None:
+        metrics.inc("srd_lookups_total", endpoint=endpoint, source="snapshot")
+        return data
+    data = cache.get(path, allow_stale=OFFLINE)
+    if data is not None or OFFLINE:
+        metrics.inc("srd_lookups_total", endpoint=endpoint, source="cache" if data is not None else "missing")
+        return data
+    try:
+        data = _request(path)
+    except requests.RequestException as e:
+        logger.warning("SRD API unreachable for %s, serving the cached entry if any", path,
+                       extra={"event": "srd_unreachable", "path": path, "error": str(e)})
+        metrics.inc("srd_lookups_total", endpoint=endpoint, source="stale")
+        return cache.get(path, allow_stale=True)
+    metrics.inc("srd_lookups_total", endpoint=endpoint, source="api" if data is not None else "missing")
+    if data is not None:
+        cache.put(path, data)
+    return data
+
+class _Nested:
+    """
+    Record field for rarely used nested JSON. All the nested fields of a record are kept together
+    as one compact JSON string and decoded on the first access to any of them.
+    """
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, record, owner = None):
+        if record is None:
+            return self
+        return record._nested_values().get(self.name)
+
+    def __set__(self, record, value):
+        record._nested_values()[self.name] = value
+
+class _Record:
+    """
+    Base of the SRD record types. Records are slotted dataclasses whose short strings are interned,
+    since many of them stay resident at once.
+    """
+    __slots__ = ()
+    _layouts = {}
+
+    @classmethod
+    def _layout(cls):
+        layout = _Record._layouts.get(cls)
+        if layout is None:
+            eager = [f.name for f in fields(cls) if not f.name.startswith("_")]
+            nested = [name for name, value in vars(cls).items() if isinstance(value, _Nested)]
+            layout = _Record._layouts[cls] = (eager, nested)
+        return layout
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        Given an API response, returns the record. Unknown keys are ignored and missing ones default to None.
+        """
+        eager, nested = cls._layout()
+        values = {}
+        for name in eager:
+            value = data.get(name)
+            if type(value) is str and len(value) <= 64:
+                value = sys.intern(value)
+            values[name] = value
+        nested_values = {name: data[name] for name in nested if data.get(name) is not None}
+        return cls(**values, _nested=json.dumps(nested_values, separators=(",", ":")) if nested_values else "")
+
+    def to_json(self):
+        eager, nested = self._layout()
+        data = {name: getattr(self, name) for name in eager}
+        data.update(self._nested_values())
+        return data
+
+    def _nested_values(self):
+        if self._decoded is None:
+            self._decoded = json.loads(self._nested) if self._nested else {}
+        return self._decoded
+
+#NameIndex of each collection, or the time (time.monotonic) until which its list is known to be unavailable
+_name_indexes = {}
+_name_indexes_lock = threading.Lock()
+#time before fetching a collection list again after it could not be fetched, in seconds
+NAME_INDEX_RETRY = 30.0
+
+def get_name_index(collection):
+    """
+    Given a collection such as "spells", returns the NameIndex of its entries, or None if the collection
+    list is not available.
+
+    The index is built from the offline snapshot or the (cached) list endpoint on the first call and reused
+    for the rest of the process. A list that cannot be fetched is not asked for again for NAME_INDEX_RETRY
+    seconds, so an unreachable API costs one request per collection rather than one per lookup.
+    """
+    index = _name_indexes.get(collection)
+    if isinstance(index, NameIndex):
+        return index
+    with _name_indexes_lock:
+        index = _name_indexes.get(collection)
+        if isinstance(index, NameIndex):
+            return index
+        if index is not None and time.monotonic() < index:
+            return None
+        listing = _fetch(collection)
+        if listing is None:
+            _name_indexes[collection] = time.monotonic() + NAME_INDEX_RETRY
+            return None
+        index = _name_indexes[collection] = NameIndex((r["index"], r["name"]) for r in listing["results"])
+    return index
+
+def suggest_names(collection, name, limit = 5):
+    """
+    Given a collection and a misspelled name, returns the display names of the closest entries, best first.
+    """
+    index = get_name_index(collection)
+    if index is None:
+        return []
+    return [index.names[match] for match, score in index.suggest(name, limit)]
+
+def _resolve_name(collection, name, kind):
+    """
+    Given a name, returns the index it refers to in collection, or None after logging the closest matches.
+    If the collection list is not available, the name is returned unchanged and left to the API.
+    """
+    index = get_name_index(collection)
+    if index is None:
+        return name
+    match = index.resolve(name)
+    if match is None:
+        suggestions = suggest_names(collection, name, 3)
+        hint = f" Did you mean {' or '.join(suggestions)}?" if suggestions else ""
+        logger.info("%s %s not found.%s", kind, name, hint,
+                    extra={"event": "name_not_found", "collection": collection, "query": name, "suggestions": suggestions})
+    return match
+
+@dataclass(slots=True)
+class Spell(_Record):
     index: str
     name: str
     desc: list
-    higher_level: list
     range: str
     components: list
     material: str
@@ -16,45 +205,53 @@ class Spell:
     concentration: bool
     casting_time: str
     level: int
-    school: str
+    school: dict
     classes: list
     subclasses: list
-    damage: dict
-    dc: dict
-    area_of_effect: dict
     url: str
     updated_at: str
     count: int = field(default=None)
     results: str = field(default=None)
+    _nested: str = field(default="", repr=False)
+    _decoded: dict = field(default=None, repr=False, compare=False)
+
+    higher_level = _Nested()
+    damage = _Nested()
+    dc = _Nested()
+    area_of_effect = _Nested()
 
 def get_spell(spell_name = "NaN"):
     """
     Given a spell name, returns a Spell object with the properties of the spell. If the given name is "NaN", returns None.
+    Display names are accepted, and unknown names are rejected locally with suggestions instead of a request.
     """
-    ulr = "https://www.dnd5eapi.co/api/spells/" + spell_name
-    response = requests.get(ulr)
-    if response.status_code == 200:
-        return Spell(**response.json())
+    spell_index = _resolve_name("spells", spell_name, "Spell")
+    if spell_index is None:
+        return None
+    data = _fetch("spells/" + spell_index)
+    if data is not None:
+        return Spell.from_json(data)
     else:
-        print(f"Spell {spell_name} not found")
+        logger.info("Spell %s not found", spell_name, extra={"event": "not_found", "query": spell_name})
         return None
     
-@dataclass
-class ClassSpell:
+@dataclass(slots=True)
+class ClassSpell(_Record):
     count: int = field(default=None)
     results: list = field(default=None)
+    _nested: str = field(default="", repr=False)
+    _decoded: dict = field(default=None, repr=False, compare=False)
     
 def get_class_spell(character_class = "NaN"):
-    ulr = f"https://www.dnd5eapi.co/api/classes/{character_class.lower()}/spells/"
-    response = requests.get(ulr)
-    if response.status_code == 200:
-        return ClassSpell(**response.json())
+    data = _fetch(f"classes/{character_class.lower()}/spells")
+    if data is not None:
+        return ClassSpell.from_json(data)
     else:
-        print(f"Class {character_class} not found")
+        logger.info("Class %s not found", character_class, extra={"event": "not_found", "query": character_class})
         return None
 
-@dataclass
-class Item:
+@dataclass(slots=True)
+class Item(_Record):
     desc: list
     special: list
     index: str
@@ -62,85 +259,121 @@ class Item:
     equipment_category: dict
     gear_category: dict
     cost: dict
-    #weight: str
+    weight: float
     url: str
     updated_at: str
-    contents: list
-    properties: list
+    _nested: str = field(default="", repr=False)
+    _decoded: dict = field(default=None, repr=False, compare=False)
+
+    contents = _Nested()
+    properties = _Nested()
 
 def get_item(item_name = "NaN"):
     """
     Given an item name, returns an Item object with the properties of the item. If the given name is "NaN", returns None.
     """
-    url = "https://www.dnd5eapi.co/api/equipment/" + item_name
-    response = requests.get(url)
-    if response.status_code == 200:
-        return Item(**response.json())
+    item_index = _resolve_name("equipment", item_name, "Item")
+    if item_index is None:
+        return None
+    data = _fetch("equipment/" + item_index)
+    if data is not None:
+        return Item.from_json(data)
     else:
-        print(f"Item {item_name} not found")
+        logger.info("Item %s not found", item_name, extra={"event": "not_found", "query": item_name})
         return None
 
-@dataclass
-class MagicItem:
+@dataclass(slots=True)
+class EquipmentCategory(_Record):
+    index: str
+    name: str
+    equipment: list
+    url: str
+    updated_at: str
+    _nested: str = field(default="", repr=False)
+    _decoded: dict = field(default=None, repr=False, compare=False)
+
+def get_equipment_category(category = "NaN"):
+    """
+    Given an equipment category index, returns an EquipmentCategory object listing the equipment of the category. If it is not found, returns None.
+    """
+    data = _fetch("equipment-categories/" + category)
+    if data is not None:
+        return EquipmentCategory.from_json(data)
+    else:
+        logger.info("Equipment category %s not found", category, extra={"event": "not_found", "query": category})
+        return None
+
+def _category_equipment(category):
+    equipment_category = get_equipment_category(category)
+    return equipment_category.equipment if equipment_category is not None else None
+
+@dataclass(slots=True)
+class MagicItem(_Record):
     index: str
     name: str
     equipment_category: dict
     rarity: dict
-    variants: list
     variant: bool
     desc: list
     image: str
     url: str
     updated_at: str
+    _nested: str = field(default="", repr=False)
+    _decoded: dict = field(default=None, repr=False, compare=False)
+
+    variants = _Nested()
 
 def get_magic_item(item_name = "NaN"):
     """
     Given an item name, returns an MagicItem object with the properties of the item. If the given name is "NaN", returns None.
     """
-    url = "https://www.dnd5eapi.co/api/magic-items/" + item_name
-    response = requests.get(url)
-    if response.status_code == 200:
-        return MagicItem(**response.json())
+    item_index = _resolve_name("magic-items", item_name, "Item")
+    if item_index is None:
+        return None
+    data = _fetch("magic-items/" + item_index)
+    if data is not None:
+        return MagicItem.from_json(data)
     else:
-        print(f"Item {item_name} not found")
+        logger.info("Item %s not found", item_name, extra={"event": "not_found", "query": item_name})
         return None
     
-@dataclass
-class PlayerClass:
+@dataclass(slots=True)
+class PlayerClass(_Record):
     index: str
     name: str
     url: str
     hit_die: int
     class_levels: str
-    subclasses: list
-    multi_classing: dict
-    proficiency_choices: list
     proficiencies: list
     saving_throws: list
     starting_equipment: list
-    starting_equipment_options: list
     updated_at: str
-    spellcasting: dict = field(default=None)
     spells: list = field(default=None)
+    _nested: str = field(default="", repr=False)
+    _decoded: dict = field(default=None, repr=False, compare=False)
+
+    subclasses = _Nested()
+    multi_classing = _Nested()
+    proficiency_choices = _Nested()
+    starting_equipment_options = _Nested()
+    spellcasting = _Nested()
 
 def get_player_class(class_name = "NaN"):
     """
     Given an item name, returns an MagicItem object with the properties of the item. If the given name is "NaN", returns None.
     """
-    url = "https://www.dnd5eapi.co/api/classes/" + class_name
-    response = requests.get(url)
-    if response.status_code == 200:
-        return PlayerClass(**response.json())
+    data = _fetch("classes/" + class_name)
+    if data is not None:
+        return PlayerClass.from_json(data)
     else:
-        print(f"Class {class_name} not found")
+        logger.info("Class %s not found", class_name, extra={"event": "not_found", "query": class_name})
         return None
 
-@dataclass
-class Race:
+@dataclass(slots=True)
+class Race(_Record):
     index: str
     name: str
     speed: int
-    ability_bonuses: list
     alignment: str
     age: str
     size: str
@@ -148,29 +381,34 @@ class Race:
     starting_proficiencies: list
     languages: list
     language_desc: str
-    traits: list
-    subraces: list
     url: str
     updated_at: str
-    starting_proficiency_options: list = field(default=None)
-    language_options: list = field(default=None)
+    _nested: str = field(default="", repr=False)
+    _decoded: dict = field(default=None, repr=False, compare=False)
+
+    ability_bonuses = _Nested()
+    traits = _Nested()
+    subraces = _Nested()
+    starting_proficiency_options = _Nested()
+    language_options = _Nested()
 
 def get_player_race(race = "NaN"):
     """
     Given an race, returns an Race object with the properties of the race. If the given name is "NaN", returns None.
     """
-    url = "https://www.dnd5eapi.co/api/races/" + race
-    response = requests.get(url)
-    if response.status_code == 200:
-        return Race(**response.json())
+    data = _fetch("races/" + race)
+    if data is not None:
+        return Race.from_json(data)
     else:
-        print(f"Race {race} not found")
+        logger.info("Race %s not found", race, extra={"event": "not_found", "query": race})
         return None
 
-@dataclass
-class AllLanguages:
+@dataclass(slots=True)
+class AllLanguages(_Record):
     count: int
     results: list
+    _nested: str = field(default="", repr=False)
+    _decoded: dict = field(default=None, repr=False, compare=False)
     """type: str = field(default=None)
     index: str = field(default=None)
     name: str = field(default=None)
@@ -183,15 +421,14 @@ def get_all_languages():
     """
     Given an race, returns an Race object with the properties of the race. If the given name is "NaN", returns None.
     """
-    url = "https://www.dnd5eapi.co/api/languages/"
-    response = requests.get(url)
-    if response.status_code == 200:
-        return AllLanguages(**response.json())
+    data = _fetch("languages")
+    if data is not None:
+        return AllLanguages.from_json(data)
     else:
         return None
     
-@dataclass
-class Languages:
+@dataclass(slots=True)
+class Languages(_Record):
     index: str
     name: str
     type: str
@@ -200,17 +437,172 @@ class Languages:
     updated_at: str
     desc: str = field(default=None)
     script: str = field(default=None)
+    _nested: str = field(default="", repr=False)
+    _decoded: dict = field(default=None, repr=False, compare=False)
 
 def get_language(language = "NaN"):
     """
     Given an race, returns an Race object with the properties of the race. If the given name is "NaN", returns None.
     """
-    url = "https://www.dnd5eapi.co/api/languages/" + language
-    response = requests.get(url)
-    if response.status_code == 200:
-        return Languages(**response.json())
+    data = _fetch("languages/" + language)
+    if data is not None:
+        return Languages.from_json(data)
+    else:
+        return None
+
+BATCH_WORKERS = 8
+
+class BatchResult(list):
+    """
+    Results of a batch lookup, in the order they were requested, with None for the entries that were not found.
+    elapsed holds the time the batch took, in seconds.
+    """
+    elapsed = 0.0
+
+def _get_many(getter, indexes, max_workers):
+    start = time.perf_counter()
+    indexes = list(indexes)
+    if len(indexes) <= 1 or max_workers <= 1:
+        results = BatchResult(getter(index) for index in indexes)
     else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(indexes))) as pool:
+            results = BatchResult(pool.map(getter, indexes))
+    results.elapsed = time.perf_counter() - start
+    return results
+
+def get_spells(spell_names, max_workers = BATCH_WORKERS):
+    """
+    Given a list of spell names, returns a BatchResult with a Spell (or None) for each of them, fetching at most max_workers at a time.
+    """
+    return _get_many(get_spell, spell_names, max_workers)
+
+def get_class_spells(character_classes, max_workers = BATCH_WORKERS):
+    """
+    Given a list of classes, returns a BatchResult with a ClassSpell (or None) for each of them, fetching at most max_workers at a time.
+    """
+    return _get_many(get_class_spell, character_classes, max_workers)
+
+def get_items(item_names, max_workers = BATCH_WORKERS):
+    """
+    Given a list of item names, returns a BatchResult with an Item (or None) for each of them, fetching at most max_workers at a time.
+    """
+    return _get_many(get_item, item_names, max_workers)
+
+def get_magic_items(item_names, max_workers = BATCH_WORKERS):
+    """
+    Given a list of item names, returns a BatchResult with a MagicItem (or None) for each of them, fetching at most max_workers at a time.
+    """
+    return _get_many(get_magic_item, item_names, max_workers)
+
+def get_player_classes(class_names, max_workers = BATCH_WORKERS):
+    """
+    Given a list of class names, returns a BatchResult with a PlayerClass (or None) for each of them, fetching at most max_workers at a time.
+    """
+    return _get_many(get_player_class, class_names, max_workers)
+
+def get_player_races(races, max_workers = BATCH_WORKERS):
+    """
+    Given a list of races, returns a BatchResult with a Race (or None) for each of them, fetching at most max_workers at a time.
+    """
+    return _get_many(get_player_race, races, max_workers)
+
+def get_languages(languages, max_workers = BATCH_WORKERS):
+    """
+    Given a list of languages, returns a BatchResult with a Languages object (or None) for each of them, fetching at most max_workers at a time.
+    """
+    return _get_many(get_language, languages, max_workers)
+
+_speaker_languages = None
+_speaker_languages_lock = threading.Lock()
+
+def get_languages_spoken_by(speaker):
+    """
+    Given a typical speaker such as "Elves", returns the indexes of the languages they speak.
+
+    The speaker -> languages index is built from the language data on the first call and reused
+    for the rest of the process.
+    """
+    global _speaker_languages
+    if _speaker_languages is None:
+        with _speaker_languages_lock:
+            if _speaker_languages is None:
+                index = {}
+                all_languages = get_all_languages()
+                languages = get_languages([result["index"] for result in all_languages.results], max_workers=16)
+                for language in languages:
+                    for typical_speaker in language.typical_speakers:
+                        index.setdefault(typical_speaker, []).append(language.index)
+                _speaker_languages = index
+    return list(_speaker_languages.get(speaker, []))
+
+_spell_index = None
+_spell_index_lock = threading.Lock()
+
+def _cached_spells():
+    """
+    Returns every SRD spell from the cache, or None if the spell list or any of its spells is not cached.
+    """
+    listing = cache.get("spells")
+    if listing is None:
         return None
+    spells = []
+    for result in listing["results"]:
+        data = cache.get("spells/" + result["index"])
+        if data is None:
+            return None
+        spells.append(Spell.from_json(data))
+    return spells
+
+def get_spell_index(fetch = True):
+    """
+    Returns the SpellIndex over every SRD spell, for compound spell queries.
+
+    The index is built on the first call, from the offline snapshot when there is one and otherwise
+    by fetching the whole spell list (one request per spell), and reused for the rest of the process.
+    If the spell list is not available, an empty index is returned and the next call tries again.
+
+    With fetch=False, the index is only built when that takes no request (from the snapshot, or from
+    the cache when it holds every spell), and None is returned otherwise.
+    """
+    global _spell_index
+    if _spell_index is None:
+        with _spell_index_lock:
+            if _spell_index is None:
+                if snapshot:
+                    spells = [Spell.from_json(data) for data in snapshot.collections["spells"].values()]
+                elif not fetch:
+                    spells = _cached_spells()
+                    if spells is None:
+                        return None
+                else:
+                    listing = _fetch("spells")
+                    if listing is None:
+                        return SpellIndex()
+                    spells = get_spells([result["index"] for result in listing["results"]], max_workers=16)
+                _spell_index = SpellIndex(spell for spell in spells if spell is not None)
+    return _spell_index
+
+def _fetch_item(item_index):
+    data = _fetch("equipment/" + item_index)
+    return Item.from_json(data) if data is not None else None
+
+_equipment_index = None
+_equipment_index_lock = threading.Lock()
+
+def get_equipment_index():
+    """
+    Returns the EquipmentIndex holding the weight and value of the equipment.
+
+    The index is created on the first call, with every item of the offline snapshot when there is one, and
+    reused for the rest of the process; items that are not in it yet are fetched on their first lookup.
+    """
+    global _equipment_index
+    if _equipment_index is None:
+        with _equipment_index_lock:
+            if _equipment_index is None:
+                items = [Item.from_json(data) for data in snapshot.collections.get("equipment", {}).values()] if snapshot else []
+                _equipment_index = EquipmentIndex(items, loader=lambda indexes: _get_many(_fetch_item, indexes, BATCH_WORKERS))
+    return _equipment_index
 
 class PlayableCharacter:
     valid_backgrounds = ["acolyte", "charlatan", "criminal", "entertainer", "folk-hero", "guild-artisan", "hermit", "noble", "outlander", "sage", "sailor", "soldier", "urchin"]
@@ -227,92 +619,176 @@ class PlayableCharacter:
                                 "human": "Humans",
                                 "tiefling": "Devils"}
     
+    #carrying capacity in pounds per point of strength, and the multiplier of each size
+    CARRY_PER_STRENGTH = 15
+    SIZE_CARRY_MULTIPLIERS = {"Tiny": 0.5, "Small": 1, "Medium": 1, "Large": 2, "Huge": 4, "Gargantuan": 8}
+
     valid_classes = ["barbarian", "bard", "cleric", "druid", "fighter", "monk", "paladin", "ranger", "rogue", "sorcerer", "warlock", "wizard"]
     valid_subclasses = [None, "berzerk", "champion", "devotion", "draconic", "evocation", "fiend", "hunter", "land", "life", "lore", "open-hand", "thief"]
-    def __init__(self, name = None, background = None, alignment = None, race = None, player_class = None, player_subclass = None):
+    def __init__(self, name = None, background = None, alignment = None, race = None, player_class = None, player_subclass = None, equipment_choices = None, proficiency_choices = None, choice_policy = None, strength = 10):
+        """
+        Creates a level 1 character, fetching its class, race, spells and languages one after another.
+
+        equipment_choices is a list with one selection per starting equipment option of the class: a letter
+        ("a", "b", ...) or the index of the equipment to take ("longsword" for "any martial melee weapon").
+        proficiency_choices is a list with one list of proficiency indexes per proficiency choice. Choices
+        that are not given are made by choice_policy (see choices.first_options and choices.RandomOptions)
+        or, without a policy, the player is prompted for them.
+        strength is the strength score before the racial bonus; it sets the carrying capacity.
+        """
+        self._validate(background, alignment, race, player_class, player_subclass)
+        char_class = get_player_class(player_class)
+        char_race = get_player_race(race)
+        char_spells = get_class_spell(player_class)
+        known_languages = get_languages_spoken_by(self.race_language_convertion[race])
+        prompt = choices.prompt_player if choice_policy is None else None
+        equipment = self._choose_equipment(char_class, equipment_choices, choice_policy, prompt)
+        proficiencies = self._choose_proficiencies(char_class, proficiency_choices, choice_policy, prompt)
+        items = get_items([index for index, quantity in equipment])
+        cantrips = self._cantrips(char_spells)
+        self._setup(name, background, alignment, race, player_subclass, char_class, char_race, equipment, items,
+                    cantrips, known_languages, proficiencies, strength)
+
+    @classmethod
+    async def build(cls, name = None, background = None, alignment = None, race = None, player_class = None, player_subclass = None, equipment_choices = None, proficiency_choices = None, choice_policy = None, strength = 10):
+        """
+        Creates a level 1 character without blocking the event loop.
+
+        The class, race, class spell list and language lookups are independent, so they run concurrently in
+        worker threads sharing the pooled HTTP client, followed by the batch lookup of the starting
+        equipment. Unlike the constructor, build never prompts: equipment_choices and
+        proficiency_choices must be given, or a choice_policy to make the missing choices.
+
+        Returns:
+            The new PlayableCharacter.
+        """
+        cls._validate(background, alignment, race, player_class, player_subclass)
+        if (equipment_choices is None or proficiency_choices is None) and choice_policy is None:
+            raise ValueError("build() needs equipment_choices and proficiency_choices, or a choice_policy")
+        char_class, char_race, char_spells, known_languages = await asyncio.gather(
+            asyncio.to_thread(get_player_class, player_class),
+            asyncio.to_thread(get_player_race, race),
+            asyncio.to_thread(get_class_spell, player_class),
+            asyncio.to_thread(get_languages_spoken_by, cls.race_language_convertion[race]),
+        )
+        #expanding the choices may look up equipment categories; they run one after the other so that a
+        #seeded choice policy makes the same picks every time
+        equipment = await asyncio.to_thread(cls._choose_equipment, char_class, equipment_choices, choice_policy)
+        proficiencies = await asyncio.to_thread(cls._choose_proficiencies, char_class, proficiency_choices, choice_policy)
+        items = await asyncio.to_thread(get_items, [index for index, quantity in equipment])
+        cantrips = cls._cantrips(char_spells)
+        character = cls.__new__(cls)
+        character._setup(name, background, alignment, race, player_subclass, char_class, char_race, equipment, items,
+                         cantrips, known_languages, proficiencies, strength)
+        return character
+
+    @classmethod
+    def _validate(cls, background, alignment, race, player_class, player_subclass):
+        if background not in cls.valid_backgrounds:
+            raise ValueError(f"Invalid background: {background}. Must be one of: {', '.join(cls.valid_backgrounds)}")
+        if alignment not in cls.valid_alignments:
+            raise ValueError(f"Invalid alignment: {alignment}. Must be one of: {', '.join(cls.valid_alignments)}")
+        if race not in cls.valid_races:
+            raise ValueError(f"Invalid race: {race}. Must be one of: {', '.join(cls.valid_races)}")
+        if player_class not in cls.valid_classes:
+            raise ValueError(f"Invalid class: {player_class}. Must be one of: {', '.join(cls.valid_classes)}")
+        if player_subclass not in cls.valid_subclasses:
+            raise ValueError(f"Invalid subclass: {player_subclass}. Must be one of: {', '.join(cls.valid_subclasses)}")
+
+    @staticmethod
+    def _cantrips(char_spells):
+        """
+        Returns the indexes of the cantrips (level 0 spells) of a class spell list, or none if the list is not available.
+
+        The class spell list already gives the level of every spell, so no spell record is fetched here; expanding
+        a spell list into records (get_spell_index) goes through the get_spells batch.
+        """
+        if char_spells is None:
+            return []
+        return [spell["index"] for spell in char_spells.results if spell["level"] == 0]
+
+    @staticmethod
+    def _choose_equipment(char_class, equipment_choices, choice_policy = None, prompt = None):
+        """
+        Returns the (item index, quantity) pairs of the class starting equipment plus the chosen options.
+
+        Each option set is expanded with choices.expand, looking up the equipment categories it offers,
+        and resolved with the given selection, the choice policy, or by prompting.
+        """
+        equipment = [(entry["equipment"]["index"], entry["quantity"]) for entry in char_class.starting_equipment]
+
+        #For optional equipment
+        if equipment_choices is not None and len(equipment_choices) != len(char_class.starting_equipment_options):
+            raise ValueError(f"Expected {len(char_class.starting_equipment_options)} equipment choices, got {len(equipment_choices)}")
+        for i, option_set in enumerate(char_class.starting_equipment_options):
+            choice = choices.expand(option_set, _category_equipment)
+            selection = equipment_choices[i] if equipment_choices is not None else None
+            equipment.extend(choices.resolve(choice, selection, choice_policy, prompt))
+        return equipment
+
+    @staticmethod
+    def _choose_proficiencies(char_class, proficiency_choices, choice_policy = None, prompt = None):
+        """
+        Returns the indexes of the proficiencies chosen for the class proficiency choices.
+        """
+        if proficiency_choices is not None and len(proficiency_choices) != len(char_class.proficiency_choices):
+            raise ValueError(f"Expected {len(char_class.proficiency_choices)} proficiency choices, got {len(proficiency_choices)}")
+        proficiencies = []
+        for i, option_set in enumerate(char_class.proficiency_choices):
+            choice = choices.expand(option_set, _category_equipment)
+            selection = proficiency_choices[i] if proficiency_choices is not None else None
+            proficiencies.extend(index for index, count in choices.resolve(choice, selection, choice_policy, prompt))
+        return proficiencies
+
+    def _setup(self, name, background, alignment, race, player_subclass, char_class, char_race, equipment, items, cantrips, known_languages, proficiencies, strength = 10):
         self.name = name
-        if background not in self.valid_backgrounds:
-            raise ValueError(f"Invalid background: {background}. Must be one of: {', '.join(self.valid_backgrounds)}")
-        if alignment not in self.valid_alignments:
-            raise ValueError(f"Invalid alignment: {alignment}. Must be one of: {', '.join(self.valid_alignments)}")
-        if race not in self.valid_races:
-            raise ValueError(f"Invalid race: {race}. Must be one of: {', '.join(self.valid_races)}")
-        if player_class not in self.valid_classes:
-            raise ValueError(f"Invalid class: {player_class}. Must be one of: {', '.join(self.valid_classes)}")
-        if player_subclass not in self.valid_subclasses:
-            raise ValueError(f"Invalid subclass: {player_subclass}. Must be one of: {', '.join(self.valid_subclasses)}")
-        
         self.background = background
         self.alignment = alignment
         self.race = race
 
-        char_class = get_player_class(player_class)
         self.player_class = char_class.index
         self.player_subclass = player_subclass
 
         self.saving_throws = [dice["index"] for dice in char_class.saving_throws]
 
         self.inventory = {}
-        self.carry_capacity = 100 #depends from race
-        self.carry_current = 0
+        self.strength = strength + sum(bonus["bonus"] for bonus in (char_race.ability_bonuses or []) if bonus["ability_score"]["index"] == "str")
+        self.carry_capacity = self.CARRY_PER_STRENGTH * self.strength * self.SIZE_CARRY_MULTIPLIERS.get(char_race.size, 1)
+        self.carry_current = 0 #running totals of the inventory: weight in pounds and value in copper pieces
+        self.inventory_value = 0
 
-        #For starting equipment
-        for i in range(len(char_class.starting_equipment)):
-            self.add_item(char_class.starting_equipment[i]["equipment"]["index"], char_class.starting_equipment[i]["quantity"])
+        #For starting and optional equipment
+        for (index, quantity), item in zip(equipment, items):
+            if item is not None:
+                self.add_item(item, quantity)
 
-        #For optional equipment
-        for i in range(len(char_class.starting_equipment_options)):
-            temp_item = input(f"Would you like to take {char_class.starting_equipment_options[i]['desc']}? (a/b/c): ").lower()#number of options can vary
-            if temp_item == "a":
-                self.add_item(char_class.starting_equipment_options[i]["from"]["options"][0]['of']["index"], char_class.starting_equipment_options[i]["from"]["options"][0]["count"])
-            elif temp_item == "b": 
-                self.add_item(char_class.starting_equipment_options[i]["from"]["options"][1]['of']["index"], char_class.starting_equipment_options[i]["from"]["options"][1]["count"])
-            elif temp_item == "c":
-                self.add_item(char_class.starting_equipment_options[i]["from"]["options"][2]['of']["index"], char_class.starting_equipment_options[i]["from"]["options"][2]["count"])
-
-            else:
-                raise ValueError(f"Invalid input: {temp_item}. Must be one of: {', '.join(['a', 'b', 'c'])}")
-            
         self.equipped_items = {"Head": None, "Body": None, "Cape": None, "Hands": None, "Feet": None, "Main Hand": None, "Off Hand": None}
-            
+
         self.proficiencies = []
         #For proficiency
         for i in range(len(char_class.proficiencies)):
             self.proficiencies.append(char_class.proficiencies[i]["index"])
 
         #For proficiency options
-        for i in range(len(char_class.proficiency_choices)):
-            temp_choice = str(input(f"{char_class.proficiency_choices[i]["desc"]} (write the skill in lowercase and \'-\' for spaces): "))
-            choices = temp_choice.split(", ")
-            choices_list = list(choices)
-            for item in choices_list:
-                self.proficiencies.append(item)
+        self.proficiencies.extend(proficiencies)
 
         #For race proficiencies
-        char_race = get_player_race(self.race)
         for i in range(len(char_race.starting_proficiencies)):
             self.proficiencies.append(char_race.starting_proficiencies[i]["index"])
 
         self.spells = []
         #append spells if any for level 0
-        char_spells = get_class_spell(self.player_class)
-        for i in range(char_spells.count):
-            if char_spells.results[i]["level"] == 0:
-                self.spells.append(char_spells.results[i]["index"])
+        self.spells.extend(cantrips)
 
         #getting languages
-        char_languages = get_all_languages()
-        self.known_languages = []
-        for i in range(char_languages.count):
-            temp_lang = get_language(char_languages.results[i]["index"])
-            if self.race_language_convertion[self.race] in temp_lang.typical_speakers:
-                self.known_languages.append(char_languages.results[i]["index"])
-
+        self.known_languages = known_languages
 
         self.__level = 1
         self._level_acm = 0
         self._level_threshold = 100
 
+        self.version = 0 #version of the repository row this character was read from, 0 if never stored
+
     def get_player_name(self):
         return self.name
     
@@ -356,7 +832,9 @@ class PlayableCharacter:
         Checks if a player can add a given spell to their spellbook.
 
         Checks if the spell is of a level that the player can cast, and if it is
-        of a class or subclass that the player is capable of casting.
+        of a class or subclass that the player is capable of casting, using the
+        shared spell index when it can be had without a request (the spell record
+        itself otherwise).
 
         Args:
             spell: The spell to check.
@@ -364,13 +842,12 @@ class PlayableCharacter:
         Returns:
             True if the player can add the spell, False otherwise.
         """
-       
-        classes = [cls["name"] for cls in spell.classes]
-        subclasses = [subcls["name"] for subcls in spell.subclasses]
-        
-        if spell.level <= self.__level and (self.player_class in classes or self.player_subclass in subclasses):
-            return True
-        return False
+        if spell.level > self.__level:
+            return False
+        spell_index = get_spell_index(fetch=False)
+        if spell_index is None:
+            return on_spell_list(spell, self.player_class, self.player_subclass)
+        return spell_index.castable_by(spell, self.player_class, self.player_subclass)
     
     def add_spell(self, spell: Spell):
         """
@@ -385,28 +862,78 @@ class PlayableCharacter:
         if self.can_add_spell(spell):
             self.spells.append(spell.name)
         else:
-            print(f"{spell.name} is not a spell for your class.")
+            logger.info("%s is not a spell for your class.", spell.name, extra={"event": "spell_rejected", "spell": spell.index})
 
 
-    """def can_add_item(self, item: Item, quantity = 1):
-        if self.carry_current + (item.weight * quantity) <= self.carry_capacity:
-            return True
-        return False"""
+    @staticmethod
+    def _item_entry(item):
+        """
+        Returns the index of item (an Item or an index) and its (weight, value), from the equipment index.
+
+        Raises:
+            ValueError: If item is an index that is not a piece of equipment (or cannot be fetched).
+        """
+        index = get_equipment_index()
+        if isinstance(item, str):
+            entry = index.get(item)
+            if entry is None:
+                raise ValueError(f"{item} is not a piece of equipment")
+            return item, entry
+        if item.index not in index:
+            index.add(item)
+        return item.index, index.get(item.index)
+
+    def can_add_item(self, item, quantity = 1):
+        """
+        Checks if the character can carry quantity more of item (an Item or an index) without going over its carrying capacity.
+        An index that is not a piece of equipment cannot be added.
+        """
+        try:
+            weight = self._item_entry(item)[1][0]
+        except ValueError:
+            return False
+        return self.carry_current + weight * quantity <= self.carry_capacity
+
+    def encumbrance(self):
+        """
+        Returns how encumbered the character is by its inventory, following the variant encumbrance rule:
+        "unencumbered", "encumbered" over 5 times its strength in pounds, "heavily encumbered" over 10
+        times, and "over capacity" over its carrying capacity.
+        """
+        if self.carry_current > self.carry_capacity:
+            return "over capacity"
+        if self.carry_current > 10 * self.strength:
+            return "heavily encumbered"
+        if self.carry_current > 5 * self.strength:
+            return "encumbered"
+        return "unencumbered"
+
+    def get_inventory_value(self):
+        """
+        Returns the value of the inventory, e.g. "12 gp 5 sp".
+        """
+        return format_copper(self.inventory_value)
 
     def add_item(self, item, quantity = 1):
         """
-        Adds an item to the character's inventory.
+        Adds an item to the character's inventory, updating the carried weight and the inventory value.
 
         Args:
-            item: An Item object representing the item to be added.
+            item: An Item object or the index of the item to be added.
 
         Returns:
             None
+
+        Raises:
+            ValueError: If item is an index that is not a piece of equipment.
         """
+        item, (weight, value) = self._item_entry(item) #the inventory is keyed by item index
         if item not in self.inventory:
             self.inventory[item] = quantity
         else:
             self.inventory[item] += quantity
+        self.carry_current += weight * quantity
+        self.inventory_value += value * quantity
 
 
     def use_consumable_item(self, item: Item):
@@ -419,49 +946,200 @@ class PlayableCharacter:
         the item is removed from the inventory.
 
         If the given item is not in the character's inventory, a message is
-        printed to the console indicating this.
+        logged indicating this.
 
         Args:
-            item: An Item object representing the item to be removed.
+            item: An Item object or the index of the item to be removed.
 
         Returns:
             None
         """
+        if not isinstance(item, str):
+            item = item.index
         if item in self.inventory:
             if self.inventory[item] > 1:
                 self.inventory[item] -= 1
             else:
                 self.inventory.pop(item)
+            weight, value = get_equipment_index().get(item, (0, 0))
+            self.carry_current -= weight
+            self.inventory_value -= value
 
         else:
-            print(f"{item} is not in your inventory.")
+            logger.info("%s is not in your inventory.", item, extra={"event": "item_missing", "item": item})
 
-    def _toJson(self):
-        data = {
+    def update_inventory(self, add = None, remove = None, check_capacity = True):
+        """
+        Adds and removes many items at once: either every change is made or, if one is not possible, none.
+
+        Args:
+            add: (item, quantity) pairs to add, items being Item objects or indexes.
+            remove: (item, quantity) pairs to remove.
+            check_capacity: Refuse the changes if the character would carry more than its carrying capacity.
+
+        Raises:
+            ValueError: If an item to add is not a piece of equipment, an item to remove is not in the inventory in
+                that quantity, or the inventory would be too heavy.
+        """
+        index = get_equipment_index()
+        for item, quantity in add or []:
+            if not isinstance(item, str) and item.index not in index:
+                index.add(item)
+        add = [(item if isinstance(item, str) else item.index, quantity) for item, quantity in (add or [])]
+        remove = [(item if isinstance(item, str) else item.index, quantity) for item, quantity in (remove or [])]
+        index.ensure([item for item, quantity in add + remove])
+        unknown = [item for item, quantity in add if item not in index]
+        if unknown:
+            raise ValueError(f"Not pieces of equipment: {', '.join(unknown)}")
+
+        change = {}
+        for item, quantity in add:
+            change[item] = change.get(item, 0) + quantity
+        for item, quantity in remove:
+            change[item] = change.get(item, 0) - quantity
+        for item, delta in change.items():
+            if self.inventory.get(item, 0) + delta < 0:
+                raise ValueError(f"Cannot remove {item}: only {self.inventory.get(item, 0)} in the inventory")
+        weight = sum(index.weight(item) * delta for item, delta in change.items())
+        if check_capacity and weight > 0 and self.carry_current + weight > self.carry_capacity:
+            raise ValueError(f"Too heavy: {self.carry_current + weight:g} lb is over the carrying capacity of {self.carry_capacity:g} lb")
+
+        for item, delta in change.items():
+            quantity = self.inventory.get(item, 0) + delta
+            if quantity:
+                self.inventory[item] = quantity
+            else:
+                self.inventory.pop(item, None)
+        self.carry_current += weight
+        self.inventory_value += sum(index.value(item) * delta for item, delta in change.items())
+
+    def to_dict(self):
+        """
+        Returns the character sheet as a dict of plain values (copies, so later changes to the character do not show in it).
+        """
+        return {
             "name": self.name,
             "background": self.background,
             "alignment": self.alignment,
             "race": self.race,
             "player_class": self.player_class,
             "player_subclass": self.player_subclass,
-            "saving_throws": self.saving_throws,
-            "inventory": self.inventory,
+            "saving_throws": list(self.saving_throws),
+            "inventory": dict(self.inventory),
             "carry_capacity": self.carry_capacity,
             "carry_current": self.carry_current,
-            "equipped_items": self.equipped_items,
-            "spells": self.spells,
+            "inventory_value": self.inventory_value,
+            "strength": self.strength,
+            "equipped_items": dict(self.equipped_items),
+            "spells": list(self.spells),
             "level": self.__level,
             "level_acm": self._level_acm,
             "level_threshold": self._level_threshold,
-            "proficiencies": self.proficiencies,
-            "spells": self.spells,
-            "languages": self.known_languages
+            "proficiencies": list(self.proficiencies),
+            "languages": list(self.known_languages)
         }
-        return json.dumps(data, indent=4)
+
+    def _toJson(self):
+        return json.dumps(self.to_dict(), indent=4)
     
-    def save(self):
-        with open(f"{self.name}.json", "w") as f:
-            f.write(self._toJson())
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Given a character dict (as returned by to_dict or saved by save), returns the character.
+
+        The state is restored as saved: nothing is fetched from the API and the player is not prompted.
+        Sheets saved before the inventory value was tracked have their carried weight and inventory value
+        recomputed from the inventory, through the equipment index.
+        """
+        character = cls.__new__(cls)
+        character.name = data["name"]
+        character.background = data.get("background")
+        character.alignment = data.get("alignment")
+        character.race = data.get("race")
+        character.player_class = data.get("player_class")
+        character.player_subclass = data.get("player_subclass")
+        character.saving_throws = list(data.get("saving_throws", []))
+        character.inventory = dict(data.get("inventory", {}))
+        character.carry_capacity = data.get("carry_capacity", 100)
+        character.carry_current = data.get("carry_current", 0)
+        character.inventory_value = data.get("inventory_value", 0)
+        character.strength = data.get("strength", 10)
+        character.equipped_items = dict(data.get("equipped_items") or {"Head": None, "Body": None, "Cape": None, "Hands": None, "Feet": None, "Main Hand": None, "Off Hand": None})
+        character.proficiencies = list(data.get("proficiencies", []))
+        character.spells = list(data.get("spells", []))
+        character.known_languages = list(data.get("languages", []))
+        character.__level = data.get("level", 1)
+        character._level_acm = data.get("level_acm", 0)
+        character._level_threshold = data.get("level_threshold", 100)
+        character.version = 0
+        if "inventory_value" not in data:
+            character._recompute_inventory_totals()
+        return character
+
+    def _recompute_inventory_totals(self):
+        """
+        Sets the carried weight and the inventory value from the inventory. Items that are not equipment count for nothing.
+        """
+        self.carry_current = 0
+        self.inventory_value = 0
+        if not self.inventory:
+            return
+        index = get_equipment_index()
+        index.ensure(list(self.inventory))
+        for item, quantity in self.inventory.items():
+            weight, value = index.get(item, (0, 0))
+            self.carry_current += weight * quantity
+            self.inventory_value += value * quantity
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a character saved by save, in the JSON or the binary format, without fetching anything from the API.
+        """
+        return cls.from_dict(savefile.read(path))
+
+    @classmethod
+    def load_all(cls, directory, binary = False):
+        """
+        Loads every character saved in directory, in the binary format if binary is True and as JSON otherwise.
+        Files that are not character saves (other JSON files, unreadable files) are skipped and logged.
+
+        Returns:
+            A dict of the characters by name.
+        """
+        extension = savefile.BINARY_EXTENSION if binary else ".json"
+        characters = {}
+        for entry in os.scandir(directory):
+            if entry.name.endswith(extension):
+                try:
+                    data = savefile.read(entry.path)
+                    if not isinstance(data, dict) or "name" not in data:
+                        raise ValueError("not a character save")
+                except (OSError, ValueError) as e:
+                    logger.warning("Skipping %s: %s", entry.path, e, extra={"event": "save_skipped", "path": entry.path})
+                    continue
+                character = cls.from_dict(data)
+                characters[character.name] = character
+        return characters
+
+    def save(self, path = None, binary = False, repository = None, owner = "", campaign = ""):
+        """
+        Saves the character.
+
+        With a repository (repository.CharacterRepository), the character is written as a row of the given
+        owner and campaign, and the new row version is returned. Otherwise it is saved atomically to
+        <name>.json or, if binary is True, to <name>.dndc in the binary format (a short header and the compact JSON),
+        and the path is returned.
+
+        Raises:
+            repository.ConflictError: If the row was changed since this character was read from the repository.
+        """
+        if repository is not None:
+            return repository.put(self, owner, campaign)
+        if path is None:
+            path = f"{self.name}{savefile.BINARY_EXTENSION if binary else '.json'}"
+        savefile.write(path, self.to_dict(), binary or None)
+        return path
     
 def test():
     #valid_classes = ["barbarian", "bard", "cleric", "druid", "fighter", "monk", "paladin", "ranger", "rogue", "sorcerer", "warlock", "wizard"]
@@ -473,4 +1151,6 @@ def test():
     pass
 
 if __name__ == "__main__":
+    from logs import setup_logging
+    setup_logging()
     test()
\ No newline at end of file
@@ -1,45 +1,30 @@
 import os
-import google.generativeai as genai
 import json
-import time
+import logging
+from bootstrap import App, Lazy
+from gemini_files import FileUploader
+from history import HistoryManager
+from journal import Journal
+from sheets import SheetTracker
+from streaming import ReplyStream
+import metrics
+from logs import setup_logging
 
-with open("settings.json") as f:
-    settings = json.load(f)
+logger = logging.getLogger(__name__)
 
-genai.configure(api_key=settings["gemini"]["api key"], transport="rest")
+def upload_to_gemini(paths, mime_type="application/json"):
+  """Uploads the given files to Gemini and waits until they are active.
 
-def upload_to_gemini(path, mime_type=None):
-  """Uploads the given file to Gemini.
+  Files are uploaded and polled concurrently, and files that did not change
+  since their last upload are reused. See gemini_files.FileUploader.
 
   See https://ai.google.dev/gemini-api/docs/prompting_with_media
   """
-  file = genai.upload_file(path, mime_type=mime_type)
-  print(f"Uploaded file '{file.display_name}' as: {file.uri}")
-  return file
+  logger.info("Uploading files...")
+  files = uploader.get().upload_all(paths, mime_type=mime_type)
+  logger.info("...all files ready", extra={"event": "files_ready", "files": len(files)})
+  return files
 
-def wait_for_files_active(files):
-  """Waits for the given files to be active.
-
-  Some files uploaded to the Gemini API need to be processed before they can be
-  used as prompt inputs. The status can be seen by querying the file's "state"
-  field.
-
-  This implementation uses a simple blocking polling loop. Production code
-  should probably employ a more sophisticated approach.
-  """
-  print("Waiting for file processing...")
-  for name in (file.name for file in files):
-    file = genai.get_file(name)
-    while file.state.name == "PROCESSING":
-      print(".", end="", flush=True)
-      time.sleep(10)
-      file = genai.get_file(name)
-    if file.state.name != "ACTIVE":
-      raise Exception(f"File {file.name} failed to process")
-  print("...all files ready")
-  print()
-
-# Create the model
 generation_config = {
   "temperature": 1.5,
   "top_p": 0.95,
@@ -48,10 +33,7 @@ generation_config = {
   "response_mime_type": "text/plain",
 }
 
-model = genai.GenerativeModel(
-  model_name="gemini-1.5-flash",
-  generation_config=generation_config,
-  system_instruction="""Pretend that you are a Dungeons and Dragons Dungeon Master. 
+SYSTEM_INSTRUCTION = """Pretend that you are a Dungeons and Dragons Dungeon Master. 
                         You are tasked to create a campaign for a party to play on.
                         First, you\'ll get the story limitations in a JSON file as well
                         as each of player's sheets also as JSON files. First, prompt 
@@ -67,38 +49,129 @@ model = genai.GenerativeModel(
                         If their action is categorized as [acrobatics, animal-handling, arcana, 
                         athletics, deception, history, insight, intimidation, investigation, 
                         medicine, nature, perception, performance, persuasion, religion, 
-                        sleight-of-hand, stealth, survival], row a 20 sided die to see if the 
-                        user would succeed in their action. You don't need to roll a dice for 
-                        every action, only for the ones that fit the category. If they 
-                        succeed, execute their action as intended, otherwise, feel free to 
-                        disrupt their actions based on how low their roll on the die was
-                        (1 is catastrofic, 2-5 is really bad, 6-9 is slighlty bad, 10-12 is ok,
-                        13-15 is good, 16-19 is great, and 20 is perfect). The result of the 
-                        dies are final and cannot be altered by the player. The framework 
+                        sleight-of-hand, stealth, survival], do not roll any dice yourself: 
+                        ask the player to roll with "/check <skill>" (or "/save <ability>" 
+                        for a saving throw). The game rolls the dice and sends you the 
+                        outcome before the action, such as "[Stealth check: great]". If 
+                        the outcome is ok or better, execute their action as intended, 
+                        otherwise, feel free to disrupt their actions based on how bad the 
+                        outcome was (catastrophic, really bad, slightly bad, ok, good, great 
+                        or perfect). The outcomes are final and cannot be altered by the 
+                        player. The framework 
                         of the history must start hidden and get uncovered as the players 
                         progress through the story. The story ends when the party achieves 
-                        the final objective""",
-)
-
-
-
-chat_session = model.start_chat(
-  history=[
-  ]
-)
-
-response = chat_session.send_message("Hello")
-print(response.text)
-time.sleep(1)
-files = [
-  upload_to_gemini("story.json", mime_type="application/json"),
-  upload_to_gemini("Char1.json", mime_type="application/json"),
-]
-wait_for_files_active(files)
-
-
-while True:
+                        the final objective"""
+
+# Nothing is read or configured at import time: the settings, the Gemini client
+# and the model are created on first use, or ahead of time by app.warm_up().
+def create_model(app):
+  return app.genai.get().GenerativeModel(
+    model_name="gemini-1.5-flash",
+    generation_config=generation_config,
+    system_instruction=SYSTEM_INSTRUCTION,
+  )
+
+app = App(model_factory=create_model)
+uploader = Lazy(lambda: FileUploader(app.genai.get()))
+
+def __getattr__(name):
+  # dungeonmasterai.model still works, creating the model on first access
+  if name == "model":
+    return app.model.get()
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+
+
+SHEET_PATHS = ["Char1.json"]
+JOURNAL_DIR = os.environ.get("DM_JOURNAL", "journal")
+
+def load_sheets(paths):
+  """Reads the character sheets saved by PlayableCharacter.save."""
+  sheets = []
+  for path in paths:
+    with open(path) as f:
+      sheets.append(json.load(f))
+  return sheets
+
+
+def main():
+  setup_logging()
+  # METRICS_PORT=9108 serves the SRD, cache and model metrics on /metrics
+  if os.environ.get("METRICS_PORT"):
+    metrics.serve(int(os.environ["METRICS_PORT"]))
+  # the model and the SRD indexes are created while the story file uploads
+  app.start_warm_up()
+  from dice import Dice, resolve_command
+  from dnd import PlayableCharacter
+  from router import Router
+  files = upload_to_gemini(["story.json"])
+
+  # Character sheets are sent as compact text once, then only their changes
+  # go with each turn instead of re-uploading the full JSON files.
+  tracker = SheetTracker()
+  sheets = tracker.update(load_sheets(SHEET_PATHS))
+
+  # The story and character sheets are pinned: they are sent with every turn,
+  # while older turns are folded into a rolling summary.
+  chat_session = HistoryManager(app.model.get(), pinned=files + [sheets])
+
+  # Skill checks are rolled here rather than by the model: only the outcome band
+  # is sent, and DICE_SEED makes a session's rolls reproducible.
+  seed = os.environ.get("DICE_SEED")
+  dice = Dice(int(seed) if seed else None)
+  # rules questions ("what does fireball do?") are answered from the SRD data
+  router = Router()
+
+  # Every turn is appended to the journal (and flushed, so a crash loses nothing).
+  # On the next start the campaign resumes from the last snapshot and the turns
+  # logged after it, without calling the model.
+  journal = Journal(JOURNAL_DIR)
+  state = journal.state
+  if state.seq:
+    tracker.sent = {name: dict(data) for name, data in state.characters.items()}
+    chat_session.pinned = files + [tracker.sheets()]
+    chat_session.restore(state.summary, state.recent)
+    logger.info("Resumed the campaign at turn %d", state.seq, extra={"event": "journal_resumed", "turn": state.seq,
+                                                                     "replayed": journal.stats["replayed"]})
+    print(state.last_reply())
+  else:
+    response = chat_session.send_message("Hello")
+    journal.record_turn("Hello", response.text, load_sheets(SHEET_PATHS))
+    print(response.text)
+
+  while True:
     user_input = input("User: ")
-    response = chat_session.send_message(user_input)
-    print("Gemini: ", response.text)
-
+    sheets = load_sheets(SHEET_PATHS)
+    try:
+      check = resolve_command(PlayableCharacter.from_dict(sheets[0]), user_input, dice)
+    except ValueError as e:
+      print(e)
+      continue
+    if check is not None:
+      result, user_input = check
+      print(result.describe())
+    else:
+      answer = router.answer(user_input)
+      if answer is not None:
+        print(f"Rules: {answer}")
+        continue
+    changes = tracker.update(sheets)
+    message = f"Character sheet changes:\n{changes}\n\n{user_input}" if changes else user_input
+    compactions = chat_session.stats["compactions"]
+    print("Gemini: ", end="", flush=True)
+    reply = ReplyStream(chat_session, message)
+    for chunk in reply:
+      print(chunk, end="", flush=True)
+    print()
+    router.record_forwarded(reply.total_latency)
+    if chat_session.stats["compactions"] != compactions:
+      # the turns holding older changes were summarized, so pin the sheets as last sent
+      chat_session.pinned = files + [tracker.sheets()]
+      journal.record_turn(message, reply.text, sheets, summary=chat_session.summary, window=len(chat_session.recent))
+    else:
+      journal.record_turn(message, reply.text, sheets)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,87 @@
+import threading
+
+#value of each coin in copper pieces
+COIN_VALUES = {"cp": 1, "sp": 10, "ep": 50, "gp": 100, "pp": 1000}
+
+
+def cost_in_copper(cost):
+    """
+    Given an SRD cost such as {"quantity": 2, "unit": "gp"}, returns it in copper pieces (0 if there is none).
+    """
+    if not cost:
+        return 0
+    return cost["quantity"] * COIN_VALUES.get(cost["unit"], 0)
+
+
+def format_copper(value):
+    """
+    Given a value in copper pieces, returns it in the largest coins that fit, e.g. 1205 -> "12 gp 5 cp".
+    """
+    parts = []
+    for unit in ("gp", "sp", "cp"):
+        amount, value = divmod(value, COIN_VALUES[unit])
+        if amount:
+            parts.append(f"{amount:g} {unit}")
+    return " ".join(parts) or "0 cp"
+
+
+class EquipmentIndex:
+    """
+    Weight (in pounds) and value (in copper pieces) of every piece of equipment, by index.
+
+    Entries are added from Item records, from the snapshot at once or as items are fetched, so
+    weight and value lookups never go back to the API. Indexes the loader does not find (not
+    equipment, or not fetched because the API is down) are not cached: get returns default for
+    them and they are looked up again next time.
+
+    Args:
+        items: Item records to index.
+        loader: Function (list of indexes) -> list of Items (or None), used to fill the missing entries.
+    """
+
+    def __init__(self, items=(), loader=None):
+        self.entries = {}
+        self.loader = loader
+        self._lock = threading.Lock()
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, index):
+        return index in self.entries
+
+    def add(self, item):
+        #records without a weight or cost (magic items) weigh and are worth nothing
+        self.entries[item.index] = (getattr(item, "weight", None) or 0, cost_in_copper(getattr(item, "cost", None)))
+
+    def ensure(self, indexes):
+        """
+        Loads the entries of the given indexes that are not indexed yet, in one batch.
+        """
+        missing = [index for index in dict.fromkeys(indexes) if index not in self.entries]
+        if not missing or self.loader is None:
+            return
+        with self._lock:
+            missing = [index for index in missing if index not in self.entries]
+            items = self.loader(missing) if missing else []
+            for item in items:
+                if item is not None:
+                    self.add(item)
+
+    def get(self, index, default=None):
+        """
+        Returns the (weight, value) of the equipment index, or default if it is not known.
+        """
+        entry = self.entries.get(index)
+        if entry is None:
+            self.ensure([index])
+            entry = self.entries.get(index, default)
+        return entry
+
+    def weight(self, index):
+        return self.get(index, (0, 0))[0]
+
+    def value(self, index):
+        return self.get(index, (0, 0))[1]
@@ -0,0 +1,74 @@
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from history import estimate_tokens
+
+
+class FakeChat:
+    """
+    Stand-in for a Gemini chat session. Replies echo the player message after `latency` seconds,
+    and the history is kept in the same {"role", "parts"} shape the SDK accepts.
+    """
+
+    def __init__(self, model, history):
+        self.model = model
+        self.history = list(history)
+
+    def _reply(self, message):
+        return f"The Dungeon Master answers: {message}"
+
+    def send_message(self, message, stream=False):
+        usage = SimpleNamespace(prompt_token_count=estimate_tokens(self.history) + estimate_tokens(message))
+        self.model._call_started()
+        try:
+            time.sleep(self.model.latency)
+            text = self._reply(message)
+        finally:
+            self.model._call_finished()
+        self.history.append({"role": "user", "parts": [message]})
+        self.history.append({"role": "model", "parts": [text]})
+        if stream:
+            return _StreamedResponse([SimpleNamespace(text=word) for word in re.findall(r"\S+\s*", text)], usage)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+class _StreamedResponse(list):
+    def __init__(self, chunks, usage_metadata):
+        super().__init__(chunks)
+        self.usage_metadata = usage_metadata
+
+
+class FakeModel:
+    """
+    Stand-in for genai.GenerativeModel that counts calls and tracks the peak number of concurrent calls.
+
+    generate_content answers with the last summary_words words of the prompt, which keeps summaries bounded.
+    """
+
+    def __init__(self, latency=0.0, summary_words=150):
+        self.latency = latency
+        self.summary_words = summary_words
+        self.prompts = []
+        self.calls = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def start_chat(self, history=()):
+        return FakeChat(self, history)
+
+    def generate_content(self, prompt):
+        self.prompts.append(prompt)
+        return SimpleNamespace(text=" ".join(prompt.split()[-self.summary_words:]))
+
+    def _call_started(self):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _call_finished(self):
+        with self._lock:
+            self.in_flight -= 1
@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "srd.json")
+
+
+class FakeSRD:
+    """
+    Local stand-in for dnd5eapi.co that serves recorded fixtures.
+
+    Records are loaded from fixtures/srd.json (one list of records per collection)
+    and exposed under the same paths as the real API, including the collection
+    lists and the per-class spell lists. Every request is counted, along with the
+    peak number of requests in flight, and an optional latency (in seconds) is
+    injected before each response.
+    """
+
+    def __init__(self, fixtures=FIXTURES_PATH, latency=0.0):
+        with open(fixtures) as f:
+            self.collections = json.load(f)
+        self.latency = latency
+        self.requests = Counter()
+        self.failures = {}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        self.routes = self._build_routes()
+        self._server = None
+        self._thread = None
+
+    def _build_routes(self):
+        routes = {}
+        for collection, records in self.collections.items():
+            results = []
+            for record in sorted(records, key=lambda r: r["index"]):
+                routes[f"{collection}/{record['index']}"] = record
+                entry = {"index": record["index"], "name": record["name"], "url": record["url"]}
+                if collection == "spells":
+                    entry["level"] = record["level"]
+                results.append(entry)
+            routes[collection] = {"count": len(results), "results": results}
+
+        for player_class in self.collections.get("classes", []):
+            results = [{"index": spell["index"], "name": spell["name"], "level": spell["level"], "url": spell["url"]}
+                       for spell in sorted(self.collections.get("spells", []), key=lambda s: (s["level"], s["index"]))
+                       if player_class["index"] in [c["index"] for c in spell["classes"]]]
+            routes[f"classes/{player_class['index']}/spells"] = {"count": len(results), "results": results}
+        return routes
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/"
+
+    @property
+    def total_requests(self):
+        return sum(self.requests.values())
+
+    def fail(self, path, status=503, times=1):
+        """
+        Makes the next `times` requests for path answer with the given error status.
+        """
+        with self._lock:
+            self.failures[path] = [status, times]
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests.clear()
+            self.peak_in_flight = self.in_flight
+
+    def _handler(self):
+        srd = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                path = self.path.split("?")[0].strip("/")
+                if path.startswith("api/"):
+                    path = path[len("api/"):]
+                with srd._lock:
+                    srd.requests[path] += 1
+                    srd.in_flight += 1
+                    srd.peak_in_flight = max(srd.peak_in_flight, srd.in_flight)
+                    failure = srd.failures.get(path)
+                    if failure is not None:
+                        failure[1] -= 1
+                        if failure[1] <= 0:
+                            del srd.failures[path]
+                try:
+                    if srd.latency:
+                        time.sleep(srd.latency)
+                    if failure is not None:
+                        self._reply(failure[0], {"error": "Injected failure"})
+                        return
+                    record = srd.routes.get(path)
+                    if record is None:
+                        self._reply(404, {"error": "Not found"})
+                    else:
+                        self._reply(200, record)
+                finally:
+                    with srd._lock:
+                        srd.in_flight -= 1
+
+            def _reply(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    with FakeSRD() as srd:
+        print(f"Serving recorded SRD fixtures on {srd.url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def file_hash(path):
+    """
+    Returns the sha256 hex digest of the file at path.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FileUploader:
+    """
+    Uploads prompt files (story and character sheets) to the Gemini file service.
+
+    Files are uploaded in parallel, then polled in parallel until they are active,
+    waiting first_poll seconds before the first check and doubling the wait up to
+    max_poll. A manifest keeps the content hash and file name of every upload, so a
+    file that did not change since its last upload reuses the existing remote file
+    instead of being uploaded again.
+
+    Args:
+        client: Object exposing upload_file(path, mime_type=...) and get_file(name),
+            such as the google.generativeai module.
+        manifest_path: JSON file where the uploads are remembered, or None.
+        max_workers: Maximum number of concurrent uploads and polls.
+        first_poll: Delay before the first state check, in seconds.
+        max_poll: Maximum delay between two state checks, in seconds.
+        timeout: Maximum time to wait for a file to become active, in seconds.
+    """
+
+    def __init__(self, client, manifest_path=".gemini_uploads.json", max_workers=8, first_poll=0.5, max_poll=10.0, timeout=600.0):
+        self.client = client
+        self.manifest_path = manifest_path
+        self.max_workers = max_workers
+        self.first_poll = first_poll
+        self.max_poll = max_poll
+        self.timeout = timeout
+        self.stats = {"uploaded": 0, "reused": 0, "polls": 0}
+        self._lock = threading.Lock()
+        self._manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        if self.manifest_path is None or not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _save_manifest(self):
+        if self.manifest_path is None:
+            return
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self._manifest, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
+
+    def upload(self, path, mime_type=None):
+        """
+        Uploads the file at path, or returns the remote file of a previous upload with the same content.
+        """
+        digest = file_hash(path)
+        known = self._manifest.get(os.path.abspath(path))
+        if known is not None and known["sha256"] == digest:
+            try:
+                file = self.client.get_file(known["name"])
+            except Exception:
+                file = None
+            if file is not None and file.state.name in ("ACTIVE", "PROCESSING"):
+                with self._lock:
+                    self.stats["reused"] += 1
+                return file
+
+        file = self.client.upload_file(path, mime_type=mime_type)
+        logger.info("Uploaded file '%s' as: %s", file.display_name, file.uri,
+                    extra={"event": "file_uploaded", "file": file.display_name, "uri": file.uri})
+        with self._lock:
+            self.stats["uploaded"] += 1
+            self._manifest[os.path.abspath(path)] = {"sha256": digest, "name": file.name, "uri": file.uri}
+        return file
+
+    def wait_until_active(self, file):
+        """
+        Polls a file until it leaves the PROCESSING state, with exponential backoff.
+
+        Returns:
+            The active file.
+
+        Raises:
+            Exception: If the file failed to process or did not become active before the timeout.
+        """
+        delay = self.first_poll
+        deadline = time.monotonic() + self.timeout
+        while file.state.name == "PROCESSING":
+            if time.monotonic() + delay > deadline:
+                raise Exception(f"File {file.name} is still processing after {self.timeout} seconds")
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_poll)
+            with self._lock:
+                self.stats["polls"] += 1
+            file = self.client.get_file(file.name)
+        if file.state.name != "ACTIVE":
+            raise Exception(f"File {file.name} failed to process")
+        return file
+
+    def upload_all(self, paths, mime_type="application/json"):
+        """
+        Uploads every file concurrently and waits until all of them are active.
+
+        Returns:
+            The active files, in the order of paths.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            files = list(pool.map(lambda path: self.upload(path, mime_type), paths))
+            self._save_manifest()
+            return list(pool.map(self.wait_until_active, files))
@@ -0,0 +1,162 @@
+import metrics
+
+SUMMARY_PROMPT = """You keep the notes of a Dungeons and Dragons campaign. Update the summary below
+with the new turns. Keep every fact that may matter later (names, places, items, promises,
+open quests, injuries, the party's decisions) and drop the rest. Answer with the updated
+summary only, in at most {words} words.
+
+Summary so far:
+{summary}
+
+New turns:
+{turns}"""
+
+
+def estimate_tokens(parts):
+    """
+    Given a message part or a list of parts, returns a rough token count (about 4 characters per token).
+
+    Parts that are not text, such as uploaded files, are counted by the service and count as 0 here.
+    """
+    if isinstance(parts, (str, dict)) or not isinstance(parts, (list, tuple)):
+        parts = [parts]
+    total = 0
+    for part in parts:
+        if isinstance(part, dict):
+            total += estimate_tokens(part.get("parts", []))
+        else:
+            text = part if isinstance(part, str) else getattr(part, "text", None)
+            if text:
+                total += len(text) // 4 + 1
+    return total
+
+
+def _as_parts(message):
+    return list(message) if isinstance(message, (list, tuple)) else [message]
+
+
+def _as_text(message):
+    return " ".join(part for part in message["parts"] if isinstance(part, str))
+
+
+class HistoryManager:
+    """
+    Chat session with a bounded context window.
+
+    Every turn is sent with the pinned facts (story objective, character sheets), a summary
+    of the older turns and the most recent turns only, instead of the whole campaign. When
+    the recent turns outgrow window_tokens, the oldest ones are folded into the summary with
+    one summarize call and dropped, until the window is back under half its budget, so the
+    prompt size stays flat however long the campaign runs.
+
+    It can be used in place of a chat session: send_message(message, stream=False) and
+    history behave the same way.
+
+    Args:
+        model: Gemini model (anything with start_chat(history=...) and generate_content(prompt)).
+        pinned: Parts always sent first, such as the uploaded story and character sheet files.
+        history: Recent turns to start from, as {"role", "parts"} dicts.
+        window_tokens: Token budget of the recent turns.
+        summary_words: Maximum length of the summary asked to the model, in words.
+        summarize: Function (previous summary, list of messages) -> new summary. Defaults
+            to asking the model with SUMMARY_PROMPT.
+    """
+
+    def __init__(self, model, pinned=(), history=(), window_tokens=4000, summary_words=300, summarize=None):
+        self.model = model
+        self.pinned = list(pinned)
+        self.recent = list(history)
+        self.summary = ""
+        self.window_tokens = window_tokens
+        self.summary_words = summary_words
+        self.summarize = summarize or self._summarize_with_model
+        #per turn: prompt tokens (as reported by the model, or estimated), reply tokens and context size
+        self.turns = []
+        self.stats = {"compactions": 0, "summarized_turns": 0}
+        self._recent_tokens = [estimate_tokens(message) for message in self.recent]
+
+    @property
+    def history(self):
+        """
+        The context sent with the next turn: pinned facts, summary and recent turns.
+        """
+        context = []
+        if self.pinned:
+            context.append({"role": "user", "parts": self.pinned})
+            context.append({"role": "model", "parts": ["Understood, I will keep these in mind for the whole campaign."]})
+        if self.summary:
+            context.append({"role": "user", "parts": [f"Summary of the campaign so far:\n{self.summary}"]})
+            context.append({"role": "model", "parts": ["Understood, let's continue from there."]})
+        return context + self.recent
+
+    def restore(self, summary, recent):
+        """
+        Continues a campaign from a saved summary and recent turns (see journal.CampaignState), without calling the model.
+        """
+        self.summary = summary
+        self.recent = list(recent)
+        self._recent_tokens = [estimate_tokens(message) for message in self.recent]
+
+    def send_message(self, message, stream=False):
+        """
+        Sends a player message with the bounded context and records the turn.
+
+        Returns:
+            The model response, or with stream=True an iterator over the response chunks.
+        """
+        context = self.history
+        chat = self.model.start_chat(history=context)
+        response = chat.send_message(message, stream=stream)
+        if stream:
+            return self._stream(message, context, response)
+        self._record(message, context, response.text, getattr(response, "usage_metadata", None))
+        return response
+
+    def _stream(self, message, context, response):
+        parts = []
+        for chunk in response:
+            parts.append(chunk.text)
+            yield chunk
+        self._record(message, context, "".join(parts), getattr(response, "usage_metadata", None))
+
+    def _record(self, message, context, reply, usage):
+        prompt_tokens = getattr(usage, "prompt_token_count", None)
+        if prompt_tokens is None:
+            prompt_tokens = estimate_tokens(context) + estimate_tokens(_as_parts(message))
+        turn = [{"role": "user", "parts": _as_parts(message)}, {"role": "model", "parts": [reply]}]
+        self.recent.extend(turn)
+        self._recent_tokens.extend(estimate_tokens(content) for content in turn)
+        self.turns.append({"prompt_tokens": prompt_tokens,
+                           "reply_tokens": estimate_tokens(reply),
+                           "context_tokens": sum(self._recent_tokens)})
+        metrics.observe("model_prompt_tokens", prompt_tokens, buckets=metrics.SIZE_BUCKETS)
+        metrics.observe("model_reply_tokens", self.turns[-1]["reply_tokens"], buckets=metrics.SIZE_BUCKETS)
+        if sum(self._recent_tokens) > self.window_tokens:
+            self.compact()
+
+    def compact(self, target_tokens=None):
+        """
+        Folds the oldest recent turns into the summary until the recent turns fit in target_tokens
+        (half the window by default). Whole turns are moved, so the window still starts with a player message.
+        """
+        if target_tokens is None:
+            target_tokens = self.window_tokens // 2
+        total = sum(self._recent_tokens)
+        count = 0
+        while count + 1 < len(self.recent) and total > target_tokens:
+            total -= self._recent_tokens[count] + self._recent_tokens[count + 1]
+            count += 2
+        if count == 0:
+            return
+        dropped = self.recent[:count]
+        with metrics.timed("history_summary_seconds"):
+            self.summary = self.summarize(self.summary, dropped)
+        del self.recent[:count]
+        del self._recent_tokens[:count]
+        self.stats["compactions"] += 1
+        self.stats["summarized_turns"] += count // 2
+
+    def _summarize_with_model(self, summary, messages):
+        turns = "\n".join(f"{message['role']}: {_as_text(message)}" for message in messages)
+        prompt = SUMMARY_PROMPT.format(words=self.summary_words, summary=summary or "(none yet)", turns=turns)
+        return self.model.generate_content(prompt).text.strip()
@@ -0,0 +1,266 @@
+"""
+Append-only campaign journal.
+
+Every turn of a campaign (the message sent to the model, its reply and what changed in the
+character sheets) is appended to a log as one JSON line with a checksum. Lines are flushed
+right away, so a crashed process loses nothing, and synced to disk in batches, so a power
+loss loses at most the last batch. Every so often the state of the campaign is written to a
+compacted snapshot and a new log segment is started, so resuming reads the snapshot and
+replays the turns after it, without any model call.
+
+    journal/
+        snapshot.json                  state after turn 2000
+        journal-000000002001.log       turns 2001, 2002, ...
+"""
+import copy
+import json
+import logging
+import os
+import re
+import time
+import zlib
+
+import metrics
+
+SNAPSHOT_NAME = "snapshot.json"
+SEGMENT_PATTERN = re.compile(r"^journal-(\d{12})\.log$")
+
+logger = logging.getLogger(__name__)
+
+
+def encode_record(record):
+    """
+    Given a record dict, returns its journal line: the CRC32 of the compact JSON, then the JSON.
+    """
+    payload = json.dumps(record, separators=(",", ":"))
+    return f"{zlib.crc32(payload.encode()):08x} {payload}\n".encode()
+
+
+def decode_record(line):
+    """
+    Given a journal line, returns its record dict, or None if the line is torn or corrupt.
+    """
+    if not line.endswith(b"\n") or len(line) < 10 or line[8:9] != b" ":
+        return None
+    payload = line[9:-1]
+    try:
+        if int(line[:8], 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+def character_diff(old, new):
+    """
+    Given two character dicts, returns the fields of new that changed, with the removed fields listed under "-".
+    """
+    diff = {field: value for field, value in new.items() if field not in old or old[field] != value}
+    removed = [field for field in old if field not in new]
+    if removed:
+        diff["-"] = removed
+    return diff
+
+
+def apply_diff(old, diff):
+    """
+    Returns a copy of old with a character_diff applied.
+    """
+    new = {field: value for field, value in old.items() if field not in diff.get("-", ())}
+    new.update((field, copy.deepcopy(value)) for field, value in diff.items() if field != "-")
+    return new
+
+
+class CampaignState:
+    """
+    What the journal knows of a campaign after turn seq: the character sheets as last sent to
+    the model, the summary of the older turns and the recent turns, as {"role", "parts"} dicts.
+    """
+
+    def __init__(self, seq=0, characters=None, summary="", recent=None):
+        self.seq = seq
+        self.characters = characters if characters is not None else {}
+        self.summary = summary
+        self.recent = recent if recent is not None else []
+
+    def apply(self, record):
+        """
+        Replays a turn record on the state.
+        """
+        self.seq = record["seq"]
+        self.recent.append({"role": "user", "parts": [record["input"]]})
+        self.recent.append({"role": "model", "parts": [record["reply"]]})
+        for name, diff in record.get("characters", {}).items():
+            self.characters[name] = apply_diff(self.characters.get(name, {}), diff)
+        if "summary" in record:
+            self.summary = record["summary"]
+        if "window" in record:
+            del self.recent[:max(0, len(self.recent) - record["window"])]
+
+    def last_reply(self):
+        """
+        Returns the text of the last model reply, or None if there is none.
+        """
+        for message in reversed(self.recent):
+            if message["role"] == "model":
+                return " ".join(part for part in message["parts"] if isinstance(part, str))
+        return None
+
+    def to_dict(self):
+        return {"seq": self.seq, "characters": self.characters, "summary": self.summary, "recent": self.recent}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("seq", 0), data.get("characters"), data.get("summary", ""), data.get("recent"))
+
+
+class Journal:
+    """
+    Append-only journal of a campaign, with periodic snapshots.
+
+    Opening a journal resumes its campaign: the snapshot is loaded and the turns logged after
+    it are replayed into state. A torn last line (the process died while writing it) is cut off.
+
+    Args:
+        directory: Directory of the snapshot and log segments, created if needed.
+        sync_every: Turns appended between two syncs to disk.
+        sync_interval: Maximum time between two syncs to disk, in seconds (checked when a turn is appended).
+        snapshot_every: Turns appended between two snapshots, or None to snapshot only when asked.
+    """
+
+    def __init__(self, directory, sync_every=32, sync_interval=1.0, snapshot_every=1000, clock=time.monotonic):
+        self.directory = directory
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.snapshot_every = snapshot_every
+        self.clock = clock
+        self.stats = {"appends": 0, "syncs": 0, "snapshots": 0, "replayed": 0, "truncated_bytes": 0}
+        os.makedirs(directory, exist_ok=True)
+        self.state = self._load()
+        self._unsynced = 0
+        self._synced_at = clock()
+        self._since_snapshot = self.stats["replayed"]
+        segments = self._segments()
+        self._file = open(segments[-1][1] if segments else self._segment_path(self.state.seq + 1), "ab")
+
+    def _segment_path(self, first_seq):
+        return os.path.join(self.directory, f"journal-{first_seq:012d}.log")
+
+    def _segments(self):
+        """
+        Returns the (first seq, path) of every log segment, oldest first.
+        """
+        segments = []
+        for name in os.listdir(self.directory):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                segments.append((int(match.group(1)), os.path.join(self.directory, name)))
+        return sorted(segments)
+
+    def _load(self):
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_NAME)
+        state = CampaignState()
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path) as f:
+                state = CampaignState.from_dict(json.load(f))
+        segments = self._segments()
+        for number, (first_seq, path) in enumerate(segments):
+            last = number == len(segments) - 1
+            with open(path, "rb") as f:
+                offset = 0
+                for line in f:
+                    record = decode_record(line)
+                    if record is None:
+                        if not last:
+                            raise ValueError(f"Corrupt journal record in {path} at byte {offset}")
+                        #the process died while writing: drop the torn tail
+                        self.stats["truncated_bytes"] = os.path.getsize(path) - offset
+                        logger.warning("Cutting %d bytes of torn journal records from %s", self.stats["truncated_bytes"], path,
+                                       extra={"event": "journal_truncated", "path": path})
+                        break
+                    offset += len(line)
+                    if record["seq"] > state.seq:
+                        state.apply(record)
+                        self.stats["replayed"] += 1
+            if self.stats["truncated_bytes"]:
+                with open(path, "r+b") as f:
+                    f.truncate(offset)
+        return state
+
+    def record_turn(self, message, reply, characters=(), summary=None, window=None):
+        """
+        Appends a turn to the journal and applies it to state.
+
+        Args:
+            message: The message sent to the model.
+            reply: The text of the model reply.
+            characters: Character dicts (PlayableCharacter.to_dict) as sent with the turn; only their changes are logged.
+            summary: The new summary of the older turns, if the history was compacted during the turn.
+            window: Number of recent messages kept after the turn, if older ones were folded into the summary.
+
+        Returns:
+            The sequence number of the turn.
+        """
+        record = {"seq": self.state.seq + 1, "time": time.time(), "input": message, "reply": reply}
+        changes = {}
+        for data in characters:
+            diff = character_diff(self.state.characters.get(data["name"], {}), data)
+            if diff:
+                changes[data["name"]] = diff
+        if changes:
+            record["characters"] = changes
+        if summary is not None:
+            record["summary"] = summary
+        if window is not None:
+            record["window"] = window
+
+        self._file.write(encode_record(record))
+        self._file.flush()
+        self.state.apply(record)
+        self.stats["appends"] += 1
+        metrics.inc("journal_appends_total")
+        self._unsynced += 1
+        self._since_snapshot += 1
+        if self._unsynced >= self.sync_every or self.clock() - self._synced_at >= self.sync_interval:
+            self.sync()
+        if self.snapshot_every is not None and self._since_snapshot >= self.snapshot_every:
+            self.snapshot()
+        return record["seq"]
+
+    def sync(self):
+        """
+        Writes the appended turns to disk.
+        """
+        if self._unsynced:
+            with metrics.timed("journal_sync_seconds"):
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            self.stats["syncs"] += 1
+        self._unsynced = 0
+        self._synced_at = self.clock()
+
+    def snapshot(self):
+        """
+        Writes the state to the snapshot, atomically, then starts a new log segment and deletes the older ones.
+        """
+        self.sync()
+        path = os.path.join(self.directory, SNAPSHOT_NAME)
+        temp_path = path + ".tmp"
+        with metrics.timed("journal_snapshot_seconds"):
+            with open(temp_path, "w") as f:
+                json.dump(self.state.to_dict(), f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        #a crash from here on leaves older segments behind, whose turns the snapshot already holds
+        self._file.close()
+        self._file = open(self._segment_path(self.state.seq + 1), "ab")
+        for first_seq, segment in self._segments():
+            if first_seq <= self.state.seq:
+                os.remove(segment)
+        self._since_snapshot = 0
+        self.stats["snapshots"] += 1
+
+    def close(self):
+        self.sync()
+        self._file.close()
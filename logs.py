@@ -0,0 +1,49 @@
+"""
+Logging setup shared by the console game, the Discord bot and the tools.
+
+Modules log through logging.getLogger(__name__) and pass structured fields with extra=,
+for example logger.warning("Spell %s not found", name, extra={"event": "not_found", "collection": "spells"}).
+Those fields are kept as keys of the JSON lines written by JsonFormatter.
+"""
+import json
+import logging
+import os
+import sys
+
+#attributes every LogRecord has; anything else was passed with extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line, with the extra= fields as keys.
+    """
+
+    def format(self, record):
+        entry = {"time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"), "level": record.levelname,
+                 "logger": record.name, "message": record.getMessage()}
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(level=None, json_format=None, stream=None):
+    """
+    Configures the root logger.
+
+    Args:
+        level: Log level; defaults to the LOG_LEVEL environment variable, or INFO.
+        json_format: Write JSON lines instead of plain messages; defaults to LOG_FORMAT=json.
+        stream: Stream to write to, stderr by default.
+    """
+    level = level or os.environ.get("LOG_LEVEL", "INFO")
+    if json_format is None:
+        json_format = os.environ.get("LOG_FORMAT") == "json"
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if json_format else logging.Formatter("%(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
@@ -1,6 +1,5 @@
-import dnd
-import discordBot
-import openai
+# dnd, discordBot and the model clients are imported where they are used,
+# so importing this module stays cheap; see bootstrap.App for the warm-up.
 
 
 
@@ -10,4 +9,3 @@ def test():
 
 if __name__ == "__main__":
     test()
-
@@ -0,0 +1,237 @@
+"""
+Lightweight in-process metrics: counters and latency histograms, exported in the Prometheus text format.
+
+    with metrics.timed("srd_request_seconds", endpoint="spells"):
+        ...
+    metrics.inc("srd_cache_lookups_total", tier="memory")
+    metrics.observe("model_reply_chars", len(text), kind="stream")
+
+The registry can be served on a local endpoint (serve) or written to a file periodically
+(start_snapshots) for a node exporter textfile collector or a later look.
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import ContextDecorator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+#Prometheus default buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+#buckets for sizes (characters or tokens)
+SIZE_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536, 262144)
+
+
+class Histogram:
+    """
+    Per-bucket counts (not cumulative) plus the sum and count of the observed values.
+    """
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, fraction):
+        """
+        Returns an upper bound of the given quantile: the upper edge of the bucket it falls in.
+        """
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+def _labels(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class Registry:
+    """
+    Thread-safe store of counters and histograms, keyed by metric name and labels.
+
+    Args:
+        enabled: If False, recording is a no-op.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.counters = {}
+        self.histograms = {}
+        self.help = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def timed(self, name, **labels):
+        """
+        Context manager and decorator observing the time spent in a block, in seconds, in the histogram name.
+        """
+        return _Timer(self, name, labels)
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def counter(self, name, **labels):
+        return self.counters.get((name, _labels(labels)), 0)
+
+    def histogram(self, name, **labels):
+        return self.histograms.get((name, _labels(labels)))
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def export(self):
+        """
+        Returns every metric in the Prometheus text exposition format.
+        """
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, (histogram.buckets, list(histogram.counts), histogram.sum, histogram.count))
+                                for key, histogram in self.histograms.items())
+        lines = []
+        described = set()
+
+        def header(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), (buckets, counts, total, count) in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_snapshot(self, path):
+        """
+        Writes export() to path atomically.
+        """
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.export())
+        os.replace(temp_path, path)
+
+
+class _Timer(ContextDecorator):
+    __slots__ = ("registry", "name", "labels", "start")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def _recreate_cm(self):
+        #a fresh timer per call, so a decorated function can run in several threads at once
+        return _Timer(self.registry, self.name, self.labels)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+registry = Registry()
+inc = registry.inc
+observe = registry.observe
+timed = registry.timed
+export = registry.export
+
+
+def serve(port=9108, host="127.0.0.1", source=registry):
+    """
+    Serves source.export() on http://host:port/metrics from a daemon thread.
+
+    Returns:
+        The HTTP server; call shutdown() on it to stop serving.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = source.export().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    return server
+
+
+def start_snapshots(path, interval=60.0, source=registry):
+    """
+    Writes source to path every interval seconds from a daemon thread.
+
+    Returns:
+        A threading.Event; set it to stop (a last snapshot is written).
+    """
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            source.write_snapshot(path)
+        source.write_snapshot(path)
+
+    threading.Thread(target=run, daemon=True, name="metrics-snapshots").start()
+    return stop
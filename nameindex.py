@@ -0,0 +1,94 @@
+import bisect
+import re
+from collections import Counter, defaultdict
+
+_SEPARATORS = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(name):
+    """
+    Given a name such as "Rope, hempen (50 feet)" or "Burglar's Pack", returns it in the form of an
+    SRD index ("rope-hempen-50-feet", "burglars-pack").
+    """
+    name = name.lower().replace("'", "").replace("’", "")
+    return _SEPARATORS.sub("-", name).strip("-")
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    Local index of the entries of an SRD collection by index and display name.
+
+    Names are normalized to the SRD index form, so "Magic Missile", "magic missile" and
+    "magic-missile" resolve to the same entry. Prefix lookups use a sorted key list, and
+    fuzzy lookups rank candidates by trigram similarity (Dice coefficient).
+
+    Args:
+        entries: (index, display name) pairs.
+    """
+
+    def __init__(self, entries=()):
+        self.names = {}
+        self._keys = {}
+        self._sorted_keys = []
+        self._trigrams = defaultdict(set)
+        self._trigram_counts = {}
+        for index, name in entries:
+            self.add(index, name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, index, name):
+        self.names[index] = name
+        for key in {normalize(index), normalize(name)}:
+            if key not in self._keys:
+                bisect.insort(self._sorted_keys, key)
+                trigrams = _trigrams(key)
+                self._trigram_counts[key] = len(trigrams)
+                for trigram in trigrams:
+                    self._trigrams[trigram].add(key)
+            self._keys[key] = index
+
+    def resolve(self, name):
+        """
+        Given an index or display name, returns the matching index, or None if there is no exact match.
+        """
+        return self._keys.get(normalize(name))
+
+    def prefix(self, name, limit=10):
+        """
+        Returns up to limit indexes whose index or display name starts with name.
+        """
+        key = normalize(name)
+        position = bisect.bisect_left(self._sorted_keys, key)
+        matches = []
+        while position < len(self._sorted_keys) and self._sorted_keys[position].startswith(key) and len(matches) < limit:
+            index = self._keys[self._sorted_keys[position]]
+            if index not in matches:
+                matches.append(index)
+            position += 1
+        return matches
+
+    def suggest(self, name, limit=5, min_score=0.4):
+        """
+        Returns up to limit (index, score) pairs for the entries closest to name, best first.
+
+        Scores are the Dice coefficient of the trigram sets, between 0 and 1.
+        """
+        key = normalize(name)
+        trigrams = _trigrams(key)
+        shared = Counter()
+        for trigram in trigrams:
+            shared.update(self._trigrams.get(trigram, ()))
+        best = {}
+        for candidate, count in shared.items():
+            score = 2 * count / (len(trigrams) + self._trigram_counts[candidate])
+            index = self._keys[candidate]
+            if score >= min_score and score > best.get(index, 0):
+                best[index] = score
+        return sorted(best.items(), key=lambda item: (-item[1], item[0]))[:limit]
@@ -0,0 +1,312 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from streaming import DISCORD_MESSAGE_LIMIT, split_message
+
+#Discord allows about 5 messages per 5 seconds in a channel and 50 requests per second per bot
+CHANNEL_RATE = (5, 5.0)
+GLOBAL_RATE = (50, 1.0)
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Token bucket allowing rate requests every per seconds, with bursts of up to rate requests.
+    """
+
+    def __init__(self, rate, per, clock=time.monotonic, sleep=asyncio.sleep):
+        self.rate = rate
+        self.per = per
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(rate)
+        self.updated_at = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated_at) * self.rate / self.per)
+        self.updated_at = now
+
+    def delay(self):
+        """
+        Takes a token and returns 0 if one is available, otherwise returns the time until there is one, in seconds.
+        """
+        self._refill()
+        #a bucket refilled for exactly the delay returned may miss a whole token by a rounding error
+        if self.tokens >= 1 - 1e-9:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) * self.per / self.rate
+
+    async def acquire(self):
+        """
+        Waits until a token is available and takes it. Returns the time waited, in seconds.
+        """
+        waited = 0.0
+        while (delay := self.delay()) > 0:
+            await self.sleep(delay)
+            waited += delay
+        return waited
+
+    def hold(self, seconds):
+        """
+        Empties the bucket for seconds, e.g. after Discord answered 429 with retry_after.
+        """
+        self._refill()
+        self.tokens = -seconds * self.rate / self.per
+
+
+class _Outgoing:
+    __slots__ = ("text", "coalesce", "future", "final")
+
+    def __init__(self, text, coalesce, future, final=True):
+        self.text = text
+        self.coalesce = coalesce
+        self.future = future
+        self.final = final #False for the first parts of a text split in several messages
+
+
+class OutboundQueue:
+    """
+    Queue of the messages sent to Discord channels.
+
+    Each channel has its own queue and sender task, paced by a per-channel RateLimiter and one
+    shared by every channel. While a channel waits for its rate limit, the messages queued behind
+    are coalesced: they go out as one message, up to limit characters, instead of one send each.
+    Texts longer than limit are split at line breaks. A channel whose queue is empty has no task.
+
+    Args:
+        rate: (messages, seconds) allowed per channel.
+        global_rate: (messages, seconds) allowed for all channels together.
+        limit: Maximum length of a message.
+        clock, sleep: Time source and sleep coroutine of the rate limiters.
+    """
+
+    def __init__(self, rate=CHANNEL_RATE, global_rate=GLOBAL_RATE, limit=DISCORD_MESSAGE_LIMIT, clock=time.monotonic, sleep=asyncio.sleep):
+        self.rate = rate
+        self.limit = limit
+        self.clock = clock
+        self.sleep = sleep
+        self.global_limiter = RateLimiter(*global_rate, clock=clock, sleep=sleep)
+        self.stats = {"posted": 0, "sent": 0, "coalesced": 0, "throttled_seconds": 0.0, "retries": 0}
+        self._queues = {}
+        self._limiters = {}
+        self._tasks = {}
+
+    def post(self, target, text, coalesce=True):
+        """
+        Queues text for target (a channel or user) and returns right away.
+
+        Args:
+            coalesce: If False, the text is sent in a message of its own, e.g. to edit it later.
+
+        Returns:
+            An asyncio.Future resolved with the last message the text was sent in.
+        """
+        key = getattr(target, "id", None) or id(target)
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(key, deque()).append(_Outgoing(text, coalesce, future))
+        self.stats["posted"] += 1
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.create_task(self._drain(key, target))
+        return future
+
+    async def send(self, target, text):
+        """
+        Queues text for target and waits until it is sent. Returns the last message it was sent in.
+        """
+        return await self.post(target, text, coalesce=False)
+
+    def _next_batch(self, queue):
+        first = queue.popleft()
+        if len(first.text) > self.limit:
+            part, rest = split_message(first.text, self.limit)
+            queue.appendleft(_Outgoing(rest, first.coalesce, first.future))
+            return part, [_Outgoing(part, False, first.future, final=False)]
+        batch = [first]
+        text = first.text
+        while first.coalesce and queue and queue[0].coalesce and len(text) + 1 + len(queue[0].text) <= self.limit:
+            entry = queue.popleft()
+            text += "\n" + entry.text
+            batch.append(entry)
+        self.stats["coalesced"] += len(batch) - 1
+        return text, batch
+
+    async def _drain(self, key, target):
+        queue = self._queues[key]
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = self._limiters[key] = RateLimiter(*self.rate, clock=self.clock, sleep=self.sleep)
+        try:
+            while queue:
+                waited = await limiter.acquire()
+                waited += await self.global_limiter.acquire()
+                self.stats["throttled_seconds"] += waited
+                text, batch = self._next_batch(queue)
+                try:
+                    message = await target.send(text)
+                except Exception as e:
+                    retry_after = getattr(e, "retry_after", None)
+                    if retry_after is not None:
+                        #rate limited anyway: put the text back and wait as long as Discord asks
+                        limiter.hold(retry_after)
+                        queue.extendleft(reversed(batch))
+                        self.stats["retries"] += 1
+                        continue
+                    for entry in batch:
+                        if not entry.final:
+                            #drop the rest of a text whose first part failed
+                            queue.popleft()
+                        if not entry.future.done():
+                            entry.future.set_exception(e)
+                    continue
+                self.stats["sent"] += 1
+                metrics.inc("discord_messages_sent_total")
+                for entry in batch:
+                    if entry.final and not entry.future.done():
+                        entry.future.set_result(message)
+        finally:
+            del self._tasks[key]
+            if not queue:
+                del self._queues[key]
+
+    async def join(self):
+        """
+        Waits until every queued message is sent.
+        """
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks.values()), return_exceptions=True)
+
+
+class OutboundTarget:
+    """
+    Stands for a channel in relay_stream: messages are sent through the OutboundQueue (uncoalesced,
+    since they are edited afterwards), and edits go to Discord directly.
+    """
+
+    def __init__(self, outbound, target):
+        self.outbound = outbound
+        self.target = target
+        self.id = getattr(target, "id", None) or id(target)
+
+    async def send(self, text):
+        return await self.outbound.send(self.target, text)
+
+
+class ChannelPipeline:
+    """
+    Runs the turns of every channel off the gateway event loop.
+
+    Turns of a channel run one after the other, in the order they arrived, and turns of different
+    channels run concurrently. Blocking work (SRD lookups, model calls) goes to a bounded thread
+    pool through run_blocking, so the event loop keeps serving the other guilds. Each channel may
+    have at most max_pending turns waiting: submit refuses the next ones, so a flood in one channel
+    cannot queue unbounded work.
+
+    Args:
+        workers: Threads of the pool running blocking work.
+        max_pending: Turns that may wait per channel, besides the one running.
+    """
+
+    def __init__(self, workers=16, max_pending=20):
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline")
+        self.stats = {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0}
+        self._queues = {}
+        self._tasks = {}
+
+    def submit(self, key, turn, *args):
+        """
+        Queues the coroutine function turn(*args) behind the other turns of channel key.
+
+        Returns:
+            False if the channel already has max_pending turns waiting and the turn was refused.
+        """
+        queue = self._queues.setdefault(key, deque())
+        if len(queue) >= self.max_pending:
+            self.stats["rejected"] += 1
+            metrics.inc("pipeline_turns_rejected_total")
+            return False
+        queue.append((turn, args, time.perf_counter()))
+        self.stats["submitted"] += 1
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.create_task(self._run(key))
+        return True
+
+    async def _run(self, key):
+        queue = self._queues[key]
+        try:
+            while queue:
+                turn, args, queued_at = queue.popleft()
+                metrics.observe("pipeline_queue_seconds", time.perf_counter() - queued_at)
+                try:
+                    await turn(*args)
+                    self.stats["completed"] += 1
+                except Exception:
+                    self.stats["failed"] += 1
+                    logger.exception("Turn failed", extra={"event": "turn_failed", "channel": str(key)})
+        finally:
+            del self._tasks[key]
+            if not queue:
+                del self._queues[key]
+
+    async def run_blocking(self, function, *args):
+        """
+        Runs function(*args) in the pool and returns its result.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    def pending(self, key):
+        return len(self._queues.get(key, ()))
+
+    async def join(self):
+        """
+        Waits until every submitted turn is done.
+        """
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks.values()), return_exceptions=True)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a task sleeping interval seconds: the time the loop was
+    blocked by something else. Lags go to the event_loop_lag_seconds histogram and to samples.
+    """
+
+    def __init__(self, interval=0.05, samples=10000):
+        self.interval = interval
+        self.samples = deque(maxlen=samples)
+        self._task = None
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self.samples.append(lag)
+            metrics.observe("event_loop_lag_seconds", lag)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def quantile(self, fraction):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
@@ -0,0 +1,204 @@
+import sqlite3
+import threading
+import time
+
+import savefile
+from dnd import PlayableCharacter
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS characters ("
+    "campaign TEXT NOT NULL, owner TEXT NOT NULL, name TEXT NOT NULL, "
+    "player_class TEXT, race TEXT, level INTEGER NOT NULL, "
+    "version INTEGER NOT NULL, updated_at REAL NOT NULL, data BLOB NOT NULL, "
+    "PRIMARY KEY (campaign, owner, name))",
+    "CREATE INDEX IF NOT EXISTS characters_campaign_class ON characters (campaign, player_class, level)",
+    "CREATE INDEX IF NOT EXISTS characters_campaign_race ON characters (campaign, race, level)",
+    "CREATE INDEX IF NOT EXISTS characters_class ON characters (player_class, level)",
+    "CREATE INDEX IF NOT EXISTS characters_race ON characters (race, level)",
+    "CREATE INDEX IF NOT EXISTS characters_owner ON characters (owner)",
+    "CREATE INDEX IF NOT EXISTS characters_level ON characters (level)",
+]
+
+
+class ConflictError(Exception):
+    """
+    Raised when a character was changed by someone else since it was read.
+    """
+
+
+class CharacterRepository:
+    """
+    Store of characters in a SQLite database.
+
+    Each character is a row keyed by (campaign, owner, name), so characters with the same
+    name in different guilds or of different players do not collide. The sheet is stored in
+    the binary save format, next to indexed owner, campaign, class, race and level columns,
+    so queries such as "level 5 wizards of this guild" read only the matching rows. The
+    database runs in WAL mode, so readers are not blocked by a writer.
+
+    Writes use optimistic concurrency: every row has a version, characters remember the
+    version they were read at, and a write fails with ConflictError if the row changed in
+    between.
+
+    Args:
+        path: SQLite file, or ":memory:".
+        clock: Function returning the current time, in seconds.
+    """
+
+    def __init__(self, path="characters.db", clock=time.time):
+        self.path = path
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+
+    def _write(self, character, owner, campaign, force):
+        data = character.to_dict()
+        row = (data["player_class"], data["race"], data["level"], self.clock(), savefile.encode(data),
+               campaign, owner, data["name"])
+        version = getattr(character, "version", 0)
+        if force:
+            (new_version,) = self._db.execute(
+                "INSERT INTO characters (player_class, race, level, updated_at, data, campaign, owner, name, version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1) ON CONFLICT (campaign, owner, name) DO UPDATE SET "
+                "player_class = excluded.player_class, race = excluded.race, level = excluded.level, "
+                "updated_at = excluded.updated_at, data = excluded.data, version = version + 1 "
+                "RETURNING version", row).fetchone()
+        elif version == 0:
+            try:
+                self._db.execute("INSERT INTO characters (player_class, race, level, updated_at, data, campaign, owner, name, version) "
+                                 "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)", row)
+            except sqlite3.IntegrityError:
+                raise ConflictError(f"{data['name']} already exists in campaign {campaign!r}") from None
+            new_version = 1
+        else:
+            cursor = self._db.execute("UPDATE characters SET player_class = ?, race = ?, level = ?, updated_at = ?, data = ?, "
+                                      "version = version + 1 WHERE campaign = ? AND owner = ? AND name = ? AND version = ?",
+                                      row + (version,))
+            if cursor.rowcount == 0:
+                raise ConflictError(f"{data['name']} was changed since version {version}")
+            new_version = version + 1
+        return new_version
+
+    def put(self, character, owner="", campaign="", force=False):
+        """
+        Saves a character, checking that its row did not change since the character was read.
+
+        Args:
+            character: The PlayableCharacter to save. Its version is updated.
+            owner: Player owning the character, e.g. a Discord user id.
+            campaign: Campaign the character plays in, e.g. a Discord guild id.
+            force: Overwrite the row whatever its version.
+
+        Returns:
+            The new version of the row.
+
+        Raises:
+            ConflictError: If the row was changed or created since the character was read.
+        """
+        return self.put_many([character], owner, campaign, force)[0]
+
+    def put_many(self, characters, owner="", campaign="", force=False):
+        """
+        Saves many characters in one transaction: either all of them are saved or, on a conflict, none.
+
+        Characters are PlayableCharacters, or (character, owner, campaign) tuples to give each its own
+        owner and campaign.
+
+        Returns:
+            The new versions of the rows, in order.
+        """
+        entries = [entry if isinstance(entry, tuple) else (entry, owner, campaign) for entry in characters]
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                versions = [self._write(character, str(entry_owner), str(entry_campaign), force)
+                            for character, entry_owner, entry_campaign in entries]
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+        for (character, _, _), version in zip(entries, versions):
+            character.version = version
+        return versions
+
+    def get(self, name, owner="", campaign=""):
+        """
+        Returns the character, with the version it was read at, or None if there is none.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT data, version FROM characters WHERE campaign = ? AND owner = ? AND name = ?",
+                                   (str(campaign), str(owner), name)).fetchone()
+        if row is None:
+            return None
+        character = PlayableCharacter.from_dict(savefile.decode(row[0]))
+        character.version = row[1]
+        return character
+
+    def delete(self, name, owner="", campaign=""):
+        """
+        Deletes a character. Returns True if it existed.
+        """
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM characters WHERE campaign = ? AND owner = ? AND name = ?",
+                                      (str(campaign), str(owner), name))
+        return cursor.rowcount > 0
+
+    def _where(self, criteria):
+        conditions, values = [], []
+        for column in ("campaign", "owner", "player_class", "race", "level"):
+            value = criteria.get(column)
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                values.append(value if column == "level" else str(value))
+        if criteria.get("min_level") is not None:
+            conditions.append("level >= ?")
+            values.append(criteria["min_level"])
+        if criteria.get("max_level") is not None:
+            conditions.append("level <= ?")
+            values.append(criteria["max_level"])
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), values
+
+    def find(self, campaign=None, owner=None, player_class=None, race=None, level=None, min_level=None, max_level=None, limit=None):
+        """
+        Returns the characters matching every given criterion, ordered by name.
+
+        Example:
+            repository.find(campaign=guild.id, player_class="wizard", level=5)
+        """
+        where, values = self._where(locals())
+        query = f"SELECT data, version FROM characters{where} ORDER BY name"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._db.execute(query, values).fetchall()
+        characters = []
+        for data, version in rows:
+            character = PlayableCharacter.from_dict(savefile.decode(data))
+            character.version = version
+            characters.append(character)
+        return characters
+
+    def count(self, campaign=None, owner=None, player_class=None, race=None, level=None, min_level=None, max_level=None):
+        """
+        Returns the number of characters matching every given criterion.
+        """
+        where, values = self._where(locals())
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM characters{where}", values).fetchone()[0]
+
+    def query_plan(self, **criteria):
+        """
+        Returns SQLite's plan for find(**criteria), e.g. "SEARCH characters USING INDEX characters_campaign_class (...)".
+        """
+        where, values = self._where(criteria)
+        with self._lock:
+            rows = self._db.execute(f"EXPLAIN QUERY PLAN SELECT data, version FROM characters{where} ORDER BY name", values).fetchall()
+        return "\n".join(row[-1] for row in rows)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
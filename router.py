@@ -0,0 +1,202 @@
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+import dnd
+import metrics
+from nameindex import normalize
+
+#collections searched for entity names, in order of preference when a name is in several of them
+COLLECTIONS = ["spells", "magic-items", "equipment"]
+MAX_NAME_WORDS = 6
+
+#question cues: a message without one is a narrative action, whatever names it mentions
+_QUESTION = re.compile(r"\?\s*$|^\s*(what|whats|what's|how|which|describe|explain|tell me|define|details|info|look up|lookup)\b"
+                       r"|\b(tell me about|what does|what is|how much|how far|how long|range of|cost of|price of)\b", re.IGNORECASE)
+#narrative cues that win over a question cue: "what happens if I cast fireball?" is a turn of the story
+_NARRATIVE = re.compile(r"\b(i|we|my|our|let's|lets)\b|\bhappens?\b|\bif\b", re.IGNORECASE)
+
+#(intent, pattern, collections the entity may come from), tried in order
+INTENTS = [
+    ("cost", re.compile(r"\b(cost|costs|price|worth|how much)\b", re.IGNORECASE), ["equipment"]),
+    ("level", re.compile(r"\b(what|which) level\b|\blevel of\b|\bspell level\b", re.IGNORECASE), ["spells"]),
+    ("range", re.compile(r"\brange\b|\bhow far\b", re.IGNORECASE), ["spells"]),
+    ("components", re.compile(r"\bcomponents?\b|\bmaterials?\b", re.IGNORECASE), ["spells"]),
+    ("duration", re.compile(r"\bduration\b|\bhow long does\b.*\blast\b", re.IGNORECASE), ["spells"]),
+    ("casting_time", re.compile(r"\bcasting time\b|\bhow long .*\bto cast\b", re.IGNORECASE), ["spells"]),
+    ("describe", re.compile(r".*"), COLLECTIONS),
+]
+
+
+@dataclass
+class Route:
+    """
+    A message recognised as an SRD lookup: the intent, the entity found and the answer.
+    """
+    intent: str
+    collection: str
+    index: str
+    answer: str
+
+
+def _cost(cost):
+    return f"{cost['quantity']} {cost['unit']}" if cost else "nothing"
+
+
+def _spell_summary(spell):
+    level = "cantrip" if spell.level == 0 else f"level {spell.level}"
+    school = spell.school["name"].lower() if spell.school else ""
+    extras = ", concentration" if spell.concentration else ""
+    extras += ", ritual" if spell.ritual else ""
+    return f"{spell.name}: {level} {school} spell, {spell.casting_time}, range {spell.range}, {spell.duration}{extras}."
+
+
+def _describe_spell(spell):
+    text = "\n".join([_spell_summary(spell)] + list(spell.desc))
+    if spell.higher_level:
+        text += "\n" + "\n".join(spell.higher_level)
+    return text
+
+
+def _describe_item(item):
+    lines = [f"{item.name} ({item.equipment_category['name']}): costs {_cost(item.cost)}."]
+    return "\n".join(lines + list(item.desc) + list(item.special or []))
+
+
+def _describe_magic_item(item):
+    rarity = item.rarity["name"].lower() if item.rarity else "unknown rarity"
+    return "\n".join([f"{item.name} ({rarity})"] + [line for line in item.desc if line])
+
+
+def _answer(intent, collection, record):
+    if collection == "spells":
+        if intent == "level":
+            return _spell_summary(record)
+        if intent == "range":
+            return f"{record.name} has a range of {record.range}."
+        if intent == "components":
+            material = f" ({record.material})" if record.material else ""
+            return f"{record.name} needs {', '.join(record.components)}{material}."
+        if intent == "duration":
+            concentration = " (concentration)" if record.concentration else ""
+            return f"The duration of {record.name} is {record.duration.lower()}{concentration}."
+        if intent == "casting_time":
+            return f"{record.name} takes {record.casting_time} to cast."
+        return _describe_spell(record)
+    if collection == "magic-items":
+        return _describe_magic_item(record)
+    if intent == "cost":
+        return f"{record.name} costs {_cost(record.cost)}."
+    return _describe_item(record)
+
+
+_GETTERS = {"spells": dnd.get_spell, "equipment": dnd.get_item, "magic-items": dnd.get_magic_item}
+
+
+def find_entity(message, collections=COLLECTIONS):
+    """
+    Returns the (collection, index) of the longest SRD name mentioned in message, or None.
+
+    Names are matched on whole words against the NameIndex of each collection, so "a shovel" and
+    "Shovels" find the shovel but "shove" does not.
+    """
+    indexes = [(collection, dnd.get_name_index(collection)) for collection in collections]
+    indexes = [(collection, index) for collection, index in indexes if index is not None]
+    if not indexes:
+        return None
+    words = normalize(message).split("-")
+    for size in range(min(MAX_NAME_WORDS, len(words)), 0, -1):
+        for start in range(len(words) - size + 1):
+            phrase = "-".join(words[start:start + size])
+            for collection, index in indexes:
+                match = index.resolve(phrase)
+                if match is None and phrase.endswith("s"):
+                    match = index.resolve(phrase[:-1])
+                if match is not None:
+                    return collection, match
+    return None
+
+
+def classify(message):
+    """
+    Returns the lookup intent of message ("cost", "level", "range", "components", "duration",
+    "casting_time" or "describe") and the collections its entity may come from, or None if the
+    message is not a reference question.
+    """
+    if not _QUESTION.search(message) or _NARRATIVE.search(message):
+        return None
+    for intent, pattern, collections in INTENTS:
+        if pattern.search(message):
+            return intent, collections
+    return None
+
+
+class Router:
+    """
+    Answers SRD reference questions, such as "what does fireball do?" or "how much does a shovel cost?",
+    from the (cached) SRD data, so only the narrative turns go to the model.
+
+    Keeps the number of turns served locally and forwarded, and their total time, to report the
+    fraction of turns served locally and an estimate of the latency saved.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.stats = {"local": 0, "forwarded": 0, "local_seconds": 0.0, "forwarded_seconds": 0.0}
+        self._lock = threading.Lock()
+
+    def route(self, message):
+        """
+        Returns the Route of a reference question, or None if message should go to the model.
+        """
+        intent = classify(message)
+        if intent is None:
+            return None
+        intent, collections = intent
+        entity = find_entity(message, collections)
+        if entity is None:
+            return None
+        collection, index = entity
+        record = _GETTERS[collection](index)
+        if record is None:
+            return None
+        return Route(intent, collection, index, _answer(intent, collection, record))
+
+    def answer(self, message):
+        """
+        Returns the local answer to message, or None if it should be forwarded to the model
+        (then call record_forwarded with the time the model took).
+        """
+        start = self.clock()
+        route = self.route(message)
+        elapsed = self.clock() - start
+        if route is None:
+            return None
+        with self._lock:
+            self.stats["local"] += 1
+            self.stats["local_seconds"] += elapsed
+        metrics.inc("router_turns_total", route="local", intent=route.intent)
+        metrics.observe("router_local_seconds", elapsed)
+        return route.answer
+
+    def record_forwarded(self, seconds):
+        with self._lock:
+            self.stats["forwarded"] += 1
+            self.stats["forwarded_seconds"] += seconds
+        metrics.inc("router_turns_total", route="model", intent="narrative")
+
+    def local_fraction(self):
+        total = self.stats["local"] + self.stats["forwarded"]
+        return self.stats["local"] / total if total else 0.0
+
+    def latency_saved(self, model_seconds=None):
+        """
+        Returns the time saved by the local answers, in seconds: what they would have taken at the
+        mean latency of the forwarded turns (or model_seconds), minus the time they took.
+        """
+        if model_seconds is None:
+            if not self.stats["forwarded"]:
+                return 0.0
+            model_seconds = self.stats["forwarded_seconds"] / self.stats["forwarded"]
+        return self.stats["local"] * model_seconds - self.stats["local_seconds"]
@@ -0,0 +1,72 @@
+import json
+import os
+import struct
+import zlib
+
+MAGIC = b"DNDC"
+#version 1 compressed the JSON with zlib, which made saves smaller but slower to load
+VERSION = 2
+BINARY_EXTENSION = ".dndc"
+
+#magic, schema version
+_HEADER = struct.Struct(">4sH")
+
+
+def encode(data):
+    """
+    Given a character dict, returns it in the binary save format (version 2): a header (magic
+    and schema version) followed by the compact, uncompressed JSON of the dict.
+    """
+    return _HEADER.pack(MAGIC, VERSION) + json.dumps(data, separators=(",", ":")).encode()
+
+
+def decode(blob):
+    """
+    Given the content of a save file, binary or JSON, returns the character dict.
+
+    Raises:
+        ValueError: If the binary save is truncated or corrupt, or was written by a newer, unknown schema version.
+    """
+    if blob[:len(MAGIC)] != MAGIC:
+        return json.loads(blob)
+    if len(blob) < _HEADER.size:
+        raise ValueError("truncated save file")
+    _, version = _HEADER.unpack_from(blob)
+    if version > VERSION:
+        raise ValueError(f"Save format version {version} is newer than the supported version {VERSION}")
+    payload = blob[_HEADER.size:]
+    if version == 1:
+        try:
+            payload = zlib.decompress(payload)
+        except zlib.error as e:
+            raise ValueError(f"corrupt save file: {e}") from e
+    return json.loads(payload)
+
+
+def write(path, data, binary=None):
+    """
+    Writes a character dict to path, atomically: the file is written next to it, synced to disk and
+    then renamed over it, so a crash or power loss leaves either the old or the new save.
+
+    Args:
+        path: File to write.
+        data: Character dict (PlayableCharacter.to_dict).
+        binary: Use the binary format; by default it is used when path ends with BINARY_EXTENSION.
+    """
+    if binary is None:
+        binary = path.endswith(BINARY_EXTENSION)
+    blob = encode(data) if binary else json.dumps(data, indent=4).encode()
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def read(path):
+    """
+    Returns the character dict saved at path, in either format.
+    """
+    with open(path, "rb") as f:
+        return decode(f.read())
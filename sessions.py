@@ -0,0 +1,218 @@
+import asyncio
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from history import HistoryManager
+from streaming import ReplyStream, iterate_in_thread
+
+
+def part_to_json(part):
+    """
+    Given a message part, returns its text, or {"file": name} for an uploaded file (referenced by name, not content).
+    """
+    if isinstance(part, (str, dict)):
+        return part
+    text = getattr(part, "text", None)
+    if text is not None:
+        return text
+    file_data = getattr(part, "file_data", None)
+    if file_data is not None:
+        return {"file": file_data.file_uri}
+    return {"file": part.name}
+
+
+def history_to_json(history):
+    """
+    Given a chat history (Content objects or dicts), returns it as a list of {"role", "parts"} dicts.
+    """
+    messages = []
+    for content in history:
+        if isinstance(content, dict):
+            role, parts = content["role"], content["parts"]
+        else:
+            role, parts = content.role, content.parts
+        messages.append({"role": role, "parts": [part_to_json(part) for part in parts]})
+    return messages
+
+
+def history_from_json(messages, load_file=None):
+    """
+    Given messages saved by history_to_json, returns them with the file references replaced by
+    load_file(name), or left out if there is no load_file.
+    """
+    history = []
+    for message in messages:
+        parts = []
+        for part in message["parts"]:
+            if isinstance(part, dict) and "file" in part:
+                if load_file is not None:
+                    parts.append(load_file(part["file"]))
+            else:
+                parts.append(part)
+        if parts:
+            history.append({"role": message["role"], "parts": parts})
+    return history
+
+
+class Session:
+    """
+    One campaign: a chat session plus the lock that keeps its turns in order.
+    """
+
+    def __init__(self, key, chat, clock):
+        self.key = key
+        self.chat = chat
+        self.lock = asyncio.Lock()
+        self.last_used = clock()
+        self.turns = 0
+
+
+class SessionManager:
+    """
+    Hosts many concurrent campaigns on one event loop.
+
+    Each key (for example a (guild id, channel id) pair) maps to its own chat session.
+    Turns of one session run in the order they were sent, while turns of different
+    sessions run concurrently, with at most max_concurrency model calls in flight
+    across all sessions. The blocking model calls run in a thread pool of that size. Sessions
+    idle for longer than idle_timeout are written to store_dir and dropped from
+    memory; they are restored from there on their next turn. With window_tokens set, each
+    session keeps a bounded context through a HistoryManager instead of the whole history.
+
+    Args:
+        model: Model used to start chats (anything with start_chat(history=...)).
+        max_concurrency: Maximum number of concurrent model calls.
+        idle_timeout: Time after which an idle session is evicted, in seconds.
+        store_dir: Directory where evicted sessions are stored.
+        window_tokens: Token budget of the recent turns of each session, or None to keep everything.
+        load_file: Function (name) -> file part, such as genai.get_file, for the uploaded files of restored
+            sessions; without it they are left out.
+    """
+
+    def __init__(self, model, max_concurrency=8, idle_timeout=1800, store_dir="sessions", clock=time.monotonic, window_tokens=None,
+                 load_file=None):
+        self.model = model
+        self.window_tokens = window_tokens
+        self.load_file = load_file
+        self.idle_timeout = idle_timeout
+        self.store_dir = store_dir
+        self.clock = clock
+        self.sessions = {}
+        self.stats = {"turns": 0, "created": 0, "restored": 0, "evicted": 0}
+        self._model_calls = asyncio.Semaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="session")
+
+    def _path(self, key):
+        name = "-".join(str(part) for part in key) if isinstance(key, tuple) else str(key)
+        return os.path.join(self.store_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", name) + ".json")
+
+    def get(self, key):
+        """
+        Returns the session of key, restoring it from disk or starting a new chat if needed.
+        """
+        session = self.sessions.get(key)
+        if session is None:
+            saved = {"history": [], "summary": ""}
+            path = self._path(key)
+            if os.path.exists(path):
+                with open(path) as f:
+                    saved = json.load(f)
+                self.stats["restored"] += 1
+            else:
+                self.stats["created"] += 1
+            history = history_from_json(saved["history"], self.load_file)
+            if self.window_tokens is None:
+                chat = self.model.start_chat(history=history)
+            else:
+                chat = HistoryManager(self.model, window_tokens=self.window_tokens)
+                chat.restore(saved.get("summary", ""), history)
+            session = self.sessions[key] = Session(key, chat, self.clock)
+        session.last_used = self.clock()
+        return session
+
+    async def send(self, key, message):
+        """
+        Sends a player message to the campaign of key and returns the reply text.
+        """
+        session = self.get(key)
+        async with session.lock:
+            async with self._model_calls:
+                loop = asyncio.get_running_loop()
+                with metrics.timed("model_reply_seconds", kind="send"):
+                    response = await loop.run_in_executor(self._executor, session.chat.send_message, message)
+            self._finish_turn(session)
+        return response.text
+
+    async def stream(self, key, message):
+        """
+        Sends a player message to the campaign of key and yields the reply chunks as they arrive.
+
+        The session lock and a model call slot are held until the generator finishes, so a consumer
+        that may stop early must close it, e.g. with contextlib.aclosing.
+        """
+        session = self.get(key)
+        async with session.lock:
+            async with self._model_calls:
+                loop = asyncio.get_running_loop()
+                reply = await loop.run_in_executor(self._executor, ReplyStream, session.chat, message)
+                async for chunk in iterate_in_thread(reply, self._executor):
+                    yield chunk
+            self._finish_turn(session)
+
+    def _finish_turn(self, session):
+        session.turns += 1
+        session.last_used = self.clock()
+        self.stats["turns"] += 1
+
+    def save(self, session):
+        """
+        Writes the turns of a session to store_dir. A HistoryManager session is saved as its summary
+        and recent turns, without the pinned and summary messages it adds to the context.
+        """
+        os.makedirs(self.store_dir, exist_ok=True)
+        path = self._path(session.key)
+        data = {"key": list(session.key) if isinstance(session.key, tuple) else session.key}
+        if isinstance(session.chat, HistoryManager):
+            data["summary"] = session.chat.summary
+            data["history"] = history_to_json(session.chat.recent)
+        else:
+            data["history"] = history_to_json(session.chat.history)
+        with open(path + ".tmp", "w") as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
+
+    def evict_idle(self):
+        """
+        Writes the sessions idle for longer than idle_timeout to disk and drops them from memory.
+
+        Returns:
+            The number of evicted sessions.
+        """
+        now = self.clock()
+        idle = [session for session in self.sessions.values()
+                if now - session.last_used > self.idle_timeout and not session.lock.locked()]
+        for session in idle:
+            self.save(session)
+            del self.sessions[session.key]
+        self.stats["evicted"] += len(idle)
+        return len(idle)
+
+    async def run_evictor(self, interval=60):
+        """
+        Evicts idle sessions every interval seconds, until cancelled.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_idle()
+
+    def close(self):
+        """
+        Writes every session to disk and stops the worker threads.
+        """
+        for session in self.sessions.values():
+            self.save(session)
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,155 @@
+"""
+Compact character sheets for the model context.
+
+A compact sheet is a few "key: values" lines holding only the fields that matter to the
+Dungeon Master, with empty fields left out. A delta lists only what changed since the
+sheet the model last saw, so the game loop sends a sheet once and then a line per change.
+"""
+import copy
+
+#(field of PlayableCharacter.to_dict, label in the compact sheet)
+SHEET_FIELDS = [
+    ("player_class", "class"),
+    ("player_subclass", "subclass"),
+    ("race", "race"),
+    ("background", "background"),
+    ("alignment", "alignment"),
+    ("level", "level"),
+    ("level_acm", "xp"),
+    ("carry_current", "load"),
+    ("saving_throws", "saves"),
+    ("proficiencies", "proficiencies"),
+    ("languages", "languages"),
+    ("spells", "spells"),
+    ("inventory", "inventory"),
+    ("equipped_items", "equipped"),
+]
+
+#list fields whose changes are sent as additions and removals
+LIST_FIELDS = {"saving_throws", "proficiencies", "languages", "spells"}
+
+#dict fields whose changes are sent per key
+DICT_FIELDS = {"inventory", "equipped_items"}
+
+
+def _count(quantity):
+    return "" if quantity == 1 else f" x{quantity}"
+
+
+def _format_value(field, value):
+    if field == "inventory":
+        return ", ".join(f"{item}{_count(quantity)}" for item, quantity in value.items())
+    if field == "equipped_items":
+        return ", ".join(f"{slot}={item}" for slot, item in value.items() if item is not None)
+    if isinstance(value, (list, tuple)):
+        return ", ".join(str(entry) for entry in value)
+    return str(value)
+
+
+def compact_sheet(data):
+    """
+    Given a character dict (PlayableCharacter.to_dict), returns its compact sheet.
+
+    Example:
+        [Char1]
+        class: rogue
+        race: tiefling
+        ...
+        inventory: leather-armor, dagger x2, thieves-tools
+    """
+    lines = []
+    for field, label in SHEET_FIELDS:
+        value = data.get(field)
+        if value is None or value == [] or value == {}:
+            continue
+        text = _format_value(field, value)
+        if text:
+            lines.append(f"{label}: {text}")
+    return f"[{data['name']}]\n" + "\n".join(lines)
+
+
+def sheet_delta(old, new):
+    """
+    Returns the changes between two character dicts, only for the fields that changed.
+
+    List fields map to {"+": added, "-": removed}, dict fields (inventory, equipped items) to
+    {key: new value}, with None for removed keys, and other fields to their new value.
+    """
+    delta = {}
+    for field, _ in SHEET_FIELDS:
+        before, after = old.get(field), new.get(field)
+        if before == after:
+            continue
+        if field in LIST_FIELDS:
+            before, after = before or [], after or []
+            change = {}
+            added = [entry for entry in after if entry not in before]
+            removed = [entry for entry in before if entry not in after]
+            if added:
+                change["+"] = added
+            if removed:
+                change["-"] = removed
+            if change:
+                delta[field] = change
+        elif field in DICT_FIELDS:
+            before, after = before or {}, after or {}
+            change = {key: after.get(key) for key in before.keys() | after.keys() if before.get(key) != after.get(key)}
+            if change:
+                delta[field] = dict(sorted(change.items(), key=lambda item: str(item[0])))
+        else:
+            delta[field] = after
+    return delta
+
+
+def format_delta(name, delta):
+    """
+    Given a character name and a sheet_delta, returns a one-line summary of the changes, or "" if there are none.
+
+    Example:
+        [Char1] level 2; spells +fire-bolt; inventory dagger x3, torch x0
+    """
+    changes = []
+    labels = dict(SHEET_FIELDS)
+    for field, change in delta.items():
+        if field in LIST_FIELDS:
+            entries = [f"+{entry}" for entry in change.get("+", [])] + [f"-{entry}" for entry in change.get("-", [])]
+            changes.append(f"{labels[field]} {' '.join(entries)}")
+        elif field == "inventory":
+            changes.append(f"inventory {', '.join(f'{item} x{quantity or 0}' for item, quantity in change.items())}")
+        elif field == "equipped_items":
+            changes.append(f"equipped {', '.join(f'{slot}={item}' for slot, item in change.items())}")
+        else:
+            changes.append(f"{labels[field]} {change}")
+    return f"[{name}] " + "; ".join(changes) if changes else ""
+
+
+class SheetTracker:
+    """
+    Remembers the last sheet the model saw of each character, to send only the changes afterwards.
+    """
+
+    def __init__(self):
+        self.sent = {}
+
+    def sheets(self):
+        """
+        Returns the compact sheets of every tracked character, as last sent.
+        """
+        return "\n\n".join(compact_sheet(data) for data in self.sent.values())
+
+    def update(self, characters):
+        """
+        Given character dicts, returns the text to send the model with the next turn: the compact
+        sheet of new characters and the changes of known ones. Returns "" if nothing changed.
+        """
+        parts = []
+        for data in characters:
+            old = self.sent.get(data["name"])
+            if old is None:
+                parts.append(compact_sheet(data))
+            else:
+                line = format_delta(data["name"], sheet_delta(old, data))
+                if line:
+                    parts.append(line)
+            self.sent[data["name"]] = copy.deepcopy(data)
+        return "\n".join(parts)
@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+SNAPSHOT_VERSION = 1
+COLLECTIONS = ["spells", "equipment", "equipment-categories", "magic-items", "classes", "races", "languages"]
+
+
+class Snapshot:
+    """
+    Local, versioned copy of the SRD collections used by dnd.
+
+    The snapshot is a single JSON file holding every record of each collection keyed
+    by index, plus the per-class spell lists. It is written with sorted keys and one
+    value per line so two snapshots can be compared with a plain text diff. The file
+    is only read on the first lookup; a missing file behaves like an empty snapshot.
+
+    Args:
+        path: Path of the snapshot file, or None for an empty snapshot.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.version = SNAPSHOT_VERSION
+        self.created_at = None
+        self.collections = {}
+        self.class_spells = {}
+        self._names = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_data(cls, data, path=None):
+        snapshot = cls(path)
+        snapshot._apply(data)
+        return snapshot
+
+    def _apply(self, data):
+        if data.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {data.get('version')}. Expected {SNAPSHOT_VERSION}")
+        self.created_at = data.get("created_at")
+        self.collections = data.get("collections", {})
+        self.class_spells = data.get("class_spells", {})
+        self._names = {collection: {record["name"].lower(): index for index, record in records.items()}
+                       for collection, records in self.collections.items()}
+        self._loaded = True
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if self.path is not None and os.path.exists(self.path):
+                with open(self.path) as f:
+                    self._apply(json.load(f))
+            self._loaded = True
+
+    def __bool__(self):
+        self._ensure_loaded()
+        return bool(self.collections)
+
+    def get(self, path):
+        """
+        Given an API path such as "spells/fireball", "languages" or "classes/wizard/spells", returns the stored
+        response, or None if the snapshot does not hold it.
+        """
+        self._ensure_loaded()
+        parts = path.strip("/").split("/")
+        if len(parts) == 1 and parts[0] in self.collections:
+            return self.listing(parts[0])
+        if len(parts) == 2:
+            return self.collections.get(parts[0], {}).get(parts[1])
+        if len(parts) == 3 and parts[0] == "classes" and parts[2] == "spells":
+            results = self.class_spells.get(parts[1])
+            if results is not None:
+                return {"count": len(results), "results": results}
+        return None
+
+    def find(self, collection, name):
+        """
+        Given a collection and a display name, returns the matching record (case insensitive), or None.
+        """
+        self._ensure_loaded()
+        index = self._names.get(collection, {}).get(name.lower())
+        return self.collections[collection][index] if index is not None else None
+
+    def listing(self, collection):
+        """
+        Given a collection, returns it in the shape of the API list endpoint.
+        """
+        self._ensure_loaded()
+        results = []
+        for index in sorted(self.collections.get(collection, {})):
+            record = self.collections[collection][index]
+            entry = {"index": index, "name": record["name"], "url": record["url"]}
+            if collection == "spells":
+                entry["level"] = record["level"]
+            results.append(entry)
+        return {"count": len(results), "results": results}
+
+    def to_data(self):
+        self._ensure_loaded()
+        return {"version": self.version, "created_at": self.created_at,
+                "collections": self.collections, "class_spells": self.class_spells}
+
+    def save(self, path=None):
+        """
+        Writes the snapshot to path (or its own path), replacing the previous file atomically.
+        """
+        path = path or self.path
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.to_data(), f, indent=1, sort_keys=True)
+            f.write("\n")
+        os.replace(temp_path, path)
+        self.path = path
+
+
+def crawl(fetch, previous=None, revalidate=False):
+    """
+    Downloads every SRD collection into a new Snapshot.
+
+    Records already present in previous are reused without a request, unless revalidate
+    is True, in which case they are fetched again and only counted as changed when
+    their updated_at differs.
+
+    Args:
+        fetch: Function taking an API path and returning the decoded JSON, or None.
+        previous: Snapshot to refresh incrementally, if any.
+        revalidate: Whether to refetch records that are already in previous.
+
+    Returns:
+        A tuple (snapshot, report) where report maps each collection to its lists of
+        added, changed and removed indexes.
+    """
+    old = previous.to_data()["collections"] if previous else {}
+    collections = {}
+    report = {}
+    for collection in COLLECTIONS:
+        listing = fetch(collection)
+        if listing is None:
+            raise RuntimeError(f"Could not list {collection}")
+        before = old.get(collection, {})
+        records = {}
+        changes = {"added": [], "changed": [], "removed": sorted(set(before) - {r["index"] for r in listing["results"]})}
+        for entry in listing["results"]:
+            index = entry["index"]
+            if index in before and not revalidate:
+                records[index] = before[index]
+                continue
+            record = fetch(f"{collection}/{index}")
+            if record is None:
+                continue
+            records[index] = record
+            if index not in before:
+                changes["added"].append(index)
+            elif before[index].get("updated_at") != record.get("updated_at"):
+                changes["changed"].append(index)
+        collections[collection] = records
+        report[collection] = changes
+
+    class_spells = {}
+    for index in collections["classes"]:
+        listing = fetch(f"classes/{index}/spells")
+        if listing is not None:
+            class_spells[index] = listing["results"]
+
+    snapshot = Snapshot.from_data({"version": SNAPSHOT_VERSION,
+                                   "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                                   "collections": collections, "class_spells": class_spells})
+    return snapshot, report
+
+
+def diff(old, new):
+    """
+    Compares two snapshots by index and updated_at.
+
+    Returns:
+        A dict mapping each collection to its lists of added, changed and removed indexes.
+    """
+    old_collections = old.to_data()["collections"]
+    new_collections = new.to_data()["collections"]
+    report = {}
+    for collection in COLLECTIONS:
+        before = old_collections.get(collection, {})
+        after = new_collections.get(collection, {})
+        report[collection] = {
+            "added": sorted(set(after) - set(before)),
+            "changed": sorted(i for i in set(after) & set(before)
+                              if after[i].get("updated_at") != before[i].get("updated_at")),
+            "removed": sorted(set(before) - set(after)),
+        }
+    return report
+
+
+def _print_report(report):
+    for collection, changes in report.items():
+        summary = ", ".join(f"{len(indexes)} {kind}" for kind, indexes in changes.items())
+        print(f"{collection}: {summary}")
+
+
+def main(argv=None):
+    import dnd
+
+    parser = argparse.ArgumentParser(prog="snapshot", description="Build and maintain the offline SRD snapshot.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="download every collection into a new snapshot")
+    build.add_argument("path", nargs="?", default=dnd.SNAPSHOT_PATH)
+    refresh = commands.add_parser("refresh", help="fetch records added upstream since the snapshot was taken")
+    refresh.add_argument("path", nargs="?", default=dnd.SNAPSHOT_PATH)
+    refresh.add_argument("--revalidate", action="store_true", help="refetch every record and compare updated_at")
+    compare = commands.add_parser("diff", help="compare two snapshots")
+    compare.add_argument("old")
+    compare.add_argument("new")
+    args = parser.parse_args(argv)
+
+    if args.command == "diff":
+        _print_report(diff(Snapshot(args.old), Snapshot(args.new)))
+        return 0
+
+    previous = Snapshot(args.path) if args.command == "refresh" else None
+    snapshot, report = crawl(dnd._request, previous, revalidate=getattr(args, "revalidate", False))
+    snapshot.save(args.path)
+    _print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+from collections import defaultdict
+
+MAX_SPELL_LEVEL = 9
+
+
+def on_spell_list(spell, player_class, player_subclass=None):
+    """
+    Checks a spell's own class and subclass lists, for spells that are not indexed.
+    """
+    return any(entry["index"] == player_class for entry in spell.classes or []) or \
+        (player_subclass is not None and any(entry["index"] == player_subclass for entry in spell.subclasses or []))
+
+
+class SpellIndex:
+    """
+    In-memory index over a set of spells.
+
+    Keeps inverted indexes (spell index sets) on class, subclass, level, school, ritual
+    and concentration, so compound queries are answered by intersecting a few sets
+    instead of scanning every spell.
+
+    Args:
+        spells: Spell records to index.
+    """
+
+    def __init__(self, spells=()):
+        self.spells = {}
+        self.by_class = defaultdict(set)
+        self.by_subclass = defaultdict(set)
+        self.by_level = defaultdict(set)
+        self.by_school = defaultdict(set)
+        self.rituals = set()
+        self.concentration = set()
+        for spell in spells:
+            self.add(spell)
+
+    def __len__(self):
+        return len(self.spells)
+
+    def __contains__(self, spell_index):
+        return spell_index in self.spells
+
+    def add(self, spell):
+        """
+        Adds a spell to every index, replacing a previous spell with the same index.
+        """
+        if spell.index in self.spells:
+            self.remove(spell.index)
+        self.spells[spell.index] = spell
+        for player_class in spell.classes or []:
+            self.by_class[player_class["index"]].add(spell.index)
+        for subclass in spell.subclasses or []:
+            self.by_subclass[subclass["index"]].add(spell.index)
+        self.by_level[spell.level].add(spell.index)
+        if spell.school:
+            self.by_school[spell.school["index"]].add(spell.index)
+        if spell.ritual:
+            self.rituals.add(spell.index)
+        if spell.concentration:
+            self.concentration.add(spell.index)
+
+    def remove(self, spell_index):
+        self.spells.pop(spell_index, None)
+        for index in (self.by_class, self.by_subclass, self.by_level, self.by_school):
+            for spells in index.values():
+                spells.discard(spell_index)
+        self.rituals.discard(spell_index)
+        self.concentration.discard(spell_index)
+
+    def castable_by(self, spell, player_class, player_subclass=None):
+        """
+        Checks if a spell is on the spell list of a class or subclass.
+
+        Spells that are not indexed are checked against their own class and subclass lists, without
+        adding them, so a shared index is never written to outside of its construction.
+
+        Args:
+            spell: The Spell to check.
+            player_class: Index of the class, e.g. "wizard".
+            player_subclass: Index of the subclass, if any.
+
+        Returns:
+            True if the class or subclass can cast the spell, False otherwise.
+        """
+        if spell.index not in self.spells:
+            return on_spell_list(spell, player_class, player_subclass)
+        return spell.index in self.by_class.get(player_class, ()) or \
+            (player_subclass is not None and spell.index in self.by_subclass.get(player_subclass, ()))
+
+    def query(self, player_class=None, subclass=None, level=None, max_level=None, school=None, ritual=None, concentration=None):
+        """
+        Returns the indexes of the spells matching every given criterion, sorted by level and index.
+
+        Args:
+            player_class: Only spells on this class spell list.
+            subclass: Only spells on this subclass spell list.
+            level: Only spells of exactly this level.
+            max_level: Only spells of this level or lower.
+            school: Only spells of this school, e.g. "evocation".
+            ritual: If given, only spells that are (True) or are not (False) rituals.
+            concentration: If given, only spells that do (True) or do not (False) need concentration.
+        """
+        candidates = []
+        if player_class is not None:
+            candidates.append(self.by_class.get(player_class, set()))
+        if subclass is not None:
+            candidates.append(self.by_subclass.get(subclass, set()))
+        if level is not None:
+            candidates.append(self.by_level.get(level, set()))
+        if max_level is not None and max_level < MAX_SPELL_LEVEL:
+            candidates.append(set().union(*(self.by_level.get(lvl, ()) for lvl in range(max_level + 1))))
+        if school is not None:
+            candidates.append(self.by_school.get(school, set()))
+        if ritual:
+            candidates.append(self.rituals)
+        if concentration:
+            candidates.append(self.concentration)
+
+        if candidates:
+            candidates.sort(key=len)
+            result = candidates[0].intersection(*candidates[1:])
+        else:
+            result = set(self.spells)
+        if ritual is False:
+            result = result - self.rituals
+        if concentration is False:
+            result = result - self.concentration
+        return sorted(result, key=lambda index: (self.spells[index].level, index))
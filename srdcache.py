@@ -0,0 +1,152 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+
+class SRDCache:
+    """
+    Two-tier cache for SRD API responses.
+
+    Entries are keyed by the API path (endpoint and index, e.g. "spells/fireball")
+    and live in an in-process LRU tier backed by an optional SQLite file. Each
+    entry expires after `ttl` seconds; expired entries are kept so that they can
+    still be served if the API is unreachable. Refetched records whose updated_at
+    did not change, in either tier, are counted as "unchanged".
+
+    Args:
+        path: SQLite file for the disk tier, or None to keep the cache in memory only.
+        max_entries: Maximum number of entries kept in memory.
+        max_disk_entries: Maximum number of entries kept on disk.
+        ttl: Time to live of an entry, in seconds.
+        clock: Function returning the current time, in seconds.
+    """
+
+    def __init__(self, path=None, max_entries=1024, max_disk_entries=50000, ttl=7 * 24 * 3600, clock=time.time):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0,
+                      "unchanged": 0, "stores": 0, "evictions": 0}
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self._db = None
+
+    def _connection(self):
+        if self._db is None and self.path is not None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS entries ("
+                             "key TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at TEXT, "
+                             "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+            self._db.commit()
+        return self._db
+
+    def _load(self, key):
+        """
+        Returns the (data, stored_at) entry for key and the tier it was found in, promoting disk entries to memory.
+        """
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key], "memory_hits"
+        db = self._connection()
+        if db is None:
+            return None, "misses"
+        row = db.execute("SELECT data, stored_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, "misses"
+        db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (self.clock(), key))
+        db.commit()
+        entry = (json.loads(row[0]), row[1])
+        self._remember(key, entry)
+        return entry, "disk_hits"
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get(self, key, allow_stale=False):
+        """
+        Given a key, returns the cached data, or None if it is missing or expired.
+
+        If allow_stale is True, expired entries are returned as well.
+        """
+        with self._lock:
+            entry, tier = self._load(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                metrics.inc("srd_cache_lookups_total", tier="miss")
+                return None
+            data, stored_at = entry
+            if not allow_stale and self.clock() - stored_at > self.ttl:
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                metrics.inc("srd_cache_lookups_total", tier="expired")
+                return None
+            self.stats[tier] += 1
+            metrics.inc("srd_cache_lookups_total", tier=tier[:-len("_hits")])
+            return data
+
+    def put(self, key, data):
+        """
+        Stores data under key in both tiers, resetting its time to live.
+        """
+        now = self.clock()
+        updated_at = data.get("updated_at") if isinstance(data, dict) else None
+        with self._lock:
+            db = self._connection()
+            if updated_at is not None and self._previous_updated_at(key, db) == updated_at:
+                self.stats["unchanged"] += 1
+            self._remember(key, (data, now))
+            self.stats["stores"] += 1
+            if db is not None:
+                db.execute("INSERT OR REPLACE INTO entries (key, data, updated_at, stored_at, accessed_at) "
+                           "VALUES (?, ?, ?, ?, ?)", (key, json.dumps(data), updated_at, now, now))
+                self._evict_disk(db)
+                db.commit()
+
+    def _previous_updated_at(self, key, db):
+        """
+        Returns the updated_at of the entry stored under key, looking in memory then on disk.
+        """
+        if key in self._memory:
+            previous = self._memory[key][0]
+            return previous.get("updated_at") if isinstance(previous, dict) else None
+        if db is None:
+            return None
+        row = db.execute("SELECT updated_at FROM entries WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def _evict_disk(self, db):
+        (count,) = db.execute("SELECT COUNT(*) FROM entries").fetchone()
+        if count > self.max_disk_entries:
+            db.execute("DELETE FROM entries WHERE key IN "
+                       "(SELECT key FROM entries ORDER BY accessed_at LIMIT ?)", (count - self.max_disk_entries,))
+            self.stats["evictions"] += count - self.max_disk_entries
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            db = self._connection()
+            if db is not None:
+                db.execute("DELETE FROM entries")
+                db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,106 @@
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class SRDClient:
+    """
+    Shared HTTP client for the SRD API.
+
+    All requests go through one requests.Session, so connections are kept alive and
+    pooled across threads. Requests time out, and responses with a status in
+    RETRY_STATUSES or connection errors are retried with exponential backoff and
+    full jitter (honouring Retry-After when the API sends it). Concurrent requests
+    for the same path are coalesced: the first caller fetches and the others wait for
+    its result.
+
+    Args:
+        base_url: URL that API paths are appended to.
+        timeout: Connect and read timeout, in seconds.
+        retries: Number of retries after the first attempt.
+        backoff: Base delay of the first retry, in seconds.
+        max_backoff: Maximum delay between two attempts, in seconds.
+        pool_size: Maximum number of pooled connections per host.
+    """
+
+    def __init__(self, base_url, timeout=(3.05, 10), retries=3, backoff=0.25, max_backoff=8.0, pool_size=32):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.stats = {"requests": 0, "retries": 0, "coalesced": 0}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get_json(self, path):
+        """
+        Given an API path, returns the decoded JSON response, or None if the API answered 404.
+
+        Raises:
+            requests.RequestException: If the request still fails after all retries.
+        """
+        with self._lock:
+            future = self._inflight.get(path)
+            leader = future is None
+            if leader:
+                future = self._inflight[path] = Future()
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(self._get_with_retries(path))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._inflight[path]
+        return future.result()
+
+    def _get_with_retries(self, path):
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                with self._lock:
+                    self.stats["requests"] += 1
+                response = self.session.get(self.base_url + path, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt:
+                    raise
+                self._sleep(attempt)
+                continue
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code == 404:
+                return None
+            if response.status_code not in RETRY_STATUSES or last_attempt:
+                response.raise_for_status()
+                return None
+            self._sleep(attempt, response.headers.get("Retry-After"))
+
+    def _sleep(self, attempt, retry_after=None):
+        with self._lock:
+            self.stats["retries"] += 1
+        metrics.inc("srd_request_retries_total")
+        if retry_after is not None and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            delay = random.uniform(0, self.backoff * 2 ** attempt)
+        time.sleep(min(delay, self.max_backoff))
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,134 @@
+import asyncio
+import time
+from collections import deque
+
+import metrics
+
+DISCORD_MESSAGE_LIMIT = 2000
+
+#(time to first token, total latency) of the most recent replies, in seconds
+timings = deque(maxlen=1000)
+
+
+class ReplyStream:
+    """
+    Streams a chat reply chunk by chunk.
+
+    Sends message with stream=True and yields the text of each chunk as it arrives,
+    recording the time to the first chunk and the total latency of the reply.
+
+    Args:
+        chat_session: Gemini chat session (anything with send_message(text, stream=True)).
+        message: The player message to send.
+    """
+
+    def __init__(self, chat_session, message, clock=time.perf_counter):
+        self.clock = clock
+        self.started_at = clock()
+        self.first_chunk_at = None
+        self.finished_at = None
+        self.parts = []
+        self._response = chat_session.send_message(message, stream=True)
+
+    def __iter__(self):
+        for chunk in self._response:
+            if self.first_chunk_at is None:
+                self.first_chunk_at = self.clock()
+            self.parts.append(chunk.text)
+            yield chunk.text
+        self.finished_at = self.clock()
+        timings.append((self.time_to_first_token, self.total_latency))
+        if self.first_chunk_at is not None:
+            metrics.observe("model_time_to_first_token_seconds", self.time_to_first_token)
+        metrics.observe("model_reply_seconds", self.total_latency, kind="stream")
+        metrics.observe("model_reply_chars", len(self.text), buckets=metrics.SIZE_BUCKETS, kind="stream")
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    @property
+    def time_to_first_token(self):
+        return None if self.first_chunk_at is None else self.first_chunk_at - self.started_at
+
+    @property
+    def total_latency(self):
+        return None if self.finished_at is None else self.finished_at - self.started_at
+
+
+async def iterate_in_thread(iterable, executor=None):
+    """
+    Iterates over a blocking iterable from a worker thread, so the event loop keeps running between chunks.
+
+    The chunks are read in executor, or in the default executor of the loop if None.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = iter(iterable)
+    done = object()
+    while True:
+        chunk = await loop.run_in_executor(executor, next, iterator, done)
+        if chunk is done:
+            return
+        yield chunk
+
+
+def split_message(text, limit=DISCORD_MESSAGE_LIMIT):
+    """
+    Splits text in the part that fits in one message, preferably at a line break or a space, and the rest.
+    """
+    if len(text) <= limit:
+        return text, ""
+    cut = text.rfind("\n", 0, limit)
+    if cut <= 0:
+        cut = text.rfind(" ", 0, limit)
+    if cut <= 0:
+        cut = limit
+    return text[:cut], text[cut:].lstrip()
+
+
+async def relay_stream(target, chunks, edit_interval=1.0, limit=DISCORD_MESSAGE_LIMIT, clock=time.monotonic):
+    """
+    Relays a streamed reply to a Discord channel or user.
+
+    The first chunk is posted as soon as it arrives, and the message is then edited with the
+    text received since, at most once every edit_interval seconds to stay within the edit rate
+    limit. When the text outgrows limit, the message is completed and the reply continues in a
+    new message.
+
+    Args:
+        target: A discord.abc.Messageable (channel or user).
+        chunks: Async iterable of text chunks.
+        edit_interval: Minimum time between two edits of a message, in seconds.
+        limit: Maximum length of a message.
+
+    Returns:
+        The list of messages sent.
+    """
+    messages = []
+    current = None
+    text = ""
+    shown = ""
+    last_edit = 0.0
+
+    async def show():
+        nonlocal current, shown, last_edit
+        if current is None:
+            current = await target.send(text)
+            messages.append(current)
+        elif text != shown:
+            await current.edit(content=text)
+        shown = text
+        last_edit = clock()
+
+    async for chunk in chunks:
+        text += chunk
+        while len(text) > limit:
+            text, rest = split_message(text, limit)
+            await show()
+            current, text, shown = None, rest, ""
+        if text and (current is None or clock() - last_edit >= edit_interval):
+            await show()
+
+    if text and text != shown:
+        await show()
+    return messages
@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from bootstrap import App, Lazy
+from fakemodel import FakeModel
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_imports_have_no_side_effects(tmp_path):
+    script = ("import sys, dungeonmasterai, discordBot, main\n"
+              "print(sorted(m for m in ('discord', 'google.generativeai', 'openai', 'dnd') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=dict(os.environ, PYTHONPATH=ROOT),
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_lazy_creates_the_value_once():
+    calls = []
+
+    def create():
+        time.sleep(0.02)
+        calls.append(1)
+        return object()
+
+    value = Lazy(create)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(value.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1 and len({id(result) for result in results}) == 1
+
+
+def test_settings_are_read_on_first_use(tmp_path):
+    path = tmp_path / "settings.json"
+    app = App(settings_path=str(path))
+    with pytest.raises(FileNotFoundError):
+        app.settings.get()
+    path.write_text(json.dumps({"discord": {"token": "abc"}}))
+    assert app.settings.get()["discord"]["token"] == "abc"
+
+
+def test_warm_up_runs_in_the_background():
+    release = threading.Event()
+
+    def create_model(app):
+        release.wait(1)
+        return FakeModel()
+
+    def failing_step():
+        raise RuntimeError("no network")
+
+    app = App(model_factory=create_model, warm_steps=[("srd", failing_step)])
+    app.start_warm_up()
+    assert not app.ready.is_set()
+    release.set()
+    assert app.ready.wait(1)
+    assert isinstance(app.model.get(), FakeModel)
+    assert set(app.timings) == {"model", "srd"}
+    assert list(app.errors) == ["srd"]
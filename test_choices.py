@@ -0,0 +1,82 @@
+import asyncio
+import builtins
+
+import pytest
+
+import choices
+import dnd
+
+
+def test_option_tree_is_expanded(srd_server):
+    barbarian = dnd.get_player_class("barbarian")
+    choice = choices.expand(barbarian.starting_equipment_options[0], dnd._category_equipment)
+    assert choice.letters() == ["a", "b"]
+    assert choice.options[0].grants == [("greataxe", 1)]
+    nested = choice.options[1].choices[0]
+    #magic items of the category are left out
+    assert [option.grants[0][0] for option in nested.options] == ["battleaxe", "greataxe", "longsword", "rapier", "shortsword"]
+
+    rogue = dnd.get_player_class("rogue")
+    bow = choices.expand(rogue.starting_equipment_options[1], dnd._category_equipment).options[0]
+    assert bow.grants == [("shortbow", 1), ("arrow", 20)]
+
+
+def test_magic_items_are_left_out_of_versioned_urls():
+    category = [{"index": "longsword", "name": "Longsword", "url": "/api/2014/equipment/longsword"},
+                {"index": "flame-tongue", "name": "Flame Tongue", "url": "/api/2014/magic-items/flame-tongue"}]
+    choice = {"choose": 1, "from": {"option_set_type": "equipment_category", "equipment_category": {"index": "martial-weapons"}}}
+    assert [option.grants for option in choices.expand(choice, lambda index: category).options] == [[("longsword", 1)]]
+
+
+def test_selections(srd_server):
+    barbarian = dnd.get_player_class("barbarian")
+    choice = choices.expand(barbarian.starting_equipment_options[0], dnd._category_equipment)
+    assert choices.resolve(choice, "A") == [("greataxe", 1)]
+    assert choices.resolve(choice, "longsword") == [("longsword", 1)]
+    assert choices.resolve(choice, "b", policy=choices.first_options) == [("battleaxe", 1)]
+    with pytest.raises(ValueError):
+        choices.resolve(choice, "b")
+    with pytest.raises(ValueError):
+        choices.resolve(choice, "dagger")
+
+    skills = choices.expand(barbarian.proficiency_choices[0], dnd._category_equipment)
+    assert choices.resolve(skills, ["skill-nature", "skill-athletics"]) == [("skill-nature", 1), ("skill-athletics", 1)]
+    with pytest.raises(ValueError):
+        choices.resolve(skills, ["skill-nature"])
+    with pytest.raises(ValueError):
+        choices.resolve(skills, ["skill-nature", "skill-nature"])
+    assert choices.resolve(skills, ["Nature", "animal handling"]) == [("skill-nature", 1), ("skill-animal-handling", 1)]
+
+
+def test_headless_characters(srd_server, monkeypatch):
+    monkeypatch.setattr(builtins, "input", lambda prompt: pytest.fail(f"prompted: {prompt}"))
+    barbarian = dnd.PlayableCharacter("Brom", background="soldier", alignment="chaotic-good", race="dwarf", player_class="barbarian",
+                                      equipment_choices=["rapier", "b"], choice_policy=choices.first_options)
+    assert barbarian.get_inventory() == {"explorers-pack": 1, "javelin": 4, "rapier": 1, "club": 1}
+    assert {"skill-animal-handling", "skill-athletics"} <= set(barbarian.proficiencies)
+
+    policy = choices.RandomOptions(seed=7)
+    rogue = asyncio.run(dnd.PlayableCharacter.build("Kess", background="criminal", alignment="chaotic-neutral", race="halfling",
+                                                    player_class="rogue", choice_policy=policy))
+    assert len([proficiency for proficiency in rogue.proficiencies if proficiency.startswith("skill-")]) == 4
+    wizards = [dnd.PlayableCharacter(f"Wizard{i}", background="sage", alignment="neutral-good", race="elf", player_class="wizard",
+                                     choice_policy=policy) for i in range(20)]
+    assert len({tuple(sorted(wizard.get_inventory())) for wizard in wizards}) > 1
+    assert all(len(wizard.proficiencies) == len(wizards[0].proficiencies) for wizard in wizards)
+
+
+def test_prompts_follow_the_tree(srd_server, monkeypatch):
+    answers = iter(["b", "c", "a", "athletics, survival"])
+    prompts = []
+
+    def answer(prompt):
+        prompts.append(prompt)
+        return next(answers)
+
+    monkeypatch.setattr(builtins, "input", answer)
+    barbarian = dnd.PlayableCharacter("Brom", background="soldier", alignment="chaotic-good", race="dwarf", player_class="barbarian")
+    assert "longsword" in barbarian.get_inventory() and "handaxe" in barbarian.get_inventory()
+    assert prompts[1].startswith("Choose any martial melee weapon: (a) Battleaxe,")
+    assert prompts[3].endswith("(letters or names, separated by commas): ")
+    assert "(b) Skill: Athletics" in prompts[3]
+    assert "skill-survival" in barbarian.proficiencies
@@ -0,0 +1,102 @@
+import pytest
+
+from dice import Dice, DiceExpression, band, parse_command, proficiency_bonus, resolve_command, saving_throw, skill_check
+from dnd import PlayableCharacter
+
+
+def rogue(level=1):
+    return PlayableCharacter.from_dict({"name": "Kess", "level": level, "saving_throws": ["dex", "int"],
+                                        "proficiencies": ["light-armor", "skill-stealth", "skill-perception"]})
+
+
+def test_parse_expressions():
+    assert DiceExpression.parse("d20") == DiceExpression(1, 20)
+    assert DiceExpression.parse("2d6+3") == DiceExpression(2, 6, 3)
+    assert DiceExpression.parse(" 4D4 - 1 ") == DiceExpression(4, 4, -1)
+    assert str(DiceExpression.parse("2d6+3")) == "2d6+3"
+    assert DiceExpression.parse("3d8").mean == 13.5
+    with pytest.raises(ValueError):
+        DiceExpression.parse("2x6")
+    with pytest.raises(ValueError):
+        DiceExpression.parse("0d6")
+
+
+def test_rolls_are_reproducible_and_in_range():
+    totals = Dice(seed=7).roll_many("2d6+3", 1000)
+    assert totals == Dice(seed=7).roll_many("2d6+3", 1000)
+    assert min(totals) == 5 and max(totals) == 15
+    assert abs(sum(totals) / len(totals) - 10) < 0.5
+
+    dice = Dice(seed=7)
+    roll = dice.roll("3d4")
+    assert len(roll.rolls) == 3 and roll.total == sum(roll.rolls)
+    assert dice.log[-1] is roll
+
+
+def test_advantage_and_disadvantage():
+    dice = Dice(seed=3)
+    for _ in range(100):
+        kept, rolls = dice.d20(advantage=True)
+        assert kept == max(rolls) and len(rolls) == 2
+        kept, rolls = dice.d20(disadvantage=True)
+        assert kept == min(rolls)
+        kept, rolls = dice.d20(advantage=True, disadvantage=True)
+        assert len(rolls) == 1
+
+
+def test_bands():
+    assert band(1, natural=1) == "catastrophic"
+    assert band(5) == "really bad"
+    assert band(9) == "slightly bad"
+    assert band(12) == "ok"
+    assert band(22, natural=19) == "perfect"
+    assert band(22, natural=1) == "catastrophic"
+    assert band(19, natural=19) == "great"
+    assert band(20, natural=20) == "perfect"
+
+
+def test_skill_checks_use_proficiencies_and_saving_throws():
+    assert proficiency_bonus(1) == 2 and proficiency_bonus(5) == 3
+    dice = Dice(seed=11)
+    result = skill_check(rogue(level=5), "stealth", dice)
+    assert result.proficient and result.bonus == 3 and result.total == result.natural + 3
+    result = skill_check(rogue(), "athletics", dice)
+    assert not result.proficient and result.total == result.natural
+    assert saving_throw(rogue(), "dex", dice).proficient
+    assert not saving_throw(rogue(), "str", dice).proficient
+    with pytest.raises(ValueError):
+        skill_check(rogue(), "flying", dice)
+
+    checks = [skill_check(rogue(), "stealth", Dice(seed=5), dc=12) for _ in range(2)]
+    assert checks[0] == checks[1]
+
+
+class LoadedDie:
+    def __init__(self, natural):
+        self.natural = natural
+
+    def d20(self, advantage=False, disadvantage=False):
+        return self.natural, [self.natural]
+
+
+def test_natural_rolls_do_not_decide_checks():
+    assert not skill_check(rogue(), "athletics", LoadedDie(20), dc=25).success
+    assert saving_throw(rogue(), "dex", LoadedDie(1), modifier=10, dc=12).success
+
+
+def test_commands_send_only_the_outcome():
+    assert parse_command("I open the door") is None
+    assert parse_command("/check stealth adv dc15 +1 I sneak past") == \
+        ("check", "stealth", {"advantage": True, "disadvantage": False, "dc": 15, "modifier": 1}, "I sneak past")
+    assert parse_command("/check stealth advance quietly") == \
+        ("check", "stealth", {"advantage": False, "disadvantage": False, "dc": None, "modifier": 0}, "advance quietly")
+    assert parse_command("/check perception discover the trap")[2:] == \
+        ({"advantage": False, "disadvantage": False, "dc": None, "modifier": 0}, "discover the trap")
+    assert parse_command("/save con dc12 dcx")[2:] == \
+        ({"advantage": False, "disadvantage": False, "dc": 12, "modifier": 0}, "dcx")
+
+    result, message = resolve_command(rogue(), "/check sleight-of-hand I pick his pocket", Dice(seed=2))
+    assert message == f"[Sleight of hand check: {result.band}] I pick his pocket"
+    assert str(result.natural) not in message.split("]")[0]
+    result, message = resolve_command(rogue(), "/save dex dc10", Dice(seed=2))
+    assert message == f"[DEX saving throw: {result.band}, {'success' if result.success else 'failure'}]"
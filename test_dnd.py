@@ -1,48 +1,194 @@
+import asyncio
+import threading
+
+import pytest
+
+import choices
 import dnd
 
-def test_existing_spells():
+
+def test_existing_spells(srd_server):
     assert dnd.get_spell("fireball").name == "Fireball"
 
 
-def test_non_existing_spells():
+def test_non_existing_spells(srd_server):
     assert dnd.get_spell("firebal") is None
     assert dnd.get_spell() is None
 
-def test_existing_items():
+def test_existing_items(srd_server):
     assert dnd.get_item("shovel").name == "Shovel"
 
-def test_non_existing_items():
+def test_non_existing_items(srd_server):
     assert dnd.get_item("shov") is None
     assert dnd.get_item() is None
 
 def test_existing_character_no_inventory():
-    char1 = dnd.PlayableCharacter("Char1")
+    char1 = dnd.PlayableCharacter.from_dict({"name": "Char1"})
     assert char1.get_inventory() == {}
     assert char1.get_spells() == []
 
 
-def test_can_add_item():
-    char1 = dnd.PlayableCharacter("Char1", player_class="Wizard")
+def test_can_add_item(srd_server):
+    char1 = dnd.PlayableCharacter("Char1", background="sage", alignment="neutral-good", race="human", player_class="wizard", choice_policy=choices.first_options)
     assert char1.can_add_item(dnd.get_item("shovel")) == True
     assert char1.can_add_item(dnd.get_item("shovel"), 9999999) == False
 
-def test_add_item():
-    char1 = dnd.PlayableCharacter("Char1", player_class="Wizard")
+def test_add_item(srd_server):
+    char1 = dnd.PlayableCharacter("Char1", background="sage", alignment="neutral-good", race="human", player_class="wizard", choice_policy=choices.first_options)
     char1.add_item(dnd.get_item("shovel"), 1)
-    assert "Shovel" in char1.get_inventory()
+    assert "shovel" in char1.get_inventory()
+
+def test_inventory_weight_and_value_are_running_totals(srd_server):
+    char1 = dnd.PlayableCharacter("Char1", background="sage", alignment="neutral-good", race="half-orc", player_class="wizard", choice_policy=choices.first_options, strength=14)
+    assert char1.strength == 16
+    assert char1.carry_capacity == 15 * 16
+    weight, value = char1.carry_current, char1.inventory_value
+    char1.add_item(dnd.get_item("shovel"), 2)
+    assert char1.carry_current == weight + 10
+    assert char1.inventory_value == value + 400
+    srd_server.reset_counts()
+    char1.use_consumable_item("shovel")
+    assert char1.can_add_item("shovel", 3)
+    assert srd_server.total_requests == 0
+    assert char1.carry_current == weight + 5
+    assert char1.encumbrance() == "unencumbered"
+
+def test_update_inventory_is_all_or_nothing(srd_server):
+    char1 = dnd.PlayableCharacter.from_dict({"name": "Char1", "strength": 10, "carry_capacity": 150})
+    char1.update_inventory(add=[("shovel", 12)])
+    assert char1.get_inventory() == {"shovel": 12}
+    assert char1.encumbrance() == "encumbered"
+    with pytest.raises(ValueError):
+        char1.update_inventory(add=[("shovel", 20)], remove=[("shovel", 1)])
+    with pytest.raises(ValueError):
+        char1.update_inventory(add=[("torch", 1)], remove=[("shovel", 13)])
+    assert char1.get_inventory() == {"shovel": 12}
+    assert char1.carry_current == 60
+    char1.update_inventory(remove=[("shovel", 12)])
+    assert char1.get_inventory() == {} and char1.carry_current == 0 and char1.inventory_value == 0
+
+def test_old_sheets_get_their_inventory_totals_recomputed(srd_server):
+    char1 = dnd.PlayableCharacter.from_dict({"name": "Char1", "inventory": {"shovel": 2}, "carry_current": 0})
+    assert (char1.carry_current, char1.inventory_value) == (10, 400)
+    char1.use_consumable_item("shovel")
+    assert (char1.carry_current, char1.get_inventory_value()) == (5, "2 gp")
+
+def test_unknown_items_are_refused_and_not_cached(srd_server):
+    char1 = dnd.PlayableCharacter.from_dict({"name": "Char1", "carry_capacity": 150, "inventory_value": 0})
+    with pytest.raises(ValueError):
+        char1.add_item("shovle")
+    with pytest.raises(ValueError):
+        char1.update_inventory(add=[("shovel", 1), ("shovle", 1)])
+    assert not char1.can_add_item("shovle")
+    assert char1.get_inventory() == {} and char1.carry_current == 0
+    srd_server.fail("equipment/torch", status=404)
+    with pytest.raises(ValueError):
+        char1.add_item("torch")
+    char1.add_item("torch")
+    assert char1.carry_current == 1
 
-def test_can_add_spell():
-    char1 = dnd.PlayableCharacter("Char1", background="Acolyte",player_class="Barbarian", alignment="Lawful Good", race="Human", player_subclass="Druid")
-    char2 = dnd.PlayableCharacter("Char2", background="Acolyte",player_class="Wizard", alignment="Lawful Good", race="Human", player_subclass="Druid")
+def test_can_add_spell(srd_server):
+    char1 = dnd.PlayableCharacter("Char1", background="acolyte",player_class="barbarian", alignment="lawful-good", race="human", choice_policy=choices.first_options)
+    char2 = dnd.PlayableCharacter("Char2", background="acolyte",player_class="wizard", alignment="lawful-good", race="human", choice_policy=choices.first_options)
     char2.set_level(5)
     assert char1.can_add_spell(dnd.get_spell("fireball")) == False
     assert char2.can_add_spell(dnd.get_spell("fireball")) == True #not all spells have all of the properties
 
-def test_set_level():
-    char1 = dnd.PlayableCharacter("Char1", player_class="Barbarian")
+def test_set_level(srd_server):
+    char1 = dnd.PlayableCharacter("Char1", background="soldier", alignment="neutral-good", race="dwarf", player_class="barbarian", choice_policy=choices.first_options)
     char1.set_level(5)
     assert char1.get_level() == 5
     
 
-def test_get_player_class():
-    assert dnd.get_player_class("barbarian").name == "Barbarian"
\ No newline at end of file
+def test_get_player_class(srd_server):
+    assert dnd.get_player_class("barbarian").name == "Barbarian"
+
+def test_languages_fetched_once_per_process(srd_server, monkeypatch):
+    monkeypatch.setattr("builtins.input", lambda prompt: "a" if "(a/" in prompt else "skill-arcana, skill-history")
+    elf = dnd.PlayableCharacter("Elf", background="sage", alignment="neutral-good", race="elf", player_class="wizard")
+    assert elf.known_languages == ["elvish"]
+    srd_server.reset_counts()
+    for race in dnd.PlayableCharacter.valid_races:
+        dnd.PlayableCharacter(race, background="sage", alignment="neutral-good", race=race, player_class="wizard")
+    assert not [path for path in srd_server.requests if path.split("/")[0] == "languages"]
+
+
+def test_build_fetches_concurrently(srd_server):
+    srd_server.latency = 0.1
+    wizard = {"background": "sage", "alignment": "neutral-good", "player_class": "wizard",
+              "equipment_choices": ["a", "a", "b"], "proficiency_choices": [["skill-arcana", "skill-history"]]}
+
+    async def build_party():
+        return await asyncio.gather(*[dnd.PlayableCharacter.build(race, race=race, **wizard)
+                                      for race in dnd.PlayableCharacter.valid_races])
+
+    asyncio.run(dnd.PlayableCharacter.build("Warmup", race="elf", **wizard))
+    srd_server.reset_counts()
+    party = asyncio.run(build_party())
+    #only the races not fetched by the warmup are left, and their requests overlap
+    assert srd_server.total_requests == len(dnd.PlayableCharacter.valid_races) - 1
+    assert srd_server.peak_in_flight > 1
+    assert [character.race for character in party] == dnd.PlayableCharacter.valid_races
+    assert party[2].known_languages == ["elvish"]
+    assert party[2].inventory == {"spellbook": 1, "quarterstaff": 1, "component-pouch": 1, "explorers-pack": 1}
+    assert "skill-history" in party[2].proficiencies
+
+
+def test_build_makes_choices_off_the_loop(srd_server):
+    threads = []
+
+    def policy(choice):
+        threads.append(threading.current_thread())
+        return choices.first_options(choice)
+
+    asyncio.run(dnd.PlayableCharacter.build("Brom", background="soldier", alignment="chaotic-good", race="dwarf",
+                                            player_class="barbarian", choice_policy=policy))
+    #the equipment choices, then the proficiency choice
+    assert len(threads) > 2
+    assert threading.main_thread() not in threads
+
+
+def test_build_never_prompts(srd_server):
+    with pytest.raises(ValueError):
+        asyncio.run(dnd.PlayableCharacter.build("Char1", background="sage", alignment="neutral-good",
+                                                race="elf", player_class="wizard"))
+
+
+def test_batch_lookups_keep_order(srd_server):
+    spells = dnd.get_spells(["fireball", "firebal", "light"])
+    assert [spell and spell.index for spell in spells] == ["fireball", None, "light"]
+    assert [item.name for item in dnd.get_items(["shovel", "dagger"])] == ["Shovel", "Dagger"]
+    assert dnd.get_magic_items(["bag-of-holding"])[0].name == "Bag of Holding"
+    assert [race.speed for race in dnd.get_player_races(["elf", "dwarf"])] == [30, 25]
+    assert dnd.get_player_classes(["wizard"])[0].hit_die == 6
+    assert dnd.get_class_spells(["rogue"])[0].count == 0
+    assert dnd.get_languages(["elvish", "orc"])[1].name == "Orc"
+
+
+def test_batch_lookups_are_bounded_and_cached(srd_server):
+    dnd.get_name_index("equipment")
+    srd_server.latency = 0.1
+    names = ["shovel", "dagger", "rapier", "torch", "crowbar", "arrow", "orb", "wand"]
+    srd_server.reset_counts()
+    items = dnd.get_items(names, max_workers=4)
+    assert [item.index for item in items] == names
+    assert srd_server.total_requests == len(names)
+    assert srd_server.peak_in_flight == 4
+    srd_server.reset_counts()
+    dnd.get_items(names)
+    assert srd_server.total_requests == 0
+
+
+def test_records_tolerate_unknown_and_missing_keys():
+    spell = dnd.Spell.from_json({"index": "new-spell", "name": "New Spell", "level": 2, "added_upstream": True})
+    assert spell.name == "New Spell"
+    assert spell.damage is None
+    assert not hasattr(spell, "__dict__")
+
+
+def test_nested_fields_are_decoded_on_first_access(srd_server):
+    char_class = dnd.get_player_class("rogue")
+    assert char_class._decoded is None
+    assert char_class.starting_equipment_options[0]["desc"] == "(a) a rapier or (b) a shortsword"
+    assert char_class._decoded is not None
+    assert dnd.get_item("dagger").properties[0]["index"] == "finesse"
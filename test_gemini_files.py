@@ -0,0 +1,91 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from gemini_files import FileUploader
+
+
+class FakeFileService:
+    """
+    Local mock of the Gemini file service: uploads take upload_latency seconds and files
+    stay PROCESSING for the first `polls` state checks. The peak number of concurrent
+    uploads is tracked.
+    """
+
+    def __init__(self, upload_latency=0.1, polls=2, final_state="ACTIVE"):
+        self.upload_latency = upload_latency
+        self.polls = polls
+        self.final_state = final_state
+        self.files = {}
+        self.uploads = 0
+        self.checks = {}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _file(self, name):
+        state = "PROCESSING" if self.checks[name] <= self.polls else self.final_state
+        return SimpleNamespace(name=name, uri=f"https://files.local/{name}", display_name=self.files[name],
+                               state=SimpleNamespace(name=state))
+
+    def upload_file(self, path, mime_type=None):
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        time.sleep(self.upload_latency)
+        with self._lock:
+            self.in_flight -= 1
+            self.uploads += 1
+            name = f"files/{self.uploads}"
+            self.files[name] = path
+            self.checks[name] = 0
+        return self._file(name)
+
+    def get_file(self, name):
+        if name not in self.files:
+            raise KeyError(name)
+        with self._lock:
+            self.checks[name] += 1
+        return self._file(name)
+
+
+@pytest.fixture
+def sheets(tmp_path):
+    paths = []
+    for i in range(6):
+        path = tmp_path / f"Char{i}.json"
+        path.write_text(f'{{"name": "Char{i}"}}')
+        paths.append(str(path))
+    return paths
+
+
+def test_uploads_and_polls_in_parallel(sheets, tmp_path):
+    service = FakeFileService(upload_latency=0.1, polls=2)
+    uploader = FileUploader(service, str(tmp_path / "manifest.json"), first_poll=0.01)
+    files = uploader.upload_all(sheets)
+    assert service.uploads == 6
+    assert service.peak_in_flight > 1
+    assert [file.state.name for file in files] == ["ACTIVE"] * 6
+    assert [file.display_name for file in files] == sheets
+    assert uploader.stats["polls"] == 18
+
+
+def test_unchanged_files_are_not_uploaded_again(sheets, tmp_path):
+    service = FakeFileService(upload_latency=0, polls=0)
+    FileUploader(service, str(tmp_path / "manifest.json"), first_poll=0.01).upload_all(sheets)
+    with open(sheets[0], "w") as f:
+        f.write('{"name": "Char0", "level": 2}')
+
+    uploader = FileUploader(service, str(tmp_path / "manifest.json"), first_poll=0.01)
+    files = uploader.upload_all(sheets)
+    assert uploader.stats == {"uploaded": 1, "reused": 5, "polls": 1}
+    assert service.uploads == 7
+    assert files[0].name == "files/7"
+
+
+def test_failed_processing_raises(sheets, tmp_path):
+    service = FakeFileService(upload_latency=0, polls=1, final_state="FAILED")
+    with pytest.raises(Exception, match="failed to process"):
+        FileUploader(service, None, first_poll=0.01).upload_all(sheets[:1])
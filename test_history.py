@@ -0,0 +1,62 @@
+import asyncio
+
+from fakemodel import FakeModel
+from history import HistoryManager, estimate_tokens
+from sessions import SessionManager
+
+
+def play(chat, turns):
+    for turn in range(turns):
+        chat.send_message(f"Turn {turn}: I search the room for traps and hidden doors, then move on.")
+
+
+def test_prompt_tokens_stay_flat():
+    chat = HistoryManager(FakeModel(), pinned=["Objective: recover the Sunblade."], window_tokens=500)
+    play(chat, 500)
+    prompt_tokens = [turn["prompt_tokens"] for turn in chat.turns]
+    assert max(prompt_tokens[100:]) <= max(prompt_tokens[:100]) * 1.1
+    assert max(turn["context_tokens"] for turn in chat.turns) <= 500 + 2 * chat.turns[-1]["reply_tokens"]
+
+    unbounded = FakeModel().start_chat()
+    play(unbounded, 500)
+    assert estimate_tokens(unbounded.history) > 20 * max(prompt_tokens)
+
+
+def test_pinned_facts_and_summary_are_kept():
+    summaries = []
+
+    def summarize(summary, messages):
+        summaries.append((summary, len(messages)))
+        return f"{len(summaries)} summaries"
+
+    chat = HistoryManager(FakeModel(), pinned=["Objective: recover the Sunblade."], window_tokens=200, summarize=summarize)
+    play(chat, 50)
+    assert chat.history[0]["parts"] == ["Objective: recover the Sunblade."]
+    assert chat.history[2]["parts"] == [f"Summary of the campaign so far:\n{len(summaries)} summaries"]
+    assert chat.history[4]["role"] == "user"
+    #each compaction builds on the previous summary
+    assert summaries[0][0] == "" and summaries[1][0] == "1 summaries"
+    assert chat.stats["summarized_turns"] + len(chat.recent) // 2 == 50
+
+
+def test_default_summary_asks_the_model():
+    model = FakeModel()
+    chat = HistoryManager(model, window_tokens=100)
+    play(chat, 10)
+    assert chat.stats["compactions"] >= 1
+    assert "Turn 0" in model.prompts[0]
+    assert chat.summary
+
+
+def test_sessions_keep_a_bounded_window(tmp_path):
+    manager = SessionManager(FakeModel(), store_dir=str(tmp_path), window_tokens=200)
+
+    async def play_session():
+        for turn in range(40):
+            await manager.send("table", f"Turn {turn}: I keep walking down the long corridor.")
+        return [chunk async for chunk in manager.stream("table", "I open the door")]
+
+    assert "".join(asyncio.run(play_session())) == "The Dungeon Master answers: I open the door"
+    chat = manager.get("table").chat
+    assert len(chat.turns) == 41
+    assert estimate_tokens(chat.recent) <= 200
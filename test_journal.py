@@ -0,0 +1,112 @@
+import os
+
+import pytest
+
+from fakemodel import FakeModel
+from history import HistoryManager
+from journal import CampaignState, Journal, apply_diff, character_diff
+
+
+def sheet(level, inventory):
+    return {"name": "Char1", "level": level, "inventory": inventory, "spells": ["fire-bolt"]}
+
+
+def play(journal, turns, start=0):
+    for turn in range(start, start + turns):
+        journal.record_turn(f"Turn {turn}: I search the room", f"Reply {turn}", [sheet(1 + turn // 10, {"torch": turn})])
+
+
+def test_character_diff_round_trips():
+    old = {"name": "Char1", "level": 1, "inventory": {"torch": 1}, "xp": 10}
+    new = {"name": "Char1", "level": 2, "inventory": {"torch": 1, "dagger": 1}}
+    diff = character_diff(old, new)
+    assert diff == {"level": 2, "inventory": {"torch": 1, "dagger": 1}, "-": ["xp"]}
+    assert apply_diff(old, diff) == new
+    assert character_diff(new, new) == {}
+
+
+def test_window_larger_than_recent_keeps_every_turn():
+    state = CampaignState(seq=3, summary="Earlier turns", recent=[{"role": "user", "parts": ["Turn 3"]}])
+    state.apply({"seq": 4, "input": "Turn 4", "reply": "Reply 4", "summary": "Earlier turns", "window": 10})
+    assert state.recent == [{"role": "user", "parts": ["Turn 3"]}, {"role": "user", "parts": ["Turn 4"]},
+                            {"role": "model", "parts": ["Reply 4"]}]
+
+
+def test_resume_replays_snapshot_and_tail(tmp_path):
+    journal = Journal(str(tmp_path), snapshot_every=20)
+    play(journal, 45)
+    journal.close()
+    #two snapshots were taken and only the segment after the last one is left
+    assert journal.stats["snapshots"] == 2
+    assert sorted(os.listdir(tmp_path)) == ["journal-000000000041.log", "snapshot.json"]
+
+    resumed = Journal(str(tmp_path), snapshot_every=20)
+    assert resumed.stats["replayed"] == 5
+    assert resumed.state.seq == 45
+    assert resumed.state.characters["Char1"] == sheet(5, {"torch": 44})
+    assert resumed.state.last_reply() == "Reply 44"
+    assert len(resumed.state.recent) == 90
+    play(resumed, 1, start=45)
+    resumed.close()
+    assert Journal(str(tmp_path)).state.seq == 46
+
+
+def test_torn_tail_is_cut_off(tmp_path):
+    journal = Journal(str(tmp_path), snapshot_every=None)
+    play(journal, 3)
+    journal.close()
+    path = tmp_path / "journal-000000000001.log"
+    size = path.stat().st_size
+    with open(path, "ab") as f:
+        f.write(b'0badc0de {"seq": 4, "inp')
+
+    resumed = Journal(str(tmp_path), snapshot_every=None)
+    assert resumed.state.seq == 3
+    assert resumed.stats["truncated_bytes"] > 0
+    assert path.stat().st_size == size
+    play(resumed, 1, start=3)
+    resumed.close()
+    assert Journal(str(tmp_path)).state.seq == 4
+
+
+def test_corrupt_record_before_the_tail_is_an_error(tmp_path):
+    journal = Journal(str(tmp_path), snapshot_every=None)
+    play(journal, 2)
+    journal.close()
+    (tmp_path / "journal-000000000001.log").write_bytes(b"garbage\n")
+    (tmp_path / "journal-000000000003.log").write_bytes(b"")
+    with pytest.raises(ValueError):
+        Journal(str(tmp_path))
+
+
+def test_syncs_are_batched(tmp_path):
+    now = [0.0]
+    journal = Journal(str(tmp_path), sync_every=10, sync_interval=5.0, clock=lambda: now[0])
+    play(journal, 25)
+    assert journal.stats["syncs"] == 2
+    now[0] += 5.0
+    play(journal, 1, start=25)
+    assert journal.stats["syncs"] == 3
+    journal.close()
+
+
+def test_history_resumes_without_the_model(tmp_path):
+    chat = HistoryManager(FakeModel(), window_tokens=200, summarize=lambda summary, messages: f"{summary}+{len(messages)}")
+    journal = Journal(str(tmp_path), snapshot_every=7)
+    for turn in range(30):
+        compactions = chat.stats["compactions"]
+        message = f"Turn {turn}: I search the room for traps and hidden doors, then move on."
+        reply = chat.send_message(message).text
+        if chat.stats["compactions"] != compactions:
+            journal.record_turn(message, reply, summary=chat.summary, window=len(chat.recent))
+        else:
+            journal.record_turn(message, reply)
+    journal.close()
+
+    model = FakeModel()
+    resumed = HistoryManager(model, window_tokens=200)
+    state = Journal(str(tmp_path)).state
+    resumed.restore(state.summary, state.recent)
+    assert chat.stats["compactions"] > 0
+    assert resumed.history == chat.history
+    assert model.calls == 0 and model.prompts == []
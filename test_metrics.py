@@ -0,0 +1,73 @@
+import urllib.request
+
+import dnd
+import metrics
+from metrics import Registry
+
+
+def test_export_format():
+    registry = Registry()
+    registry.describe("srd_cache_lookups_total", "SRD cache lookups by tier")
+    registry.inc("srd_cache_lookups_total", tier="memory")
+    registry.inc("srd_cache_lookups_total", 2, tier="memory")
+    registry.observe("srd_request_seconds", 0.03, endpoint="spells/{index}")
+    registry.observe("srd_request_seconds", 2.0, endpoint="spells/{index}")
+
+    lines = registry.export().splitlines()
+    assert "# HELP srd_cache_lookups_total SRD cache lookups by tier" in lines
+    assert "# TYPE srd_cache_lookups_total counter" in lines
+    assert 'srd_cache_lookups_total{tier="memory"} 3' in lines
+    assert "# TYPE srd_request_seconds histogram" in lines
+    assert 'srd_request_seconds_bucket{endpoint="spells/{index}",le="0.025"} 0' in lines
+    assert 'srd_request_seconds_bucket{endpoint="spells/{index}",le="0.05"} 1' in lines
+    assert 'srd_request_seconds_bucket{endpoint="spells/{index}",le="+Inf"} 2' in lines
+    assert 'srd_request_seconds_count{endpoint="spells/{index}"} 2' in lines
+
+
+def test_timed_decorator_and_quantile():
+    registry = Registry()
+
+    @registry.timed("work_seconds", kind="test")
+    def work():
+        return 42
+
+    assert [work() for _ in range(10)] == [42] * 10
+    histogram = registry.histogram("work_seconds", kind="test")
+    assert histogram.count == 10
+    assert histogram.quantile(0.99) == metrics.LATENCY_BUCKETS[0]
+
+
+def test_disabled_registry_records_nothing():
+    registry = Registry(enabled=False)
+    registry.inc("calls_total")
+    with registry.timed("work_seconds"):
+        pass
+    assert registry.counter("calls_total") == 0
+    assert registry.export() == "\n"
+
+
+def test_serve(tmp_path):
+    registry = Registry()
+    registry.inc("calls_total")
+    server = metrics.serve(0, source=registry)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+            assert "calls_total 1" in response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    path = str(tmp_path / "metrics.prom")
+    registry.write_snapshot(path)
+    with open(path) as f:
+        assert f.read() == registry.export()
+
+
+def test_srd_lookups_are_counted(srd_server):
+    metrics.registry.reset()
+    dnd.get_spell("fireball")
+    dnd.get_spell("fireball")
+    assert metrics.registry.counter("srd_lookups_total", endpoint="spells/{index}", source="api") == 1
+    assert metrics.registry.counter("srd_lookups_total", endpoint="spells/{index}", source="cache") == 1
+    assert metrics.registry.histogram("srd_request_seconds", endpoint="spells/{index}").count == 1
+    assert metrics.registry.counter("srd_cache_lookups_total", tier="memory") == 1
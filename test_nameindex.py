@@ -0,0 +1,31 @@
+import logging
+
+import dnd
+from nameindex import NameIndex, normalize
+
+
+def test_normalize():
+    assert normalize("Rope, hempen (50 feet)") == "rope-hempen-50-feet"
+    assert normalize("  Burglar's Pack ") == "burglars-pack"
+
+
+def test_resolve_prefix_and_suggest():
+    index = NameIndex([("fireball", "Fireball"), ("fire-bolt", "Fire Bolt"), ("magic-missile", "Magic Missile")])
+    assert index.resolve("MAGIC missile") == "magic-missile"
+    assert index.resolve("firebal") is None
+    assert index.prefix("fire") == ["fire-bolt", "fireball"]
+    assert index.suggest("firebal")[0][0] == "fireball"
+    assert index.suggest("magik misile")[0][0] == "magic-missile"
+    assert index.suggest("xyzzy") == []
+
+
+def test_typos_are_rejected_without_a_request(srd_server, caplog):
+    caplog.set_level(logging.INFO, logger="dnd")
+    assert dnd.get_spell("Magic Missile").index == "magic-missile"
+    srd_server.reset_counts()
+    assert dnd.get_spell("firebal") is None
+    assert srd_server.total_requests == 0
+    assert "Did you mean Fireball" in caplog.text
+    assert caplog.records[-1].suggestions[0] == "Fireball"
+    assert dnd.get_item("shov") is None
+    assert dnd.suggest_names("equipment", "shovle") == ["Shovel"]
@@ -0,0 +1,151 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from pipeline import ChannelPipeline, LoopLagMonitor, OutboundQueue, RateLimiter
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+
+
+class FakeChannel:
+    def __init__(self, id=1, fail_first=None, clock=time.monotonic):
+        self.id = id
+        self.sent = []
+        self.sent_at = []
+        self.fail_first = fail_first
+        self.clock = clock
+
+    async def send(self, content):
+        if self.fail_first is not None:
+            error, self.fail_first = self.fail_first, None
+            raise error
+        self.sent.append(content)
+        self.sent_at.append(self.clock())
+        return len(self.sent) - 1
+
+
+class FakeTime:
+    """
+    Clock that only moves when sleep is awaited.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def clock(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+def test_rate_limiter():
+    now = [0.0]
+    limiter = RateLimiter(5, 5.0, clock=lambda: now[0])
+    assert [limiter.delay() for _ in range(5)] == [0.0] * 5
+    assert limiter.delay() == 1.0
+    now[0] += 1.0
+    assert limiter.delay() == 0.0
+    limiter.hold(3.0)
+    assert limiter.delay() == 4.0
+
+
+def test_outbound_messages_are_paced_and_coalesced():
+    fake = FakeTime()
+    channel = FakeChannel(clock=fake.clock)
+
+    async def run():
+        outbound = OutboundQueue(rate=(2, 0.2), clock=fake.clock, sleep=fake.sleep)
+        await asyncio.gather(*[outbound.post(channel, f"turn {i}", coalesce=False) for i in range(6)])
+        results = await asyncio.gather(*[outbound.post(channel, f"line {i}") for i in range(10)])
+        return outbound, results
+
+    outbound, results = asyncio.run(run())
+    assert channel.sent[:6] == [f"turn {i}" for i in range(6)]
+    #a burst of 2, then one send every 0.1 s
+    assert channel.sent_at[:6] == pytest.approx([0.0, 0.0, 0.1, 0.2, 0.3, 0.4])
+    assert "\n".join(channel.sent[6:]) == "\n".join(f"line {i}" for i in range(10))
+    assert len(channel.sent) < 16 and outbound.stats["coalesced"] == 16 - len(channel.sent)
+    assert results[-1] == len(channel.sent) - 1
+
+
+def test_long_texts_are_split_and_rate_limits_retried():
+    channel = FakeChannel(fail_first=RateLimited(0.05))
+
+    async def run():
+        outbound = OutboundQueue(rate=(5, 0.05), limit=20)
+        message = await outbound.send(channel, "first line of text\nsecond line of text\nthird")
+        return outbound, message
+
+    outbound, message = asyncio.run(run())
+    assert channel.sent == ["first line of text", "second line of text", "third"]
+    assert message == 2
+    assert outbound.stats["retries"] == 1
+
+
+def test_turns_keep_their_order_per_channel_and_refuse_floods():
+    done = []
+    running = set()
+    overlaps = []
+
+    async def turn(pipeline, channel, number):
+        running.add(channel)
+        overlaps.append(len(running))
+        await pipeline.run_blocking(time.sleep, 0.01)
+        running.discard(channel)
+        done.append((channel, number))
+
+    async def run():
+        pipeline = ChannelPipeline(workers=4, max_pending=5)
+        accepted = [pipeline.submit(channel, turn, pipeline, channel, number) for channel in range(4) for number in range(8)]
+        await pipeline.join()
+        pipeline.close()
+        return pipeline, accepted
+
+    pipeline, accepted = asyncio.run(run())
+    assert accepted.count(False) == 4 * 3
+    assert pipeline.stats["completed"] == 4 * 5
+    for channel in range(4):
+        assert [number for done_channel, number in done if done_channel == channel] == list(range(5))
+    #the 4 channels ran side by side
+    assert max(overlaps) == 4
+
+
+def test_blocking_work_does_not_lag_the_loop():
+    async def run():
+        monitor = LoopLagMonitor(interval=0.005)
+        monitor.start()
+        pipeline = ChannelPipeline(workers=8)
+        for channel in range(16):
+            pipeline.submit(channel, pipeline.run_blocking, time.sleep, 0.05)
+        await pipeline.join()
+        monitor.stop()
+        pipeline.close()
+        return monitor
+
+    monitor = asyncio.run(run())
+    assert len(monitor.samples) > 5
+    assert monitor.quantile(0.99) < 0.04
+
+
+def test_refused_turn_notice_failures_are_logged(monkeypatch, caplog):
+    import discordBot
+
+    async def run():
+        monkeypatch.setattr(discordBot, "_pipeline", ChannelPipeline(workers=1, max_pending=0))
+        monkeypatch.setattr(discordBot, "_outbound", OutboundQueue())
+        channel = FakeChannel(fail_first=RuntimeError("missing permissions"))
+        message = SimpleNamespace(content="Hello", author=SimpleNamespace(id=7), guild=None, channel=channel)
+        await discordBot.send_message(message, "Hello")
+        await discordBot._outbound.join()
+        discordBot._pipeline.close()
+
+    asyncio.run(run())
+    assert [record.event for record in caplog.records if hasattr(record, "event")] == ["post_failed"]
+    assert "never retrieved" not in caplog.text
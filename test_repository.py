@@ -0,0 +1,64 @@
+import pytest
+
+import dnd
+from repository import CharacterRepository, ConflictError
+
+
+def character(name, player_class="wizard", race="elf", level=1):
+    return dnd.PlayableCharacter.from_dict({"name": name, "player_class": player_class, "race": race, "level": level,
+                                            "inventory": {"dagger": 2}, "spells": ["light"]})
+
+
+@pytest.fixture
+def repository(tmp_path, srd_server):
+    repository = CharacterRepository(str(tmp_path / "characters.db"))
+    yield repository
+    repository.close()
+
+
+def test_save_and_get(repository):
+    aria = character("Aria", level=5)
+    assert aria.save(repository=repository, owner=42, campaign=1001) == 1
+    loaded = repository.get("Aria", owner=42, campaign=1001)
+    assert loaded.to_dict() == aria.to_dict()
+    assert loaded.version == 1
+    #the same name in another campaign is another character
+    assert repository.get("Aria", owner=42, campaign=1002) is None
+    assert repository.delete("Aria", owner=42, campaign=1001)
+    assert repository.get("Aria", owner=42, campaign=1001) is None
+
+
+def test_stale_writes_conflict(repository):
+    repository.put(character("Aria"), campaign=1001)
+    first = repository.get("Aria", campaign=1001)
+    second = repository.get("Aria", campaign=1001)
+    first.set_level(2)
+    assert repository.put(first, campaign=1001) == 2
+    second.add_item("torch")
+    with pytest.raises(ConflictError):
+        repository.put(second, campaign=1001)
+    with pytest.raises(ConflictError):
+        repository.put(character("Aria"), campaign=1001)
+    assert repository.put(second, campaign=1001, force=True) == 3
+    assert repository.get("Aria", campaign=1001).get_inventory() == {"dagger": 2, "torch": 1}
+
+
+def test_batch_is_all_or_nothing(repository):
+    repository.put(character("Brom", "barbarian"), campaign=1001)
+    batch = [character(f"Wizard{i}", level=i % 3 + 4) for i in range(10)] + [character("Brom", "barbarian")]
+    with pytest.raises(ConflictError):
+        repository.put_many(batch, campaign=1001)
+    assert repository.count(campaign=1001) == 1
+    assert repository.put_many(batch[:-1], campaign=1001) == [1] * 10
+    assert repository.count() == 11
+
+
+def test_indexed_queries(repository):
+    repository.put_many([(character(f"Wizard{i}", level=i % 5 + 1), i % 7, 1001) for i in range(50)] +
+                        [(character(f"Rogue{i}", "rogue", "halfling", level=5), i, 1002) for i in range(5)])
+    wizards = repository.find(campaign=1001, player_class="wizard", level=5)
+    assert [wizard.name for wizard in wizards] == sorted(f"Wizard{i}" for i in range(4, 50, 5))
+    assert repository.count(player_class="rogue", min_level=5) == 5
+    assert repository.count(campaign=1001, owner=3) == 7
+    assert [rogue.name for rogue in repository.find(race="halfling", limit=2)] == ["Rogue0", "Rogue1"]
+    assert "USING INDEX characters_campaign_class" in repository.query_plan(campaign=1001, player_class="wizard", level=5)
@@ -0,0 +1,69 @@
+import pytest
+
+import dnd
+from router import Router, classify, find_entity
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("what does fireball do?", ("describe", "spells", "fireball")),
+    ("How much does a shovel cost?", ("cost", "equipment", "shovel")),
+    ("how much do shovels cost", ("cost", "equipment", "shovel")),
+    ("what level is Magic Missile?", ("level", "spells", "magic-missile")),
+    ("range of fire bolt", ("range", "spells", "fire-bolt")),
+    ("tell me about the bag of holding", ("describe", "magic-items", "bag-of-holding")),
+])
+def test_reference_questions_are_answered_locally(srd_server, message, expected):
+    route = Router().route(message)
+    assert (route.intent, route.collection, route.index) == expected
+
+
+@pytest.mark.parametrize("message", [
+    "I cast fireball at the goblins",
+    "What happens if I cast fireball?",
+    "what does the goblin do?",
+    "We dig with the shovel",
+])
+def test_narrative_turns_are_forwarded(srd_server, message):
+    assert Router().route(message) is None
+
+
+def test_answers(srd_server):
+    router = Router()
+    assert router.answer("How much does a shovel cost?") == "Shovel costs 2 gp."
+    assert router.answer("What components does fireball need?") == "Fireball needs V, S, M (A tiny ball of bat guano and sulfur.)."
+    assert router.answer("what does fireball do?").startswith("Fireball: level 3 evocation spell, 1 action, range 150 feet")
+
+
+def test_classify_needs_a_question():
+    assert classify("fireball") is None
+    assert classify("what is the price of a torch?") == ("cost", ["equipment"])
+
+
+def test_entities_are_matched_on_whole_words(srd_server):
+    assert find_entity("I shove the door") is None
+    assert find_entity("how long is the hempen rope (50 feet)") is None
+    assert find_entity("how long is the Rope, hempen (50 feet)") == ("equipment", "rope-hempen-50-feet")
+
+
+def test_stats(srd_server):
+    clock = iter([0.0, 0.01, 1.0, 1.02]).__next__
+    router = Router(clock=clock)
+    assert router.answer("what does fireball do?") is not None
+    assert router.answer("what does the goblin do?") is None
+    router.record_forwarded(2.0)
+    assert router.local_fraction() == 0.5
+    assert router.latency_saved() == pytest.approx(2.0 - 0.01)
+    assert srd_server.total_requests > 0
+
+
+def test_unavailable_lists_are_fetched_once(srd_server, monkeypatch):
+    calls = []
+    monkeypatch.setattr(dnd, "_fetch", lambda path: calls.append(path))
+    router = Router()
+    assert router.answer("what does the ring of the ancient kings do?") is None
+    assert router.answer("tell me about the bag of holding") is None
+    assert sorted(calls) == ["equipment", "magic-items", "spells"]
+    #retried once the delay is over
+    dnd._name_indexes["spells"] = 0.0
+    assert find_entity("what does fireball do?", ["spells"]) is None
+    assert calls.count("spells") == 2
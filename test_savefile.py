@@ -0,0 +1,76 @@
+import builtins
+import json
+import os
+import struct
+import zlib
+
+import pytest
+
+import dnd
+import savefile
+
+
+def make_wizard():
+    wizard = dnd.PlayableCharacter("Char2", background="acolyte", alignment="lawful-good", race="human", player_class="wizard",
+                                   equipment_choices=["a", "a", "a"], proficiency_choices=[["skill-arcana", "skill-history"]])
+    wizard.add_item("torch", 3)
+    wizard.set_level(3)
+    return wizard
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_load_restores_without_api_or_prompts(srd_server, tmp_path, monkeypatch, binary):
+    wizard = make_wizard()
+    saves = tmp_path / "saves"
+    saves.mkdir()
+    path = wizard.save(str(saves / ("Char2.dndc" if binary else "Char2.json")), binary=binary)
+    assert os.listdir(saves) == [os.path.basename(path)]
+
+    srd_server.reset_counts()
+    monkeypatch.setattr(builtins, "input", lambda prompt: pytest.fail("load prompted the player"))
+    loaded = dnd.PlayableCharacter.load(path)
+    assert srd_server.total_requests == 0
+    assert loaded.to_dict() == wizard.to_dict()
+    assert loaded.get_level() == 3
+    assert loaded.inventory["torch"] == 3
+
+
+def test_binary_format_is_versioned_and_smaller(tmp_path):
+    data = {"name": "Char1", "inventory": {"dagger": 2}, "proficiencies": ["skill-stealth"] * 20, "level": 2}
+    blob = savefile.encode(data)
+    assert blob.startswith(savefile.MAGIC)
+    assert savefile.decode(blob) == data
+    assert savefile.decode(json.dumps(data).encode()) == data
+    assert len(blob) < len(json.dumps(data, indent=4))
+    with pytest.raises(ValueError):
+        savefile.decode(struct.pack(">4sH", savefile.MAGIC, savefile.VERSION + 1) + blob[6:])
+
+
+def test_load_all(tmp_path):
+    for name in ["Aria", "Brom", "Kess"]:
+        savefile.write(str(tmp_path / f"{name}.dndc"), {"name": name, "level": 2})
+    characters = dnd.PlayableCharacter.load_all(str(tmp_path), binary=True)
+    assert sorted(characters) == ["Aria", "Brom", "Kess"]
+    assert characters["Brom"].get_level() == 2
+    assert dnd.PlayableCharacter.load_all(str(tmp_path)) == {}
+
+
+def test_load_all_skips_files_that_are_not_characters(tmp_path):
+    savefile.write(str(tmp_path / "Aria.json"), {"name": "Aria", "level": 2})
+    (tmp_path / "story.json").write_text(json.dumps({"title": "The Sunblade"}))
+    (tmp_path / "broken.json").write_text("{")
+    assert sorted(dnd.PlayableCharacter.load_all(str(tmp_path))) == ["Aria"]
+
+
+def test_truncated_saves_are_skipped(tmp_path):
+    savefile.write(str(tmp_path / "Aria.dndc"), {"name": "Aria", "level": 2})
+    (tmp_path / "Brom.dndc").write_bytes(savefile.MAGIC + b"\x00")
+    with pytest.raises(ValueError, match="truncated save file"):
+        savefile.read(str(tmp_path / "Brom.dndc"))
+    assert sorted(dnd.PlayableCharacter.load_all(str(tmp_path), binary=True)) == ["Aria"]
+
+
+def test_version_1_saves_still_load():
+    data = {"name": "Char1", "level": 2}
+    blob = struct.pack(">4sH", savefile.MAGIC, 1) + zlib.compress(json.dumps(data).encode())
+    assert savefile.decode(blob) == data
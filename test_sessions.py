@@ -0,0 +1,90 @@
+import asyncio
+import json
+from contextlib import aclosing
+from types import SimpleNamespace
+
+from fakemodel import FakeModel
+from sessions import SessionManager, history_from_json, history_to_json
+
+
+def test_turns_keep_their_order_per_session(tmp_path):
+    manager = SessionManager(FakeModel(latency=0.01), store_dir=str(tmp_path))
+
+    async def play():
+        return await asyncio.gather(*[manager.send(("guild", "table"), f"turn {i}") for i in range(5)])
+
+    replies = asyncio.run(play())
+    assert replies == [f"The Dungeon Master answers: turn {i}" for i in range(5)]
+    history = manager.get(("guild", "table")).chat.history
+    assert [message["parts"][0] for message in history[::2]] == [f"turn {i}" for i in range(5)]
+
+
+def test_model_calls_are_capped(tmp_path):
+    model = FakeModel(latency=0.02)
+    manager = SessionManager(model, max_concurrency=4, store_dir=str(tmp_path))
+
+    async def play():
+        await asyncio.gather(*[manager.send(("guild", channel), "hello") for channel in range(20)])
+
+    asyncio.run(play())
+    assert model.calls == 20
+    assert model.peak_in_flight == 4
+
+
+def test_idle_sessions_are_evicted_and_restored(tmp_path):
+    now = [0.0]
+    manager = SessionManager(FakeModel(), idle_timeout=60, store_dir=str(tmp_path), clock=lambda: now[0])
+    asyncio.run(manager.send(("guild", 1), "I open the door"))
+    now[0] += 61
+    assert manager.evict_idle() == 1
+    assert not manager.sessions
+
+    asyncio.run(manager.send(("guild", 1), "I step inside"))
+    history = manager.get(("guild", 1)).chat.history
+    assert [message["parts"][0] for message in history[::2]] == ["I open the door", "I step inside"]
+    assert manager.stats["restored"] == 1
+
+
+def test_stream_yields_chunks(tmp_path):
+    manager = SessionManager(FakeModel(), store_dir=str(tmp_path))
+
+    async def play():
+        return [chunk async for chunk in manager.stream(("guild", 1), "look around")]
+
+    assert "".join(asyncio.run(play())) == "The Dungeon Master answers: look around"
+
+
+def test_stream_closed_early_releases_the_session(tmp_path):
+    manager = SessionManager(FakeModel(), max_concurrency=1, store_dir=str(tmp_path))
+
+    async def play():
+        async with aclosing(manager.stream(("guild", 1), "look around")) as chunks:
+            async for chunk in chunks:
+                break
+        assert not manager.get(("guild", 1)).lock.locked()
+        return await asyncio.wait_for(manager.send(("guild", 2), "hello"), 1)
+
+    assert asyncio.run(play()) == "The Dungeon Master answers: hello"
+
+
+def test_saved_sessions_keep_only_the_turns(tmp_path):
+    manager = SessionManager(FakeModel(), store_dir=str(tmp_path), window_tokens=60)
+    session = manager.get(("guild", 1))
+    session.chat.pinned = [SimpleNamespace(name="files/story")]
+    for turn in range(10):
+        asyncio.run(manager.send(("guild", 1), f"Turn {turn}: I search the room for traps."))
+    manager.save(session)
+    with open(manager._path(("guild", 1))) as f:
+        saved = json.load(f)
+    assert saved["summary"] == session.chat.summary != ""
+    assert saved["history"] == session.chat.recent
+
+    restored = SessionManager(FakeModel(), store_dir=str(tmp_path), window_tokens=60).get(("guild", 1)).chat
+    assert (restored.summary, restored.recent) == (session.chat.summary, session.chat.recent)
+
+
+def test_file_parts_are_saved_by_name():
+    history = [{"role": "user", "parts": [SimpleNamespace(name="files/story"), "Begin"]}]
+    assert history_to_json(history) == [{"role": "user", "parts": [{"file": "files/story"}, "Begin"]}]
+    assert history_from_json(history_to_json(history)) == [{"role": "user", "parts": ["Begin"]}]
+    assert history_from_json(history_to_json(history), load_file=str.upper)[0]["parts"][0] == "FILES/STORY"
@@ -0,0 +1,44 @@
+import json
+
+import dnd
+from history import estimate_tokens
+from sheets import SheetTracker, compact_sheet, format_delta, sheet_delta
+
+
+def make_wizard():
+    return dnd.PlayableCharacter("Char2", background="acolyte", alignment="lawful-good", race="human", player_class="wizard",
+                                 equipment_choices=["a", "a", "a"], proficiency_choices=[["skill-arcana", "skill-history"]])
+
+
+def test_compact_sheet_is_smaller_than_saved_json(srd_server):
+    wizard = make_wizard()
+    data = wizard.to_dict()
+    assert json.loads(wizard._toJson()) == data
+    sheet = compact_sheet(data)
+    assert sheet.startswith("[Char2]\nclass: wizard\n")
+    assert "languages: common" in sheet
+    assert "equipped:" not in sheet
+    assert estimate_tokens(sheet) * 2 < estimate_tokens(wizard._toJson())
+
+
+def test_delta_holds_only_changes(srd_server):
+    wizard = make_wizard()
+    before = wizard.to_dict()
+    wizard.add_item("dagger", 2)
+    wizard.add_item("torch")
+    wizard.set_level(2)
+    wizard.spells.append("magic-missile")
+    delta = sheet_delta(before, wizard.to_dict())
+    assert delta == {"level": 2, "spells": {"+": ["magic-missile"]}, "inventory": {"dagger": 2, "torch": 1},
+                     "carry_current": before["carry_current"] + 3}
+    assert format_delta("Char2", delta) == f"[Char2] level 2; load {before['carry_current'] + 3}; spells +magic-missile; inventory dagger x2, torch x1"
+
+
+def test_tracker_sends_sheet_then_changes():
+    data = {"name": "Char1", "player_class": "rogue", "level": 1, "inventory": {"dagger": 2}, "spells": []}
+    tracker = SheetTracker()
+    assert tracker.update([data]) == "[Char1]\nclass: rogue\nlevel: 1\ninventory: dagger x2"
+    assert tracker.update([data]) == ""
+    data["inventory"].pop("dagger")
+    assert tracker.update([data]) == "[Char1] inventory dagger x0"
+    assert tracker.sheets() == "[Char1]\nclass: rogue\nlevel: 1"
@@ -0,0 +1,53 @@
+import dnd
+import snapshot
+from snapshot import Snapshot
+
+
+def test_build_and_serve_offline(srd_server, tmp_path, monkeypatch):
+    path = str(tmp_path / "srd_snapshot.json")
+    assert snapshot.main(["build", path]) == 0
+
+    srd_server.stop()
+    monkeypatch.setattr(dnd, "snapshot", Snapshot(path))
+    monkeypatch.setattr(dnd, "OFFLINE", True)
+    assert dnd.get_spell("fireball").name == "Fireball"
+    assert dnd.get_item("shovel").name == "Shovel"
+    assert dnd.get_magic_item("bag-of-holding").name == "Bag of Holding"
+    assert dnd.get_player_class("wizard").hit_die == 6
+    assert dnd.get_player_race("elf").speed == 30
+    assert dnd.get_language("elvish").name == "Elvish"
+    assert dnd.get_all_languages().count == 16
+    assert dnd.get_class_spell("wizard").count > 0
+    assert dnd.get_spell("firebal") is None
+
+
+def test_lookup_is_local_and_indexed_by_name(srd_server):
+    snap, _ = snapshot.crawl(dnd._request)
+    srd_server.reset_counts()
+    assert snap.find("spells", "FIREBALL")["index"] == "fireball"
+    assert snap.get("spells/fireball")["name"] == "Fireball"
+    assert snap.get("spells/firebal") is None
+    assert srd_server.total_requests == 0
+
+
+def test_incremental_refresh(srd_server):
+    old, report = snapshot.crawl(dnd._request)
+    assert len(report["spells"]["added"]) == len(old.collections["spells"])
+
+    srd_server.reset_counts()
+    unchanged, report = snapshot.crawl(dnd._request, previous=old)
+    assert report["spells"] == {"added": [], "changed": [], "removed": []}
+    assert srd_server.requests["spells/fireball"] == 0
+
+    srd_server.routes["spells/fireball"] = dict(srd_server.routes["spells/fireball"], updated_at="2030-01-01T00:00:00.000Z")
+    new, report = snapshot.crawl(dnd._request, previous=old, revalidate=True)
+    assert report["spells"]["changed"] == ["fireball"]
+    assert snapshot.diff(old, new)["spells"]["changed"] == ["fireball"]
+
+
+def test_snapshot_file_is_diffable(srd_server, tmp_path):
+    snap, _ = snapshot.crawl(dnd._request)
+    snap.save(str(tmp_path / "a.json"))
+    snap.save(str(tmp_path / "b.json"))
+    assert (tmp_path / "a.json").read_text() == (tmp_path / "b.json").read_text()
+    assert Snapshot(str(tmp_path / "a.json")).get("languages")["count"] == 16
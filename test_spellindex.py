@@ -0,0 +1,65 @@
+import dnd
+from spellindex import SpellIndex
+
+
+def test_compound_queries(srd_server):
+    index = dnd.get_spell_index()
+    assert index.query(player_class="wizard", max_level=3, ritual=True) == ["alarm", "comprehend-languages", "detect-magic", "identify"]
+    assert index.query(player_class="wizard", level=0) == ["fire-bolt", "light", "mage-hand", "prestidigitation"]
+    assert index.query(school="evocation", concentration=False, level=3) == ["fireball"]
+    assert index.query(subclass="lore") == ["light", "fireball"]
+    assert "shield" not in index.query(ritual=False, concentration=True)
+    assert len(index.query()) == len(index)
+
+
+def test_castable_by_leaves_unknown_spells_out():
+    spell = dnd.Spell.from_json({"index": "new-spell", "name": "New Spell", "level": 1,
+                                 "classes": [{"index": "bard"}], "subclasses": [{"index": "lore"}]})
+    index = SpellIndex()
+    assert index.castable_by(spell, "bard")
+    assert index.castable_by(spell, "wizard", "lore")
+    assert not index.castable_by(spell, "wizard")
+    assert "new-spell" not in index
+
+
+def test_can_add_spell_needs_no_requests(srd_server):
+    wizard = dnd.PlayableCharacter("Char2", background="acolyte", alignment="lawful-good", race="human", player_class="wizard",
+                                   equipment_choices=["a", "a", "a"], proficiency_choices=[["skill-arcana", "skill-history"]])
+    fireball, cure_wounds = dnd.get_spell("fireball"), dnd.get_spell("cure-wounds")
+    assert not wizard.can_add_spell(fireball)
+    wizard.set_level(5)
+    srd_server.reset_counts()
+    assert wizard.can_add_spell(fireball)
+    assert not wizard.can_add_spell(cure_wounds)
+    assert srd_server.total_requests == 0
+
+
+def test_can_add_spell_consults_the_shared_index(srd_server):
+    wizard = dnd.PlayableCharacter("Char2", background="acolyte", alignment="lawful-good", race="human", player_class="wizard",
+                                   equipment_choices=["a", "a", "a"], proficiency_choices=[["skill-arcana", "skill-history"]])
+    wizard.set_level(5)
+    fireball = dnd.get_spell("fireball")
+    dnd.get_spell_index()
+    #the index is warmed from the cache, without a request
+    dnd._spell_index = None
+    srd_server.reset_counts()
+    assert wizard.can_add_spell(fireball)
+    assert dnd._spell_index is not None
+    assert srd_server.total_requests == 0
+    dnd._spell_index.by_class["wizard"].discard("fireball")
+    assert not wizard.can_add_spell(fireball)
+
+
+def test_character_creation_does_not_build_the_index(srd_server):
+    wizard = dnd.PlayableCharacter("Char2", background="acolyte", alignment="lawful-good", race="human", player_class="wizard",
+                                   equipment_choices=["a", "a", "a"], proficiency_choices=[["skill-arcana", "skill-history"]])
+    assert wizard.get_spells() == ["fire-bolt", "light", "mage-hand", "prestidigitation"]
+    assert dnd._spell_index is None
+    assert srd_server.requests["spells"] == 0
+
+
+def test_missing_spell_list_gives_an_empty_index(srd_server):
+    srd_server.fail("spells", status=404)
+    assert len(dnd.get_spell_index()) == 0
+    assert dnd._spell_index is None
+    assert len(dnd.get_spell_index()) > 0
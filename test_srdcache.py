@@ -0,0 +1,86 @@
+import dnd
+from srdcache import SRDCache
+
+
+def test_repeated_lookups_hit_memory(srd_server):
+    assert dnd.get_spell("fireball").name == "Fireball"
+    assert dnd.get_spell("fireball").name == "Fireball"
+    assert srd_server.requests["spells/fireball"] == 1
+    assert dnd.cache.stats["memory_hits"] == 1
+    assert dnd.cache.stats["misses"] == 2 #the spell list used for name resolution, then the spell
+
+
+def test_every_fetcher_is_cached(srd_server):
+    def fetch_all():
+        dnd.get_spell("fireball")
+        dnd.get_item("shovel")
+        dnd.get_magic_item("bag-of-holding")
+        dnd.get_player_class("wizard")
+        dnd.get_player_race("elf")
+        dnd.get_class_spell("wizard")
+        dnd.get_all_languages()
+        dnd.get_language("elvish")
+
+    fetch_all()
+    misses = dnd.cache.stats["misses"]
+    assert misses == srd_server.total_requests
+    fetch_all()
+    assert srd_server.total_requests == misses
+    assert dnd.cache.stats["memory_hits"] == 8
+
+
+def test_disk_tier_survives_restart(srd_server, tmp_path):
+    dnd.get_item("shovel")
+    dnd.cache.close()
+    dnd.cache = SRDCache(str(tmp_path / "srd_cache.db"))
+    assert dnd.get_item("shovel").name == "Shovel"
+    assert srd_server.requests["equipment/shovel"] == 1
+    assert dnd.cache.stats["disk_hits"] == 1
+
+
+def test_unchanged_refetches_are_counted(srd_server, tmp_path):
+    now = [1000.0]
+    dnd.cache = SRDCache(str(tmp_path / "ttl.db"), ttl=60, clock=lambda: now[0])
+    dnd.get_spell("fireball")
+    now[0] += 61
+    dnd.get_spell("fireball")
+    assert srd_server.requests["spells/fireball"] == 2
+    assert dnd.cache.stats["expired"] == 1
+    assert dnd.cache.stats["unchanged"] == 1
+
+
+def test_unchanged_refetches_are_counted_on_disk(tmp_path):
+    SRDCache(str(tmp_path / "disk.db")).put("spells/fireball", {"index": "fireball", "updated_at": "2024-01-01"})
+    cache = SRDCache(str(tmp_path / "disk.db"))
+    cache.put("spells/fireball", {"index": "fireball", "updated_at": "2024-01-01"})
+    cache.put("spells/fireball", {"index": "fireball", "updated_at": "2024-02-01"})
+    assert cache.stats["unchanged"] == 1
+
+
+def test_stale_entry_served_when_api_unreachable(srd_server, tmp_path):
+    now = [1000.0]
+    dnd.cache = SRDCache(None, ttl=60, clock=lambda: now[0])
+    dnd.get_spell("fireball")
+    now[0] += 61
+    srd_server.stop()
+    assert dnd.get_spell("fireball").name == "Fireball"
+
+
+def test_size_bounded_eviction(tmp_path):
+    cache = SRDCache(str(tmp_path / "small.db"), max_entries=2, max_disk_entries=3)
+    for i in range(5):
+        cache.put(f"spells/{i}", {"index": str(i)})
+    assert len(cache._memory) == 2
+    assert cache._connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 3
+    assert cache.get("spells/4") == {"index": "4"}
+    assert cache.get("spells/0") is None
+
+
+def test_cache_hides_api_latency(srd_server):
+    srd_server.latency = 0.05
+    dnd.get_spell("fireball")
+    srd_server.reset_counts()
+    dnd.get_spell("fireball")
+    srd_server.stop()
+    assert dnd.get_spell("fireball").name == "Fireball"
+    assert srd_server.total_requests == 0
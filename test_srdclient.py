@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+import dnd
+from srdclient import SRDClient
+
+
+def test_retries_server_errors(srd_server):
+    srd_server.fail("spells/fireball", status=503, times=2)
+    assert dnd.client.get_json("spells/fireball")["name"] == "Fireball"
+    assert srd_server.requests["spells/fireball"] == 3
+    assert dnd.client.stats["retries"] == 2
+
+
+def test_gives_up_after_retries(srd_server):
+    srd_server.fail("spells/fireball", status=429, times=10)
+    with pytest.raises(requests.HTTPError):
+        dnd.client.get_json("spells/fireball")
+    assert srd_server.requests["spells/fireball"] == dnd.client.retries + 1
+
+
+def test_does_not_retry_not_found(srd_server):
+    assert dnd.client.get_json("spells/firebal") is None
+    assert srd_server.requests["spells/firebal"] == 1
+
+
+def test_coalesces_concurrent_identical_requests(srd_server):
+    srd_server.latency = 0.2
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        spells = list(pool.map(lambda _: dnd.get_spell("fireball"), range(10)))
+    assert all(spell.name == "Fireball" for spell in spells)
+    assert srd_server.requests["spells/fireball"] == 1
+    assert dnd.client.stats["coalesced"] == 9
+
+
+def test_times_out(srd_server):
+    srd_server.latency = 0.5
+    client = SRDClient(srd_server.url, timeout=0.1, retries=0)
+    with pytest.raises(requests.Timeout):
+        client.get_json("spells/fireball")
+    client.close()
+
+
+def test_fetch_falls_back_to_cache_when_retries_fail(srd_server, monkeypatch):
+    monkeypatch.setattr(dnd.cache, "ttl", -1)
+    dnd.get_spell("fireball")
+    srd_server.fail("spells/fireball", status=500, times=10)
+    assert dnd.get_spell("fireball").name == "Fireball"
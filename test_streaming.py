@@ -0,0 +1,66 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from streaming import ReplyStream, iterate_in_thread, relay_stream, split_message
+
+
+class FakeMessage:
+    def __init__(self, channel, content):
+        self.channel = channel
+        self.content = content
+
+    async def edit(self, content):
+        self.channel.edits += 1
+        self.content = content
+
+
+class FakeChannel:
+    def __init__(self):
+        self.messages = []
+        self.edits = 0
+        self.first_send_at = None
+
+    async def send(self, content):
+        if self.first_send_at is None:
+            self.first_send_at = time.perf_counter()
+        message = FakeMessage(self, content)
+        self.messages.append(message)
+        return message
+
+
+class FakeChat:
+    def __init__(self, chunks, delay):
+        self.chunks = chunks
+        self.delay = delay
+
+    def send_message(self, message, stream=False):
+        assert stream
+        for chunk in self.chunks:
+            time.sleep(self.delay)
+            yield SimpleNamespace(text=chunk)
+
+
+def test_split_message_prefers_line_breaks():
+    assert split_message("a" * 10 + "\n" + "b" * 10, limit=15) == ("a" * 10, "b" * 10)
+    assert split_message("c" * 20, limit=15) == ("c" * 15, "c" * 5)
+
+
+def test_reply_stream_times_first_token():
+    reply = ReplyStream(FakeChat(["Once ", "upon ", "a time."], delay=0.05), "Hello")
+    assert list(reply) == ["Once ", "upon ", "a time."]
+    assert reply.text == "Once upon a time."
+    assert 0.05 <= reply.time_to_first_token < reply.total_latency
+
+
+def test_relay_posts_first_chunk_then_batches_edits():
+    channel = FakeChannel()
+    words = [f"word{i} " for i in range(600)]
+    reply = ReplyStream(FakeChat(words, delay=0.001), "Hello")
+
+    messages = asyncio.run(relay_stream(channel, iterate_in_thread(reply), edit_interval=0.1))
+    assert channel.first_send_at < reply.finished_at
+    assert all(len(message.content) <= 2000 for message in messages)
+    assert " ".join(message.content for message in messages).split() == reply.text.split()
+    assert len(messages) == 3
+    assert channel.edits < 30